@@ -2,26 +2,165 @@ import os
 import uuid
 import io
 import asyncio
+import hashlib
 import json
 import logging
 import time
+import bisect
+import heapq
+import itertools
+import multiprocessing
+import threading
+import aiofiles
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import MutableMapping
 import pandas as pd
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Set, List, Callable, Awaitable
 from pathlib import Path
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect, APIRouter
+from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect, APIRouter, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
-from barebones import FileProcessor
+from barebones import JSON_SUFFIXES, OUTPUT_FORMATS, SHARD_BY, strip_json_suffix, scan_job_counts, process_files_in_worker
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Upload configuration
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Copy uploads 1 MiB at a time
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', '250')) * 1024 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # Boundaries and part headers around the file body
+SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR', 'temp')
+
+# Metrics, exposed in Prometheus text format at /api/metrics
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BYTES_BUCKETS = (64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2, 256 * 1024 ** 2)
+
+class Metric(ABC):
+    """One metric family; samples are keyed by a sorted tuple of label pairs"""
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()  # Updated from executor threads and the event loop
+
+    @staticmethod
+    def _key(labels: dict) -> tuple:
+        return tuple(sorted(labels.items()))
+
+    @staticmethod
+    def _format_labels(key: tuple, extra: tuple = ()) -> str:
+        pairs = key + extra
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for this family, without the HELP/TYPE header"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._format_labels(key)} {value}" for key, value in self._values.items()]
+
+    def hit_ratios(self) -> Dict[tuple, float]:
+        """hit / (hit + miss) per `cache` label, for counters labelled cache/result"""
+        totals: Dict[str, list] = {}
+        with self._lock:
+            for key, value in self._values.items():
+                labels = dict(key)
+                entry = totals.setdefault(labels.get('cache', ''), [0, 0])
+                entry[0 if labels.get('result') == 'hit' else 1] += value
+        return {(('cache', cache),): hits / (hits + misses) for cache, (hits, misses) in totals.items() if hits + misses}
+
+class Gauge(Metric):
+    """Gauge whose value is read from `collect` at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Dict[tuple, float]]):
+        super().__init__(name, documentation)
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in self.collect().items()]
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: tuple = SECONDS_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = buckets
+        self._values: Dict[tuple, list] = {}  # key -> [per-bucket counts..., count, sum]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry[index] += 1
+            entry[-2] += 1
+            entry[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, entry in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{self._format_labels(key, (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{self._format_labels(key, (('le', '+Inf'),))} {entry[-2]}")
+                lines.append(f"{self.name}_count{self._format_labels(key)} {entry[-2]}")
+                lines.append(f"{self.name}_sum{self._format_labels(key)} {entry[-1]}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+metrics = MetricsRegistry()
+upload_bytes = metrics.register(Histogram('barebones_upload_bytes', 'Size of accepted uploads in bytes', BYTES_BUCKETS))
+uploads_rejected = metrics.register(Counter('barebones_uploads_rejected_total', 'Uploads refused before processing, by reason'))
+queue_wait_seconds = metrics.register(Histogram('barebones_queue_wait_seconds', 'Time a job waited in the scheduler queue'))
+job_seconds = metrics.register(Histogram('barebones_job_seconds', 'End-to-end processing time per job, by lane'))
+jobs_finished = metrics.register(Counter('barebones_jobs_total', 'Finished jobs by outcome'))
+stage_seconds = metrics.register(Histogram('barebones_stage_seconds', 'FileProcessor time per pipeline stage'))
+items_processed = metrics.register(Counter('barebones_items_processed_total', 'Poles and connections processed'))
+output_rows = metrics.register(Counter('barebones_output_rows_total', 'Rows written to the output workbook, by sheet'))
+cache_lookups = metrics.register(Counter('barebones_cache_lookups_total', 'FileProcessor cache lookups by cache and result'))
+
 # Create FastAPI app
 app = FastAPI(title="MakeReady Report Generator API")
 
@@ -37,41 +176,595 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def rate_limited_response(retry_after: float) -> JSONResponse:
+    uploads_rejected.inc(reason='rate_limited')
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many uploads. Please wait before uploading again."},
+        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+    )
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized, rate-limited and queue-full uploads before the body is read.
+
+    This has to happen here: by the time upload_file runs, its UploadFile
+    parameter means the whole multipart body has already been received.
+    """
+    if request.method == "POST" and request.url.path == "/api/upload":
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+            uploads_rejected.inc(reason='too_large')
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"File too large. Maximum upload size is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."}
+            )
+        # Only peek at the client's bucket here; upload_file takes the token once
+        # the upload has passed validation, so a 400 doesn't cost quota
+        retry_after = rate_limiter.retry_after(client_id_for(request))
+        if retry_after:
+            return rate_limited_response(retry_after)
+        if scheduler.is_full():
+            uploads_rejected.inc(reason='queue_full')
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "The processing queue is full. Please try again shortly."},
+                headers={"Retry-After": "30"}
+            )
+    return await call_next(request)
+
+# Task listing configuration
+DEFAULT_TASK_PAGE_SIZE = 50
+MAX_TASK_PAGE_SIZE = 500
+MAX_BULK_STATUS_IDS = 1000
+
+class TaskStore(MutableMapping):
+    """In-memory task entries plus an index for listing without touching every task.
+
+    Each task gets a sequence number when it is added. `_order` holds all sequence
+    numbers and `_by_status` one sorted list per status, so a page is a bisect to the
+    cursor followed by a slice. Status changes must go through `set_status` to keep
+    the index current.
+    """
+    def __init__(self):
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._seq_counter = itertools.count(1)
+        self._seq: Dict[str, int] = {}
+        self._task_at: Dict[int, str] = {}
+        self._order: List[int] = []
+        self._by_status: Dict[str, List[int]] = {}
+
+    def __getitem__(self, task_id: str) -> Dict[str, Any]:
+        return self._tasks[task_id]
+
+    def __setitem__(self, task_id: str, task: Dict[str, Any]):
+        if task_id in self._tasks:
+            del self[task_id]
+        seq = next(self._seq_counter)
+        self._tasks[task_id] = task
+        self._seq[task_id] = seq
+        self._task_at[seq] = task_id
+        self._order.append(seq)  # Sequence numbers only grow, so this stays sorted
+        self._by_status.setdefault(task.get('status', ''), []).append(seq)
+
+    def __delitem__(self, task_id: str):
+        task = self._tasks.pop(task_id)
+        seq = self._seq.pop(task_id)
+        del self._task_at[seq]
+        self._remove_seq(self._order, seq)
+        self._remove_seq(self._by_status.get(task.get('status', ''), []), seq)
+
+    def __iter__(self):
+        return iter(self._tasks)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    @staticmethod
+    def _remove_seq(seqs: List[int], seq: int):
+        idx = bisect.bisect_left(seqs, seq)
+        if idx < len(seqs) and seqs[idx] == seq:
+            seqs.pop(idx)
+
+    def set_status(self, task_id: str, status: str):
+        """Change a task's status and move it to the matching index list"""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+        old_status = task.get('status', '')
+        if old_status == status:
+            return
+        seq = self._seq[task_id]
+        self._remove_seq(self._by_status.get(old_status, []), seq)
+        bisect.insort(self._by_status.setdefault(status, []), seq)
+        task['status'] = status
+
+    def status_counts(self) -> Dict[str, int]:
+        return {status: len(seqs) for status, seqs in self._by_status.items()}
+
+    def _created_at(self, seq: int) -> datetime:
+        return datetime.fromisoformat(self._tasks[self._task_at[seq]]['created'])
+
+    def _window(self, seqs: List[int], since: Optional[datetime], cursor: Optional[int], size: int) -> List[int]:
+        """Up to `size` sequence numbers of one sorted list, from the first one past since/cursor"""
+        start = 0
+        if since is not None:
+            # 'created' timestamps are assigned in sequence order, so they are sorted too
+            start = bisect.bisect_left(seqs, since, key=self._created_at)
+        if cursor is not None:
+            start = max(start, bisect.bisect_right(seqs, cursor))
+        return seqs[start:start + size]
+
+    def page(self, statuses: Optional[List[str]] = None, since: Optional[datetime] = None,
+             cursor: Optional[int] = None, limit: int = DEFAULT_TASK_PAGE_SIZE) -> tuple:
+        """Tasks in creation order, optionally filtered by status and creation time.
+
+        `since` is a naive local datetime, like the stored 'created' values.
+        Returns (tasks, next_cursor); next_cursor is None on the last page.
+        """
+        if statuses:
+            # A page can't hold more than limit + 1 entries of any one status list,
+            # so only that much of each list is merged
+            windows = [self._window(self._by_status.get(status, []), since, cursor, limit + 1)
+                       for status in set(statuses)]
+            window = list(itertools.islice(heapq.merge(*windows), limit + 1))
+        else:
+            window = self._window(self._order, since, cursor, limit + 1)
+        tasks = [self._tasks[self._task_at[seq]] for seq in window[:limit]]
+        next_cursor = window[limit - 1] if len(window) > limit else None
+        return tasks, next_cursor
+
 # In-memory storage for processing tasks
-processing_tasks: Dict[str, Dict[str, Any]] = {}
+processing_tasks = TaskStore()
+
+# WebSocket broadcast configuration
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get('WS_SUBSCRIBER_QUEUE_SIZE', '16'))  # Pending messages per client
+BROADCAST_BATCH_INTERVAL = 0.05  # Seconds the fan-out task waits to coalesce a burst of updates
+
+class Subscriber:
+    """One WebSocket watching a task, with its own bounded outbox"""
+    def __init__(self, websocket: WebSocket, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.sender: Optional[asyncio.Task] = None
+
+    def offer(self, message: dict):
+        """Queue a message without waiting; drop the oldest one if the outbox is full"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(message)
+
+# Server-sent events configuration
+EVENT_LOG_SIZE = 64  # Status events kept per task for Last-Event-ID resumption
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_MS = 3000
+TERMINAL_STATUSES = {'complete', 'failed'}
+
+class TaskEventLog:
+    """Recent status events per task, numbered so SSE clients can resume"""
+    def __init__(self, size: int = EVENT_LOG_SIZE):
+        self.size = size
+        self._events: Dict[str, deque] = {}
+        self._last_id: Dict[str, int] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+
+    def append(self, task_id: str, message: dict) -> int:
+        event_id = self._last_id.get(task_id, 0) + 1
+        self._last_id[task_id] = event_id
+        self._events.setdefault(task_id, deque(maxlen=self.size)).append((event_id, message))
+        changed = self._changed.pop(task_id, None)
+        if changed:
+            changed.set()
+        return event_id
 
-# WebSocket connection manager
+    def since(self, task_id: str, last_event_id: int) -> list:
+        """Events newer than last_event_id. Statuses are full snapshots, so a client
+        whose id is unknown (e.g. from before a restart) just gets the newest one."""
+        events = self._events.get(task_id)
+        if not events:
+            return []
+        if last_event_id > self._last_id[task_id]:
+            return [events[-1]]
+        return [event for event in events if event[0] > last_event_id]
+
+    async def wait(self, task_id: str, timeout: float) -> bool:
+        """Wait for the next event on task_id; False on timeout"""
+        changed = self._changed.setdefault(task_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def discard(self, task_id: str):
+        self._events.pop(task_id, None)
+        self._last_id.pop(task_id, None)
+        changed = self._changed.pop(task_id, None)
+        if changed:
+            changed.set()
+
+# WebSocket connection manager (pub/sub: many subscribers per task)
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+        self.active_connections: Dict[str, Set[Subscriber]] = {}
+        self.events = TaskEventLog()
+        self._pending: Dict[str, dict] = {}  # Latest unsent status per task
+        self._wakeup: Optional[asyncio.Event] = None
+        self._fanout_task: Optional[asyncio.Task] = None
 
-    async def connect(self, websocket: WebSocket, task_id: str):
+    async def connect(self, websocket: WebSocket, task_id: str) -> Subscriber:
         await websocket.accept()
-        self.active_connections[task_id] = websocket
+        subscriber = Subscriber(websocket)
+        self.active_connections.setdefault(task_id, set()).add(subscriber)
+        subscriber.sender = asyncio.create_task(self._pump(task_id, subscriber))
+        return subscriber
 
-    def disconnect(self, task_id: str):
-        if task_id in self.active_connections:
+    def disconnect(self, task_id: str, subscriber: Subscriber):
+        """Unsubscribe; safe to call more than once for the same subscriber"""
+        subscribers = self.active_connections.get(task_id)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
             del self.active_connections[task_id]
+        if subscriber.sender and subscriber.sender is not asyncio.current_task():
+            subscriber.sender.cancel()
+        if subscriber.dropped:
+            logger.info(f"WebSocket subscriber for task {task_id} dropped {subscriber.dropped} stale updates")
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self.active_connections.values())
 
     async def send_status(self, task_id: str, data: dict):
-        if task_id in self.active_connections:
-            try:
-                # Create a JSON-serializable version of the task data
-                serializable_data = {
-                    "task_id": data.get("task_id"),
-                    "filename": data.get("filename"),
-                    "status": data.get("status"),
-                    "created": data.get("created"),
-                    "progress": data.get("progress", 0),
-                    "files": data.get("files", []),
-                    "error": data.get("error")
-                }
-                await self.active_connections[task_id].send_json(serializable_data)
-            except Exception as e:
-                logger.error(f"Error sending WebSocket message: {e}")
+        """Publish a status update. Never waits on a client: the fan-out task delivers it."""
+        # Snapshot now - the task dict keeps changing while the update is pending
+        message = serialize_task(data)
+        self.events.append(task_id, message)
+        if task_id not in self.active_connections:
+            return
+        self._pending[task_id] = message
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._fanout_task is None or self._fanout_task.done():
+            self._fanout_task = asyncio.create_task(self._fanout())
+
+    async def _fanout(self):
+        """Batch pending updates and copy each into its subscribers' outboxes"""
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(BROADCAST_BATCH_INTERVAL)
+            self._wakeup.clear()
+            pending, self._pending = self._pending, {}
+            for task_id, message in pending.items():
+                for subscriber in list(self.active_connections.get(task_id, ())):
+                    subscriber.offer(message)
+
+    async def _pump(self, task_id: str, subscriber: Subscriber):
+        """Drain one subscriber's outbox; a slow client only delays itself"""
+        try:
+            while True:
+                message = await subscriber.queue.get()
+                await subscriber.websocket.send_json(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending WebSocket message: {e}")
+            self.disconnect(task_id, subscriber)
 
 manager = ConnectionManager()
 
+# Admission control configuration
+MAX_CONCURRENT_JOBS = int(os.environ.get('MAX_CONCURRENT_JOBS', '2'))
+MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', '50'))
+UPLOAD_RATE_PER_MINUTE = float(os.environ.get('UPLOAD_RATE_PER_MINUTE', '10'))
+UPLOAD_BURST = int(os.environ.get('UPLOAD_BURST', '5'))
+RATE_LIMITER_MAX_CLIENTS = 10000  # Idle buckets are pruned beyond this many clients
+# Proxies in front of the app that append to X-Forwarded-For (1: the Heroku router; 0: no proxy)
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '1'))
+FAST_LANE_SLOTS = int(os.environ.get('FAST_LANE_SLOTS', '1'))
+FAST_JOB_MAX_SECONDS = float(os.environ.get('FAST_JOB_MAX_SECONDS', '5'))
+
+# Job cost model (seconds); tune from the "Job cost for task" log lines.
+# Linear: rows are built from the ConnectionGraph, with no per-row scan over all connections.
+JOB_COST_BASE_S = 0.05
+JOB_COST_PER_MB_S = 0.02
+JOB_COST_PER_NODE_S = 0.0005
+JOB_COST_PER_CONNECTION_S = 0.0005
+
+def estimate_job_seconds(size_bytes: int, counts: Optional[dict]) -> float:
+    """Estimated processing time from the upload size and the pre-scan counts"""
+    estimate = JOB_COST_BASE_S + JOB_COST_PER_MB_S * size_bytes / (1024 * 1024)
+    if counts:
+        estimate += (JOB_COST_PER_NODE_S * counts['nodes']
+                     + JOB_COST_PER_CONNECTION_S * counts['connections'])
+    return round(estimate, 3)
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at MAX_QUEUED_JOBS"""
+
+class TokenBucket:
+    """Classic token bucket: `capacity` burst, refilled at `rate` tokens per second"""
+    def __init__(self, rate: float, capacity: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take one token. Returns 0 on success, otherwise seconds until one is available."""
+        wait = self.peek()
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+    def peek(self) -> float:
+        """Like take(), without taking the token"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+class ClientRateLimiter:
+    """Per-client token buckets keyed by client address"""
+    def __init__(self, per_minute: float = UPLOAD_RATE_PER_MINUTE, burst: int = UPLOAD_BURST,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.clock = clock
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def check(self, client_id: str) -> float:
+        """0 if the client may proceed, otherwise the Retry-After in seconds"""
+        if len(self.buckets) > RATE_LIMITER_MAX_CLIENTS:
+            self.buckets = {key: bucket for key, bucket in self.buckets.items() if not bucket.is_full()}
+        bucket = self.buckets.get(client_id)
+        if bucket is None:
+            bucket = self.buckets[client_id] = TokenBucket(self.rate, self.burst, self.clock)
+        return bucket.take()
+
+    def retry_after(self, client_id: str) -> float:
+        """check() without using up a token: 0 if the client has one left"""
+        bucket = self.buckets.get(client_id)
+        return bucket.peek() if bucket is not None else 0.0
+
+class JobScheduler:
+    """Runs at most `max_concurrency` jobs across two lanes.
+
+    Jobs estimated to finish within FAST_JOB_MAX_SECONDS go to the fast lane,
+    served shortest-job-first; everything else waits in a FIFO normal lane.
+    `fast_lane_slots` of the concurrency are reserved for the fast lane so a
+    quick check never waits behind a large export. Both lanes share the
+    `max_queued` cap.
+    """
+    def __init__(self, max_concurrency: int = MAX_CONCURRENT_JOBS, max_queued: int = MAX_QUEUED_JOBS,
+                 fast_lane_slots: int = FAST_LANE_SLOTS, fast_job_max_seconds: float = FAST_JOB_MAX_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        # Always leave the normal lane at least one slot
+        self.fast_lane_slots = max(0, min(fast_lane_slots, max_concurrency - 1))
+        self.fast_job_max_seconds = fast_job_max_seconds
+        self._fast: list = []  # heap of (estimated_seconds, seq, task_id, job factory)
+        self._normal: deque = deque()  # (task_id, job factory)
+        self._seq = itertools.count()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._running_normal: Set[str] = set()
+        self._submitted_at: Dict[str, float] = {}  # For the queue wait metric
+
+    def is_full(self) -> bool:
+        return len(self._fast) + len(self._normal) >= self.max_queued
+
+    def queued_count(self, lane: str) -> int:
+        return len(self._fast) if lane == 'fast' else len(self._normal)
+
+    def running_count(self) -> int:
+        return len(self._running)
+
+    def lane_for(self, estimated_seconds: Optional[float]) -> str:
+        if estimated_seconds is not None and estimated_seconds <= self.fast_job_max_seconds:
+            return 'fast'
+        return 'normal'
+
+    async def submit(self, task_id: str, job: Callable[[], Awaitable[Any]], estimated_seconds: Optional[float] = None):
+        """Queue a job; raises QueueFullError when the queue is at capacity"""
+        if self.is_full():
+            raise QueueFullError(task_id)
+        self._submitted_at[task_id] = time.monotonic()
+        if self.lane_for(estimated_seconds) == 'fast':
+            heapq.heappush(self._fast, (estimated_seconds, next(self._seq), task_id, job))
+        else:
+            self._normal.append((task_id, job))
+        await self._dispatch()
+
+    async def cancel(self, task_id: str) -> bool:
+        """Drop a job that has not started yet; returns False if it isn't queued"""
+        for index, entry in enumerate(self._fast):
+            if entry[2] == task_id:
+                self._fast.pop(index)
+                heapq.heapify(self._fast)
+                break
+        else:
+            for entry in self._normal:
+                if entry[0] == task_id:
+                    self._normal.remove(entry)
+                    break
+            else:
+                return False
+        self._submitted_at.pop(task_id, None)
+        await self._dispatch()
+        return True
+
+    def _next_job(self):
+        """Pop the next startable (task_id, job, lane), or None when no slot fits"""
+        if len(self._running) >= self.max_concurrency:
+            return None
+        if self._fast:
+            _, _, task_id, job = heapq.heappop(self._fast)
+            return task_id, job, 'fast'
+        if self._normal and len(self._running_normal) < self.max_concurrency - self.fast_lane_slots:
+            task_id, job = self._normal.popleft()
+            return task_id, job, 'normal'
+        return None
+
+    async def _dispatch(self):
+        """Start queued jobs while there is capacity, then publish new queue positions"""
+        while True:
+            next_job = self._next_job()
+            if next_job is None:
+                break
+            task_id, job, lane = next_job
+            task = processing_tasks.get(task_id)
+            if task is not None:
+                task['queue_position'] = None
+            if lane == 'normal':
+                self._running_normal.add(task_id)
+            submitted_at = self._submitted_at.pop(task_id, None)
+            if submitted_at is not None:
+                queue_wait_seconds.observe(time.monotonic() - submitted_at, lane=lane)
+            self._running[task_id] = asyncio.create_task(self._run(task_id, job, lane))
+        
+        # Positions count fast-lane jobs (in SJF order) ahead of the normal lane
+        waiting = [task_id for _, _, task_id, _ in sorted(self._fast)]
+        waiting.extend(task_id for task_id, _ in self._normal)
+        for position, task_id in enumerate(waiting, 1):
+            task = processing_tasks.get(task_id)
+            if task is not None and task.get('queue_position') != position:
+                task['queue_position'] = position
+                await manager.send_status(task_id, task)
+
+    async def _run(self, task_id: str, job: Callable[[], Awaitable[Any]], lane: str):
+        started = time.monotonic()
+        try:
+            await job()
+        finally:
+            self._running.pop(task_id, None)
+            self._running_normal.discard(task_id)
+            elapsed = time.monotonic() - started
+            job_seconds.observe(elapsed, lane=lane)
+            self._log_estimate_error(task_id, elapsed)
+            await self._dispatch()
+
+    def _log_estimate_error(self, task_id: str, actual_seconds: float):
+        """Log estimate vs. actual run time so the JOB_COST_* coefficients can be tuned"""
+        task = processing_tasks.get(task_id)
+        if task is None or task.get('estimated_seconds') is None:
+            return
+        estimated = task['estimated_seconds']
+        logger.info(
+            f"Job cost for task {task_id}: estimated {estimated:.2f}s, actual {actual_seconds:.2f}s, "
+            f"error {actual_seconds - estimated:+.2f}s "
+            f"(lane={task.get('lane')}, size_bytes={task.get('size_bytes')}, "
+            f"nodes={task.get('node_count')}, connections={task.get('connection_count')}, status={task.get('status')})"
+        )
+
+scheduler = JobScheduler()
+rate_limiter = ClientRateLimiter()
+
+metrics.register(Gauge('barebones_websocket_connections', 'Open WebSocket subscribers',
+                       lambda: {(): manager.subscriber_count()}))
+metrics.register(Gauge('barebones_tasks', 'Tasks held in the task store, by status',
+                       lambda: {(('status', status),): count for status, count in processing_tasks.status_counts().items()}))
+metrics.register(Gauge('barebones_jobs_queued', 'Jobs waiting in the scheduler, by lane',
+                       lambda: {(('lane', lane),): scheduler.queued_count(lane) for lane in ('fast', 'normal')}))
+metrics.register(Gauge('barebones_jobs_running', 'Jobs currently running',
+                       lambda: {(): scheduler.running_count()}))
+metrics.register(Gauge('barebones_cache_hit_ratio', 'Lifetime hit ratio per FileProcessor cache',
+                       lambda: cache_lookups.hit_ratios()))
+
+def record_processor_metrics(snapshot: dict):
+    """Fold one job's FileProcessor.metrics_snapshot() into the service metrics"""
+    for stage, seconds in snapshot.get('stage_seconds', {}).items():
+        stage_seconds.observe(seconds, stage=stage)
+    counters = snapshot.get('counters', {})
+    for kind in ('poles', 'connections'):
+        if kind in counters:
+            items_processed.inc(counters[kind], kind=kind)
+    for sheet in ('main', 'refs'):
+        if f'output_rows_{sheet}' in counters:
+            output_rows.inc(counters[f'output_rows_{sheet}'], sheet=sheet)
+    for cache, stats in snapshot.get('cache', {}).items():
+        cache_lookups.inc(stats['hits'], cache=cache, result='hit')
+        cache_lookups.inc(stats['misses'], cache=cache, result='miss')
+
+# Worker processes: FileProcessor runs in a child process per job so a cancelled
+# job can be killed outright. forkserver (preloading barebones) keeps start-up
+# cheap without forking the threaded server; spawn is the fallback off Unix.
+CANCEL_GRACE_SECONDS = 0.5  # Time to stop at the next cancellation check before the worker is killed
+WORKER_POLL_SECONDS = 0.1
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    worker_context = multiprocessing.get_context('forkserver')
+    worker_context.set_forkserver_preload(['barebones'])
+else:
+    worker_context = multiprocessing.get_context('spawn')
+
+def run_processor_worker(output_directory: str, spool_path: str, cancel_event,
+                         profile: bool = False, log_detail: bool = False, output_format: str = 'xlsx',
+                         shard_by: Optional[str] = None, shard_size: Optional[int] = None) -> tuple:
+    """Run FileProcessor in a worker process, killing it if cancel_event stays set.
+
+    Returns (success, metrics snapshot or None).
+    """
+    metrics_reader, metrics_writer = worker_context.Pipe(duplex=False)
+    worker = worker_context.Process(
+        target=process_files_in_worker,
+        args=(output_directory, spool_path, cancel_event, metrics_writer, profile, log_detail, output_format,
+              shard_by, shard_size),
+        # Not a daemon so sharded jobs can start their own writer processes;
+        # shutdown_event cancels running jobs instead
+        daemon=False
+    )
+    worker.start()
+    metrics_writer.close()
+    while worker.is_alive() and not cancel_event.is_set():
+        worker.join(WORKER_POLL_SECONDS)
+    if worker.is_alive():
+        # Cancelled: FileProcessor checks the event between nodes/connections
+        worker.join(CANCEL_GRACE_SECONDS)
+        if worker.is_alive():
+            logger.info(f"Killing worker {worker.pid} for cancelled job {spool_path}")
+            worker.kill()
+            worker.join()
+    snapshot = None
+    try:
+        if metrics_reader.poll():
+            snapshot = metrics_reader.recv()
+    except EOFError:
+        pass  # Killed before it reported
+    finally:
+        metrics_reader.close()
+    return not cancel_event.is_set() and worker.exitcode == 0, snapshot
+
+async def cancel_task(task_id: str):
+    """Stop a task's job (queued or running) and forget the task"""
+    task = processing_tasks.pop(task_id, None)
+    manager.events.discard(task_id)
+    if task is None:
+        return
+    if task.get('cancel_event') is not None:
+        task['cancel_event'].set()
+    if await scheduler.cancel(task_id):
+        spool_path = task.get('spool_path')
+        if spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
+    bundle_path = task.get('bundle_path')
+    if bundle_path and os.path.exists(bundle_path):
+        os.remove(bundle_path)
+
 # Pydantic models
 class TaskStatus(BaseModel):
     task_id: str
@@ -81,6 +774,29 @@ class TaskStatus(BaseModel):
     progress: Optional[int] = 0
     files: Optional[list] = []
     error: Optional[str] = None
+    size_bytes: Optional[int] = None
+    sha256: Optional[str] = None
+    queue_position: Optional[int] = None
+    node_count: Optional[int] = None
+    connection_count: Optional[int] = None
+    estimated_seconds: Optional[float] = None
+    lane: Optional[str] = None
+    profile: bool = False
+    log_detail: bool = False
+    output_format: str = 'xlsx'
+    shard_by: Optional[str] = None
+    shard_size: Optional[int] = None
+
+class TaskListResponse(BaseModel):
+    tasks: List[TaskStatus]
+    next_cursor: Optional[str] = None
+
+class BulkStatusRequest(BaseModel):
+    task_ids: List[str]
+
+class BulkStatusResponse(BaseModel):
+    tasks: List[TaskStatus]
+    missing: List[str] = []
 
 class UploadResponse(BaseModel):
     task_id: str
@@ -88,17 +804,68 @@ class UploadResponse(BaseModel):
     status: str
 
 # Helper functions
+def serialize_task(task: dict) -> dict:
+    """JSON-serializable view of a task entry (drops the in-memory file buffers)"""
+    return TaskStatus(**task).model_dump()
+
+def client_id_for(request: Request) -> str:
+    """Identify the uploading client; behind the Heroku router the peer is the router.
+
+    Each trusted proxy appends the address it received the request from, so the
+    client is the TRUSTED_PROXY_HOPS-th entry from the end. Entries before that
+    are whatever the client sent and can't be used as its identity.
+    """
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for and TRUSTED_PROXY_HOPS > 0:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        if hops:
+            return hops[max(0, len(hops) - TRUSTED_PROXY_HOPS)]
+    return request.client.host if request.client else "unknown"
+
 def allowed_file(filename: str) -> bool:
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() == 'json'
+    return filename.lower().endswith(JSON_SUFFIXES)
 
-async def process_file_async(file_content: bytes, filename: str, task_id: str):
+async def spool_upload(file: UploadFile, spool_path: str) -> tuple:
+    """Stream an upload to spool_path in chunks, hashing as we go.
+
+    Returns (size_bytes, sha256_hex). Raises HTTPException(413) as soon as the
+    size limit is crossed; the partial spool file is removed in that case.
+    """
+    sha256 = hashlib.sha256()
+    size_bytes = 0
+    try:
+        async with aiofiles.open(spool_path, 'wb') as spool:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size_bytes += len(chunk)
+                if size_bytes > MAX_UPLOAD_BYTES:
+                    uploads_rejected.inc(reason='too_large')
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum upload size is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."
+                    )
+                sha256.update(chunk)
+                await spool.write(chunk)
+    except BaseException:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+        raise
+    return size_bytes, sha256.hexdigest()
+
+async def process_file_async(spool_path: str, filename: str, task_id: str):
     """Process file asynchronously"""
     logger.info(f"Starting async processing for task {task_id}")
+    if task_id not in processing_tasks:
+        return  # Deleted before the job started
     
     try:
         # Update status to processing
-        processing_tasks[task_id]['status'] = 'processing'
+        processing_tasks.set_status(task_id, 'processing')
         processing_tasks[task_id]['progress'] = 10
+        # Set by DELETE; created here, on the event loop, so a DELETE can't slip in first
+        processing_tasks[task_id]['cancel_event'] = worker_context.Event()
         
         # Send WebSocket update
         await manager.send_status(task_id, processing_tasks[task_id])
@@ -108,43 +875,44 @@ async def process_file_async(file_content: bytes, filename: str, task_id: str):
         result = await loop.run_in_executor(
             None, 
             process_file_sync, 
-            file_content, 
+            spool_path, 
             filename, 
             task_id
         )
         
-        if result:
-            processing_tasks[task_id]['status'] = 'complete'
+        if task_id not in processing_tasks:
+            logger.info(f"Task {task_id} was cancelled")
+            jobs_finished.inc(status='cancelled')
+        elif result:
+            jobs_finished.inc(status='complete')
+            processing_tasks.set_status(task_id, 'complete')
             processing_tasks[task_id]['progress'] = 100
             await manager.send_status(task_id, processing_tasks[task_id])
         else:
-            processing_tasks[task_id]['status'] = 'failed'
+            jobs_finished.inc(status='failed')
+            processing_tasks.set_status(task_id, 'failed')
             processing_tasks[task_id]['error'] = 'Processing failed'
             await manager.send_status(task_id, processing_tasks[task_id])
             
     except Exception as e:
         logger.error(f"Error in async processing: {str(e)}")
-        processing_tasks[task_id]['status'] = 'failed'
+        jobs_finished.inc(status='failed')
+        if task_id not in processing_tasks:
+            return
+        processing_tasks.set_status(task_id, 'failed')
         processing_tasks[task_id]['error'] = str(e)
         await manager.send_status(task_id, processing_tasks[task_id])
 
-def process_file_sync(file_content: bytes, filename: str, task_id: str) -> bool:
-    """Process file synchronously using FileProcessor"""
+def process_file_sync(spool_path: str, filename: str, task_id: str) -> bool:
+    """Process the spooled upload synchronously using FileProcessor"""
     logger.info(f"Starting sync processing for task {task_id}")
     
-    # Create a temp directory if it doesn't exist
-    os.makedirs('temp', exist_ok=True)
-    
-    # Use a path within the temp directory
-    temp_file_path = os.path.join('temp', f"{task_id}_{filename}")
-    
     try:
-        # Save temp file for processing
-        with open(temp_file_path, 'wb') as f:
-            f.write(file_content)
+        # Hold on to the entry; a DELETE removes it from the store mid-run
+        task = processing_tasks[task_id]
         
         # Update progress
-        processing_tasks[task_id]['progress'] = 30
+        task['progress'] = 30
         
         # Determine output directory based on environment
         if os.environ.get('DYNO') or os.environ.get('RENDER'):  # Heroku or Render
@@ -154,18 +922,23 @@ def process_file_sync(file_content: bytes, filename: str, task_id: str) -> bool:
             output_directory = os.path.join(tempfile.gettempdir(), "barebones_fastapi_outputs")
             os.makedirs(output_directory, exist_ok=True)
 
-        # Initialize the processor with the determined output directory
-        processor = FileProcessor(output_dir=output_directory)
-        
-        # Get filename without extension for output naming
-        base_filename = os.path.splitext(filename)[0]
+        # Get filename without extension (.json, .json.gz, .json.zst) for output naming
+        base_filename = strip_json_suffix(filename)
         
-        # Process the file
-        success = processor.process_files(temp_file_path)
+        # Process the spooled upload in place - it was written once by upload_file.
+        # FileProcessor runs in a worker process that DELETE can stop.
+        success, snapshot = run_processor_worker(
+            output_directory, spool_path, task['cancel_event'],
+            profile=task.get('profile', False), log_detail=task.get('log_detail', False),
+            output_format=task.get('output_format', 'xlsx'),
+            shard_by=task.get('shard_by'), shard_size=task.get('shard_size')
+        )
+        if snapshot:
+            record_processor_metrics(snapshot)
         
         if success:
             # Update progress
-            processing_tasks[task_id]['progress'] = 70
+            task['progress'] = 70
             
             # Store output files in memory
             output_files = []
@@ -183,76 +956,129 @@ def process_file_sync(file_content: bytes, filename: str, task_id: str) -> bool:
             # The base name used by FileProcessor includes the task_id: f"{task_id}_{original_base_filename}"
             
             # 'base_filename' here is from the original uploaded file (e.g., "CPS_6457E_03")
-            # The FileProcessor uses a base name derived from its input, which is `temp_file_path`
+            # The FileProcessor uses a base name derived from its input, which is `spool_path`
             # So, the pattern for searching should be based on "{task_id}_{base_filename}_Output_"
             
             search_prefix_for_processor_outputs = f"{task_id}_{base_filename}"
-            logger.info(f"Searching for files in {processor.downloads_path} with prefix pattern: {search_prefix_for_processor_outputs}")
+            logger.info(f"Searching for files in {output_directory} with prefix pattern: {search_prefix_for_processor_outputs}")
 
-            generated_files_in_processor_path = os.listdir(processor.downloads_path)
+            generated_files_in_processor_path = os.listdir(output_directory)
+
+            # The workbook downloads as type=excel, flat exports as type=csv / type=parquet
+            # and sharded workbooks as type=bundle (a ZIP streamed from disk)
+            output_format = task.get('output_format', 'xlsx')
+            output_suffix = OUTPUT_FORMATS[output_format]
+            output_type = 'excel' if output_format == 'xlsx' else output_format
+            if task.get('shard_by'):
+                output_format, output_suffix, output_type = 'bundle', '.zip', 'bundle'
 
             potential_excel_files = [
-                f for f in generated_files_in_processor_path if f.startswith(f"{search_prefix_for_processor_outputs}_Output_") and f.endswith(".xlsx")
+                f for f in generated_files_in_processor_path if f.startswith(f"{search_prefix_for_processor_outputs}_Output_") and f.endswith(output_suffix)
             ]
             potential_log_files = [
                 f for f in generated_files_in_processor_path if f.startswith(f"{search_prefix_for_processor_outputs}_Log_") and f.endswith(".txt")
             ]
+            potential_report_files = [
+                f for f in generated_files_in_processor_path if f.startswith(f"{search_prefix_for_processor_outputs}_Report_") and f.endswith(".json")
+            ]
+            potential_profile_files = [
+                f for f in generated_files_in_processor_path if f.startswith(f"{search_prefix_for_processor_outputs}_Profile_") and f.endswith(".zip")
+            ]
+            potential_detail_files = [
+                f for f in generated_files_in_processor_path if f.startswith(f"{search_prefix_for_processor_outputs}_LogDetail_") and f.endswith(".jsonl")
+            ]
 
             excel_data = None
             log_data = None
 
             if potential_excel_files:
-                potential_excel_files.sort(key=lambda f: os.path.getmtime(os.path.join(processor.downloads_path, f)), reverse=True)
+                potential_excel_files.sort(key=lambda f: os.path.getmtime(os.path.join(output_directory, f)), reverse=True)
                 latest_excel_filename_from_processor = potential_excel_files[0]
-                excel_path = os.path.join(processor.downloads_path, latest_excel_filename_from_processor)
+                excel_path = os.path.join(output_directory, latest_excel_filename_from_processor)
                 
                 # For download, we use the original base_filename and task_id for user-friendliness
-                excel_download_filename = f"{base_filename}_{task_id}.xlsx" 
-                
-                with open(excel_path, 'rb') as f:
-                    excel_data = io.BytesIO(f.read())
+                excel_download_filename = f"{base_filename}_{task_id}{output_suffix}" 
                 
-                processing_tasks[task_id]['excel_data'] = excel_data
-                output_files.append({'type': 'excel', 'filename': excel_download_filename})
-                logger.info(f"Found and stored Excel file: {latest_excel_filename_from_processor} (download as {excel_download_filename}) for task {task_id}")
+                if output_type == 'bundle':
+                    # Shard bundles can be large; keep them on disk until the task is cleaned up
+                    task['bundle_path'] = excel_path
+                else:
+                    with open(excel_path, 'rb') as f:
+                        excel_data = io.BytesIO(f.read())
+                    task[f'{output_type}_data'] = excel_data
+                output_files.append({'type': output_type, 'filename': excel_download_filename})
+                logger.info(f"Found and stored {output_format} output file: {latest_excel_filename_from_processor} (download as {excel_download_filename}) for task {task_id}")
             else:
-                logger.warning(f"No Excel file found for task {task_id} with search prefix {search_prefix_for_processor_outputs} in {processor.downloads_path}")
-                logger.warning(f"Available files in {processor.downloads_path}: {generated_files_in_processor_path}")
+                logger.warning(f"No {output_format} output file found for task {task_id} with search prefix {search_prefix_for_processor_outputs} in {output_directory}")
+                logger.warning(f"Available files in {output_directory}: {generated_files_in_processor_path}")
 
 
             if potential_log_files:
-                potential_log_files.sort(key=lambda f: os.path.getmtime(os.path.join(processor.downloads_path, f)), reverse=True)
+                potential_log_files.sort(key=lambda f: os.path.getmtime(os.path.join(output_directory, f)), reverse=True)
                 latest_log_filename_from_processor = potential_log_files[0]
-                log_path = os.path.join(processor.downloads_path, latest_log_filename_from_processor)
+                log_path = os.path.join(output_directory, latest_log_filename_from_processor)
 
                 log_download_filename = f"{base_filename}_{task_id}_Log.txt"
 
                 with open(log_path, 'rb') as f:
                     log_data = io.BytesIO(f.read())
                     
-                processing_tasks[task_id]['log_data'] = log_data
+                task['log_data'] = log_data
                 output_files.append({'type': 'log', 'filename': log_download_filename})
                 logger.info(f"Found and stored Log file: {latest_log_filename_from_processor} (download as {log_download_filename}) for task {task_id}")
             else:
-                logger.warning(f"No Log file found for task {task_id} with search prefix {search_prefix_for_processor_outputs} in {processor.downloads_path}")
-                logger.warning(f"Available files in {processor.downloads_path}: {generated_files_in_processor_path}")
+                logger.warning(f"No Log file found for task {task_id} with search prefix {search_prefix_for_processor_outputs} in {output_directory}")
+                logger.warning(f"Available files in {output_directory}: {generated_files_in_processor_path}")
+            
+            if potential_report_files:
+                potential_report_files.sort(key=lambda f: os.path.getmtime(os.path.join(output_directory, f)), reverse=True)
+                report_path = os.path.join(output_directory, potential_report_files[0])
+                report_download_filename = f"{base_filename}_{task_id}_Report.json"
+                with open(report_path, 'rb') as f:
+                    task['report_data'] = io.BytesIO(f.read())
+                # Keep the SCID -> node id index in memory for /api/tasks/{task_id}/poles/{scid}
+                task['scid_index'] = json.loads(task['report_data'].getvalue()).get('scid_index', {})
+                output_files.append({'type': 'report', 'filename': report_download_filename})
+                logger.info(f"Found and stored Report file: {potential_report_files[0]} (download as {report_download_filename}) for task {task_id}")
+            else:
+                logger.warning(f"No Report file found for task {task_id} with search prefix {search_prefix_for_processor_outputs} in {output_directory}")
+            
+            # Profile bundle only exists for uploads made with ?profile=true
+            if task.get('profile') and potential_profile_files:
+                potential_profile_files.sort(key=lambda f: os.path.getmtime(os.path.join(output_directory, f)), reverse=True)
+                profile_path = os.path.join(output_directory, potential_profile_files[0])
+                profile_download_filename = f"{base_filename}_{task_id}_Profile.zip"
+                with open(profile_path, 'rb') as f:
+                    task['profile_data'] = io.BytesIO(f.read())
+                output_files.append({'type': 'profile', 'filename': profile_download_filename})
+                logger.info(f"Found and stored Profile file: {potential_profile_files[0]} (download as {profile_download_filename}) for task {task_id}")
+            
+            # Detailed item log only exists for uploads made with ?log_detail=true
+            if task.get('log_detail') and potential_detail_files:
+                potential_detail_files.sort(key=lambda f: os.path.getmtime(os.path.join(output_directory, f)), reverse=True)
+                detail_path = os.path.join(output_directory, potential_detail_files[0])
+                detail_download_filename = f"{base_filename}_{task_id}_LogDetail.jsonl"
+                with open(detail_path, 'rb') as f:
+                    task['log_detail_data'] = io.BytesIO(f.read())
+                output_files.append({'type': 'log_detail', 'filename': detail_download_filename})
+                logger.info(f"Found and stored LogDetail file: {potential_detail_files[0]} (download as {detail_download_filename}) for task {task_id}")
             
             # Update task with files
-            processing_tasks[task_id]['files'] = output_files
-            processing_tasks[task_id]['progress'] = 90
+            task['files'] = output_files
+            task['progress'] = 90
             
             return True
         else:
             return False
             
     except Exception as e:
-        logger.error(f"Error processing file: {str(e)}")
+        logger.error(f"Error processing file: {str(e)}", exc_info=True)
         return False
     finally:
-        # Clean up temp file
+        # Clean up spool file
         try:
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
         except Exception as e:
             logger.error(f"Error removing temp file: {str(e)}")
 
@@ -262,21 +1088,57 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "ok", "version": "2.0.0", "framework": "FastAPI"}
 
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Service metrics in Prometheus text exposition format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @api_router.post("/upload", response_model=UploadResponse)
-async def upload_file(file: UploadFile = File(...)):
-    """Upload a JSON file for processing"""
+async def upload_file(request: Request, file: UploadFile = File(...), profile: bool = False, log_detail: bool = False,
+                      output_format: str = 'xlsx', shard_by: Optional[str] = None, shard_size: Optional[int] = None):
+    """Upload a JSON file for processing; ?profile=true / ?log_detail=true add extra downloads,
+    ?output_format=csv|parquet writes flat rows instead of the Excel workbook and
+    ?shard_by=operations|scid (&shard_size=N) splits the workbook into a ZIP bundle"""
     # Validate file
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file selected")
     
     if not allowed_file(file.filename):
-        raise HTTPException(status_code=400, detail="Invalid file type. Only JSON files are allowed.")
+        raise HTTPException(status_code=400, detail="Invalid file type. Only .json, .json.gz and .json.zst files are allowed.")
+    
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid output format. Use one of: {', '.join(OUTPUT_FORMATS)}.")
+    if shard_by is not None and shard_by not in SHARD_BY:
+        raise HTTPException(status_code=400, detail=f"Invalid shard_by. Use one of: {', '.join(SHARD_BY)}.")
+    if shard_by is not None and output_format != 'xlsx':
+        raise HTTPException(status_code=400, detail="Sharding is only available for xlsx output.")
+    if shard_size is not None and (shard_by is None or shard_size < 1):
+        raise HTTPException(status_code=400, detail="shard_size needs shard_by and must be at least 1.")
+    
+    # Admission: the middleware only checked that a token was left; take it now.
+    # Concurrent uploads from one client can still find the bucket empty here.
+    retry_after = rate_limiter.check(client_id_for(request))
+    if retry_after:
+        return rate_limited_response(retry_after)
     
     # Generate task ID
     task_id = str(uuid.uuid4())
     
-    # Read file content
-    content = await file.read()
+    # Stream the upload to a spool file; the processor reads it from there
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    spool_path = os.path.join(SPOOL_DIR, f"{task_id}_{os.path.basename(file.filename)}")
+    size_bytes, sha256 = await spool_upload(file, spool_path)
+    logger.info(f"Spooled {size_bytes} bytes for task {task_id} (sha256 {sha256})")
+    upload_bytes.observe(size_bytes)
+    
+    # Pre-scan node/connection counts for the cost estimate; a file that can't be
+    # scanned falls back to a size-only estimate and fails later in processing
+    try:
+        counts = await asyncio.get_event_loop().run_in_executor(None, scan_job_counts, spool_path)
+    except Exception as e:
+        logger.warning(f"Pre-scan failed for task {task_id}: {str(e)}")
+        counts = None
+    estimated_seconds = estimate_job_seconds(size_bytes, counts)
     
     # Create task entry
     processing_tasks[task_id] = {
@@ -285,11 +1147,40 @@ async def upload_file(file: UploadFile = File(...)):
         'status': 'queued',
         'created': datetime.now().isoformat(),
         'progress': 0,
-        'files': []
+        'files': [],
+        'size_bytes': size_bytes,
+        'sha256': sha256,
+        'node_count': counts['nodes'] if counts else None,
+        'connection_count': counts['connections'] if counts else None,
+        'estimated_seconds': estimated_seconds,
+        'lane': scheduler.lane_for(estimated_seconds),
+        'spool_path': spool_path,
+        'profile': profile,
+        'log_detail': log_detail,
+        'output_format': output_format,
+        'shard_by': shard_by,
+        'shard_size': shard_size
     }
+    await manager.send_status(task_id, processing_tasks[task_id])
     
-    # Process file in background
-    asyncio.create_task(process_file_async(content, file.filename, task_id))
+    # Hand the job to the scheduler; it starts now or waits its turn in the queue
+    try:
+        await scheduler.submit(
+            task_id,
+            lambda: process_file_async(spool_path, file.filename, task_id),
+            estimated_seconds
+        )
+    except QueueFullError:
+        uploads_rejected.inc(reason='queue_full')
+        del processing_tasks[task_id]
+        manager.events.discard(task_id)
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+        raise HTTPException(
+            status_code=429,
+            detail="The processing queue is full. Please try again shortly.",
+            headers={"Retry-After": "30"}
+        )
     
     return UploadResponse(
         task_id=task_id,
@@ -297,6 +1188,54 @@ async def upload_file(file: UploadFile = File(...)):
         status='queued'
     )
 
+@api_router.get("/tasks", response_model=TaskListResponse)
+async def list_tasks(
+    status: Optional[List[str]] = Query(None),
+    since: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_TASK_PAGE_SIZE
+):
+    """List tasks in creation order, filtered by status (repeatable) and creation time"""
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    since_at = None
+    if since:
+        try:
+            since_at = datetime.fromisoformat(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid 'since' timestamp; use ISO 8601")
+        if since_at.tzinfo is not None:
+            # 'created' is naive server-local time; bring an offset (or Z) timestamp into it
+            since_at = since_at.astimezone().replace(tzinfo=None)
+    limit = max(1, min(limit, MAX_TASK_PAGE_SIZE))
+    
+    tasks, next_cursor = processing_tasks.page(
+        statuses=status,
+        since=since_at,
+        cursor=int(cursor) if cursor is not None else None,
+        limit=limit
+    )
+    return TaskListResponse(
+        tasks=[TaskStatus(**task) for task in tasks],
+        next_cursor=str(next_cursor) if next_cursor is not None else None
+    )
+
+@api_router.post("/tasks/status", response_model=BulkStatusResponse)
+async def get_bulk_task_status(request: BulkStatusRequest):
+    """Get the status of many tasks in one request"""
+    if len(request.task_ids) > MAX_BULK_STATUS_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_STATUS_IDS} task ids per request")
+    
+    tasks = []
+    missing = []
+    for task_id in request.task_ids:
+        task = processing_tasks.get(task_id)
+        if task is None:
+            missing.append(task_id)
+        else:
+            tasks.append(TaskStatus(**task))
+    return BulkStatusResponse(tasks=tasks, missing=missing)
+
 @api_router.get("/tasks/{task_id}/status", response_model=TaskStatus)
 async def get_task_status(task_id: str):
     """Get the status of a processing task"""
@@ -306,6 +1245,38 @@ async def get_task_status(task_id: str):
     task = processing_tasks[task_id]
     return TaskStatus(**task)
 
+@api_router.get("/tasks/{task_id}/events")
+async def task_events(task_id: str, request: Request, last_event_id: Optional[int] = None):
+    """Server-sent events stream of task status updates.
+
+    Resumes after the `Last-Event-ID` header (sent automatically by EventSource on
+    reconnect) or the `last_event_id` query parameter.
+    """
+    if task_id not in processing_tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    header_id = request.headers.get("last-event-id", "")
+    cursor = int(header_id) if header_id.isdigit() else (last_event_id or 0)
+    
+    async def event_stream():
+        nonlocal cursor
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while task_id in processing_tasks:
+            events = manager.events.since(task_id, cursor)
+            for event_id, message in events:
+                cursor = event_id
+                yield f"id: {event_id}\nevent: status\ndata: {json.dumps(message)}\n\n"
+            if events and events[-1][1].get("status") in TERMINAL_STATUSES:
+                break
+            if not events and not await manager.events.wait(task_id, SSE_KEEPALIVE_SECONDS):
+                yield ": keepalive\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/tasks/{task_id}/download/{file_type}")
 async def download_file(task_id: str, file_type: str):
     """Download a processed file"""
@@ -319,10 +1290,39 @@ async def download_file(task_id: str, file_type: str):
         file_data = task['excel_data']
         filename = next((f['filename'] for f in task['files'] if f['type'] == 'excel'), 'output.xlsx')
         media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    elif file_type == "csv" and 'csv_data' in task:
+        file_data = task['csv_data']
+        filename = next((f['filename'] for f in task['files'] if f['type'] == 'csv'), 'output.csv')
+        media_type = 'text/csv'
+    elif file_type == "parquet" and 'parquet_data' in task:
+        file_data = task['parquet_data']
+        filename = next((f['filename'] for f in task['files'] if f['type'] == 'parquet'), 'output.parquet')
+        media_type = 'application/vnd.apache.parquet'
+    elif file_type == "bundle" and 'bundle_path' in task and os.path.exists(task['bundle_path']):
+        filename = next((f['filename'] for f in task['files'] if f['type'] == 'bundle'), 'output.zip')
+        # Streamed from disk in chunks; the bundle is never read into memory
+        return FileResponse(
+            task['bundle_path'],
+            media_type='application/zip',
+            filename=filename,
+            headers={"Cache-Control": "no-cache, no-store, must-revalidate", "X-Content-Type-Options": "nosniff"}
+        )
     elif file_type == "log" and 'log_data' in task:
         file_data = task['log_data']
         filename = next((f['filename'] for f in task['files'] if f['type'] == 'log'), 'output.txt')
         media_type = 'text/plain'
+    elif file_type == "report" and 'report_data' in task:
+        file_data = task['report_data']
+        filename = next((f['filename'] for f in task['files'] if f['type'] == 'report'), 'report.json')
+        media_type = 'application/json'
+    elif file_type == "profile" and 'profile_data' in task:
+        file_data = task['profile_data']
+        filename = next((f['filename'] for f in task['files'] if f['type'] == 'profile'), 'profile.zip')
+        media_type = 'application/zip'
+    elif file_type == "log_detail" and 'log_detail_data' in task:
+        file_data = task['log_detail_data']
+        filename = next((f['filename'] for f in task['files'] if f['type'] == 'log_detail'), 'log_detail.jsonl')
+        media_type = 'application/x-ndjson'
     else:
         raise HTTPException(status_code=404, detail="File not found")
     
@@ -351,43 +1351,48 @@ async def download_file(task_id: str, file_type: str):
         headers=headers
     )
 
+@api_router.get("/tasks/{task_id}/poles/{scid}")
+async def get_pole_by_scid(task_id: str, scid: str):
+    """Look up the node ids carrying an SCID in a processed job"""
+    if task_id not in processing_tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    node_ids = processing_tasks[task_id].get('scid_index', {}).get(scid)
+    if not node_ids:
+        raise HTTPException(status_code=404, detail="SCID not found")
+    
+    return {"scid": scid, "node_ids": node_ids}
+
 @api_router.delete("/tasks/{task_id}")
 async def cleanup_task(task_id: str):
-    """Clean up a task and its associated files"""
+    """Clean up a task and its associated files, stopping its job if it is still queued or running"""
     if task_id not in processing_tasks:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # Remove task from memory
-    del processing_tasks[task_id]
+    # Remove task from memory; a running worker is stopped within CANCEL_GRACE_SECONDS
+    await cancel_task(task_id)
     
     return {"status": "cleaned"}
 
 @app.websocket("/api/ws/tasks/{task_id}")
 async def websocket_endpoint(websocket: WebSocket, task_id: str):
     """WebSocket endpoint for real-time task updates"""
-    await manager.connect(websocket, task_id)
+    subscriber = await manager.connect(websocket, task_id)
     
     try:
         # Send initial status if task exists
         if task_id in processing_tasks:
-            task_data = processing_tasks[task_id]
-            serializable_data = {
-                "task_id": task_data.get("task_id"),
-                "filename": task_data.get("filename"),
-                "status": task_data.get("status"),
-                "created": task_data.get("created"),
-                "progress": task_data.get("progress", 0),
-                "files": task_data.get("files", []),
-                "error": task_data.get("error")
-            }
-            await websocket.send_json(serializable_data)
+            subscriber.offer(serialize_task(processing_tasks[task_id]))
         
         # Keep connection alive
         while True:
             await websocket.receive_text()
             
     except WebSocketDisconnect:
-        manager.disconnect(task_id)
+        pass
+    finally:
+        # Also on errors and cancellation, so the subscriber and its sender task never leak
+        manager.disconnect(task_id, subscriber)
 
 # Cleanup old tasks periodically (every hour)
 async def cleanup_old_tasks():
@@ -403,7 +1408,7 @@ async def cleanup_old_tasks():
                     tasks_to_remove.append(task_id)
             
             for task_id in tasks_to_remove:
-                del processing_tasks[task_id]
+                await cancel_task(task_id)
                 logger.info(f"Cleaned up old task: {task_id}")
             
             await asyncio.sleep(3600)  # Check every hour
@@ -426,6 +1431,14 @@ async def startup_event():
     """Start background tasks on app startup"""
     asyncio.create_task(cleanup_old_tasks())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Cancel running jobs so their (non-daemon) worker processes exit with the server"""
+    for task_id in list(processing_tasks):
+        task = processing_tasks[task_id]
+        if task.get('cancel_event') is not None:
+            task['cancel_event'].set()
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get('PORT', 8000))
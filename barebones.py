@@ -1,9 +1,38 @@
 import pandas as pd
+import xlsxwriter
+import numpy as np
 import json
+import csv
 import datetime
 import os
+import io
+import gzip
 import math
-from collections import defaultdict
+import re
+import sys
+import time
+import threading
+import queue
+import multiprocessing
+import tempfile
+import zipfile
+import cProfile
+import pstats
+import argparse
+from collections import defaultdict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from functools import cached_property, lru_cache
+
+try:
+    import zstandard  # Optional: only needed for .json.zst job files
+except ImportError:
+    zstandard = None
+try:
+    import pyarrow  # Optional: only needed for Parquet output
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
 
 # === Constants for Attachment and Span Labels ===
 EXISTING_ATTACHMENT_HEIGHT = "Attachment Height - Existing"
@@ -16,18 +45,168 @@ SPAN_MR_MOVE = "Span MR Move"
 SPAN_EFFECTIVE_MOVE = "Span Effective Move"
 SPAN_PROPOSED_HEIGHT = "Mid-Span Proposed"
 
+# === Report Configuration ===
+REPORT_VERSION = 1  # Bump when the JSON report layout changes incompatibly
+
+# === Spatial Index Configuration ===
+SPATIAL_CELL_FEET = 250  # Grid cell size; roughly one typical span
+SPAN_LENGTH_LIMIT_FEET = 500  # Spans longer than this are flagged for review
+NEARBY_STRUCTURE_RADIUS_FEET = 50  # Unconnected poles within this radius are reported
+
+# === GIS Join Configuration ===
+# GeoJSON feature properties checked (case-insensitively) for the pole's SCID and DLOC number
+GIS_SCID_PROPERTIES = ('scid',)
+GIS_DLOC_PROPERTIES = ('dloc_number', 'dloc', 'pole_number', 'pole_tag')
+GIS_MATCH_RADIUS_FEET = 15  # Nearest-point fallback when neither SCID nor DLOC matches
+
 # === Excel Configuration ===
+# MakeReadyData columns, in sheet order. Connection ID, SCID and Bearing are kept
+# on the rows for processing but are not written out.
+MAKE_READY_COLUMNS = [
+    "Operation Number", "Attachment Action", "Pole Owner",
+    "Pole #", "Pole Structure", "Proposed Riser", "Proposed Guy",
+    "PLA (%) with proposed attachment", "Construction Grade of Analysis",
+    "Height Lowest Com", "Height Lowest CPS Electrical",
+    "Data Category", "Attacher Description",
+    "Attachment Height - Existing", "Attachment Height - Proposed",
+    "Mid-Span (same span as existing)",
+    "One Touch Transfer", "Remedy Description", "Responsible Party",
+    "Existing CPSE Red Tag on Pole", "Pole Data Missing in GIS",
+    "CPSE Application Comments", "Movement Summary", "From Pole", "To Pole",
+    "Span Length / Nearby Structure"
+]
+
+# refs sheet columns
+REF_COLUMNS = [
+    "Pole #", "SCID", "Ref. Structure SCID", "Attacher Name",
+    "Main Pole Existing Height", "Main Pole Proposed Height",
+    "Mid-Span Existing Height", "Mid-Span Proposed Height"
+]
+
 EXCEL_DATA_START_ROW = 4  # Data will start on row 5 (can be easily changed here)
+# create_output_excel hands rows to a separate writer process (PipelinedWorkbookWriter)
+# when there is more than one CPU; EXCEL_WRITER_PROCESS=0 keeps the writer inline.
+EXCEL_WRITER_PROCESS = os.environ.get('EXCEL_WRITER_PROCESS', '1') != '0'
+# Starting the writer process costs ~0.7s (a fresh interpreter importing this module)
+# and the writer handles ~2000 sheet rows/s; below this many MakeReadyData records
+# (~10 sheet rows each) writing inline is faster.
+PIPELINE_MIN_RECORDS = int(os.environ.get('PIPELINE_MIN_RECORDS', '200'))
+PIPELINE_QUEUE_BLOCKS = 64  # Connection blocks buffered between analysis and the writer
+PIPELINE_POLL_SECONDS = 0.1  # Cancellation / writer liveness check while the queue is full
+
+# === Output Formats ===
+# process_files(output_format=...) -> file suffix. csv and parquet carry only the
+# flat MakeReadyData rows (no refs sheet, merges or From/To layout rows).
+OUTPUT_FORMATS = {'xlsx': '.xlsx', 'csv': '.csv', 'parquet': '.parquet'}
+PARQUET_BATCH_ROWS = 10000  # Rows buffered per Parquet row group
+
+# === Sharded Output ===
+# process_files(shard_by=...) splits the workbook into a ZIP of smaller workbooks
+# plus manifest.json. shard_size is operations per workbook ('operations') or the
+# width of each numeric SCID range ('scid').
+SHARD_BY = ('operations', 'scid')
+SHARD_DEFAULT_SIZE = {'operations': 500, 'scid': 100}
+SHARD_MAX_WORKERS = int(os.environ.get('SHARD_MAX_WORKERS', '4'))
+SHARD_POLL_SECONDS = 0.1  # Cancellation check interval while shard workers run
+MANIFEST_VERSION = 1
+
+# === Input Configuration ===
+# Job files may be plain or compressed; longest suffixes first so ".json.gz" wins over ".json"
+JSON_SUFFIXES = ('.json.gz', '.json.zst', '.json')
+
+
+def strip_json_suffix(filename):
+    """Return filename without its (possibly compound) job file suffix"""
+    lowered = filename.lower()
+    for suffix in JSON_SUFFIXES:
+        if lowered.endswith(suffix):
+            return filename[:-len(suffix)]
+    return os.path.splitext(filename)[0]
+
+
+@contextmanager
+def open_json_stream(path):
+    """Open a job file as a text stream, decompressing .gz/.zst on the fly.
+
+    The decompressor feeds json.load chunk by chunk, so the decompressed bytes
+    are never held as a single object.
+    """
+    lowered = path.lower()
+    if lowered.endswith('.gz'):
+        with gzip.open(path, 'rt', encoding='utf-8') as stream:
+            yield stream
+    elif lowered.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; cannot read .json.zst files (pip install zstandard)")
+        with open(path, 'rb') as raw:
+            with zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+                yield io.TextIOWrapper(reader, encoding='utf-8')
+    else:
+        with open(path, 'r', encoding='utf-8') as stream:
+            yield stream
+
+
+# scan_job_counts reduces the job text to a skeleton with C-speed regexes:
+# the longest prefix of a window whose strings are all complete (and not a key
+# that may still get its colon in the next window) ...
+JSON_SCAN_COMPLETE = re.compile(r'(?:[^"]++|"(?:[^"\\]++|\\.)*+"(?=\s*+\S))*+')
+# ... a "nodes"/"connections" key replaced by an N/C marker (unless its quote is
+# escaped, i.e. it is the tail of a longer key) ...
+JSON_SCAN_SECTION_KEY = re.compile(r'"(?<!\\")(nodes|connections)"\s*+:')
+JSON_SCAN_SECTIONS = {'N': 'nodes', 'C': 'connections'}
+# ... every other key by ':', every string value dropped ...
+JSON_SCAN_KEY = re.compile(r'"(?:[^"\\]++|\\.)*+"\s*+:')
+JSON_SCAN_STRING = re.compile(r'"(?:[^"\\]++|\\.)*+"')
+# ... and everything but brackets, key colons and section markers removed.
+JSON_SCAN_NOISE = re.compile(r'[^{}\[\]:NC]++')
+
+
+def scan_job_counts(path, chunk_size=1024 * 1024):
+    """Cheaply count nodes and connections in a job file without building it.
+
+    Counts the keys directly under the top-level "nodes" and "connections"
+    objects. The (decompressed) text is reduced chunk by chunk to brackets and
+    key markers, and only that skeleton is walked to track nesting depth. Used
+    for cost estimates, not for processing.
+    """
+    counts = {'nodes': 0, 'connections': 0}
+    depth = 0
+    section = None  # Top-level key whose value is being scanned
+    carry = ''
+    with open_json_stream(path) as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            window = carry + chunk
+            # A string cut off at the window end waits for the next chunk
+            end = JSON_SCAN_COMPLETE.match(window).end() if chunk else len(window)
+            window, carry = window[:end], window[end:]
+            skeleton = JSON_SCAN_SECTION_KEY.sub(lambda m: m.group(1)[0].upper(), window)
+            skeleton = JSON_SCAN_STRING.sub('', JSON_SCAN_KEY.sub(':', skeleton))
+            for ch in JSON_SCAN_NOISE.sub('', skeleton):
+                if ch in '{[':
+                    depth += 1
+                elif ch in '}]':
+                    depth -= 1
+                    if depth == 1:
+                        section = None
+                elif depth == 1:
+                    section = JSON_SCAN_SECTIONS.get(ch)
+                elif depth == 2 and section:
+                    counts[section] += 1
+            if not chunk:
+                break
+    return counts
 
 
 # Helper function to get SCID from node data
-def get_scid_from_node_data(node_data):
-    if not node_data: return "Unknown"
+def get_scid_from_node_data(node_data, missing="Unknown"):
+    """SCID of a node as a string, or `missing` when it has none"""
+    if not node_data: return missing
     # Access attributes, then scid, then try to get a value.
     attributes = node_data.get("attributes", {})
-    if not attributes: return "Unknown"
+    if not attributes: return missing
     scid_data = attributes.get("scid", {})
-    if not scid_data: return "Unknown"
+    if not scid_data: return missing
     
     # Prioritize specific keys if they exist, e.g. 'auto_button', '-Imported'
     # Based on usage in process_data:
@@ -37,9 +216,43 @@ def get_scid_from_node_data(node_data):
             scid_value = scid_data[key]
             break
     if scid_value is None: # Fallback to the first value if specific keys aren't found
-        scid_value = next(iter(scid_data.values()), "Unknown")
+        scid_value = next(iter(scid_data.values()), missing)
         
-    return str(scid_value) if scid_value is not None and str(scid_value).strip() else "Unknown"
+    return str(scid_value) if scid_value is not None and str(scid_value).strip() else missing
+
+# Parsed SCID, ordered like FileProcessor.compare_scids but as a plain tuple key:
+# N/A last, then the numeric base (non-numeric bases after numeric ones), then
+# unsuffixed before suffixed ("002" before "002.A"), then the raw text.
+# The one difference: compare_scids compares a numeric base with a non-numeric
+# one as text ("10A" before "9"), which is not a consistent order; here "9" comes first.
+# `suffix` holds the dot-separated parts after the base ("002.A.1" -> ('A', '1')).
+ScidKey = namedtuple('ScidKey', ['na', 'base', 'suffixed', 'text', 'suffix'])
+
+
+def parse_scid(scid):
+    """ScidKey for an SCID string; parse once, then sort or compare the keys"""
+    text = str(scid)
+    if text == 'N/A':
+        return ScidKey(True, (0, 0), False, text, ())
+    parts = text.split('.')
+    try:
+        base = (0, int(parts[0].lstrip('0') or '0'))
+    except ValueError:
+        base = (1, parts[0])
+    return ScidKey(False, base, len(parts) > 1, text, tuple(parts[1:]))
+
+
+NA_SCID_KEY = parse_scid('N/A')
+
+
+def build_scid_index(job_data):
+    """SCID -> [node_id, ...] for every node with an SCID, in SCID order"""
+    index = defaultdict(list)
+    for node_id, node_data in job_data.get("nodes", {}).items():
+        scid = get_scid_from_node_data(node_data, missing='N/A')
+        if scid != 'N/A':
+            index[scid].append(node_id)
+    return dict(sorted(index.items(), key=lambda item: parse_scid(item[0])))
 
 # Helper function to check for valid reference connection based on playbook rules
 def is_reference_connection(conn, nodes_data, this_node_id):
@@ -66,10 +279,26 @@ def is_reference_connection(conn, nodes_data, this_node_id):
     return "." in other_scid
 
 
+class ProcessingCancelled(Exception):
+    """Raised inside FileProcessor once its cancel_event has been set"""
+
+
+class WorkbookWriterError(RuntimeError):
+    """Raised when the Excel writer process fails or exits early"""
+
+
 class ProcessingLogger:
-    """Logger to track processing details and skipped items"""
+    """Logger to track processing details and skipped items.
+
+    Keeps counters plus a bounded sample of node detail (the first
+    SAMPLE_NODES nodes with skips, SAMPLE_ITEMS items each), so memory does
+    not grow with the number of items. Full per-item detail is streamed to a
+    JSONL file only after open_detail().
+    """
+    SAMPLE_NODES = 10  # Nodes with skipped items shown in the summary
+    SAMPLE_ITEMS = 5   # Items shown per sampled node
+
     def __init__(self):
-        self.node_logs = []
         self.skip_reasons = defaultdict(int)
         self.statistics = {
             'total_nodes': 0,
@@ -80,6 +309,22 @@ class ProcessingLogger:
             'items_skipped': defaultdict(int)
         }
         self.current_node = None
+        self.sampled_nodes = []
+        self.node_counts = {}  # node_id -> one small dict per node, for the JSON report
+        self.detail_file = None
+
+    def open_detail(self, path):
+        """Stream every node and item event to `path` as JSON lines"""
+        self.detail_file = open(path, 'w', encoding='utf-8')
+
+    def close_detail(self):
+        if self.detail_file:
+            self.detail_file.close()
+            self.detail_file = None
+
+    def _write_detail(self, event):
+        if self.detail_file:
+            self.detail_file.write(json.dumps(event) + "\n")
     
     def log_node_start(self, node_id, scid, neutral_height):
         """Start logging for a new node"""
@@ -96,40 +341,75 @@ class ProcessingLogger:
             'scid': scid,
             'neutral_height': neutral_height,
             'neutral_height_str': neutral_str,
-            'items': []
+            'processed': 0,
+            'skipped': 0,
+            'items': []  # First SAMPLE_ITEMS items only
         }
+        self._write_detail({'event': 'node', 'node_id': node_id, 'scid': scid, 'neutral_height': neutral_height})
+
+    def _log_item(self, status, category, item_info, reason=None):
+        node = self.current_node
+        item = {'status': status, 'category': category, 'info': item_info}
+        if reason is not None:
+            item['reason'] = reason
+        if node:
+            node[status] += 1
+            if len(node['items']) < self.SAMPLE_ITEMS:
+                node['items'].append(item)
+        if self.detail_file:
+            self._write_detail({'event': 'item', 'node_id': node['node_id'] if node else None, **item})
     
     def log_item_processed(self, category, item_info):
         """Log a successfully processed item"""
         self.statistics['total_items'][category] += 1
         self.statistics['items_processed'][category] += 1
-        
-        if self.current_node:
-            self.current_node['items'].append({
-                'status': 'processed',
-                'category': category,
-                'info': item_info
-            })
+        self._log_item('processed', category, item_info)
     
     def log_item_skipped(self, category, item_info, reason):
         """Log a skipped item with reason"""
         self.statistics['total_items'][category] += 1
         self.statistics['items_skipped'][category] += 1
         self.skip_reasons[reason] += 1
-        
-        if self.current_node:
-            self.current_node['items'].append({
-                'status': 'skipped',
-                'category': category,
-                'info': item_info,
-                'reason': reason
-            })
+        self._log_item('skipped', category, item_info, reason)
     
     def end_node(self):
-        """Finish logging for current node"""
-        if self.current_node:
-            self.node_logs.append(self.current_node)
-            self.current_node = None
+        """Finish logging for current node; only the first SAMPLE_NODES nodes with skips are kept"""
+        node = self.current_node
+        if node:
+            # A node is started once per connection (and pass) it appears in;
+            # the report keeps one entry per node with the counts summed
+            counts = self.node_counts.get(node['node_id'])
+            if counts is None:
+                self.node_counts[node['node_id']] = {
+                    'node_id': node['node_id'],
+                    'scid': node['scid'],
+                    'neutral_height': node['neutral_height'],
+                    'processed': node['processed'],
+                    'skipped': node['skipped']
+                }
+            else:
+                counts['processed'] += node['processed']
+                counts['skipped'] += node['skipped']
+            if node['skipped'] and len(self.sampled_nodes) < self.SAMPLE_NODES:
+                self.sampled_nodes.append(node)
+        self.current_node = None
+
+    def to_report(self):
+        """Statistics, skip reasons and per-node counts as JSON-ready dicts"""
+        statistics = {
+            key: dict(value) if isinstance(value, defaultdict) else value
+            for key, value in self.statistics.items()
+        }
+        return {
+            'statistics': statistics,
+            'totals': {
+                'items': sum(self.statistics['total_items'].values()),
+                'processed': sum(self.statistics['items_processed'].values()),
+                'skipped': sum(self.statistics['items_skipped'].values())
+            },
+            'skip_reasons': dict(sorted(self.skip_reasons.items(), key=lambda x: x[1], reverse=True)),
+            'nodes': list(self.node_counts.values())
+        }
     
     def write_summary(self, filename):
         """Write processing summary to file"""
@@ -172,31 +452,926 @@ class ProcessingLogger:
                 f.write("\n")
             
             # Detailed node logs (sample)
-            f.write("DETAILED NODE LOGS (first 10 nodes with skipped items):\n")
-            nodes_with_skips = 0
-            for node_log in self.node_logs:
-                skipped_items = [item for item in node_log['items'] if item['status'] == 'skipped']
-                if skipped_items and nodes_with_skips < 10:
-                    nodes_with_skips += 1
-                    f.write(f"\n[Node ID: {node_log['node_id']}, SCID: {node_log['scid']}]\n")
-                    f.write(f"- Neutral height: {node_log['neutral_height_str']}\n")
-                    total_node_items = len(node_log['items'])
-                    processed_items = len([item for item in node_log['items'] if item['status'] == 'processed'])
-                    f.write(f"- Items: {total_node_items} total ({processed_items} processed, {len(skipped_items)} skipped)\n")
-                    
-                    # Show some processed items
-                    for item in node_log['items'][:5]:
-                        if item['status'] == 'processed':
-                            f.write(f"  ✓ {item['info']}\n")
-                        else:
-                            f.write(f"  ✗ {item['info']} - {item['reason']}\n")
-                    
-                    if len(node_log['items']) > 5:
-                        f.write(f"  ... and {len(node_log['items']) - 5} more items\n")
+            f.write(f"DETAILED NODE LOGS (first {self.SAMPLE_NODES} nodes with skipped items):\n")
+            for node_log in self.sampled_nodes:
+                total_node_items = node_log['processed'] + node_log['skipped']
+                f.write(f"\n[Node ID: {node_log['node_id']}, SCID: {node_log['scid']}]\n")
+                f.write(f"- Neutral height: {node_log['neutral_height_str']}\n")
+                f.write(f"- Items: {total_node_items} total ({node_log['processed']} processed, {node_log['skipped']} skipped)\n")
+                
+                # Show some processed items
+                for item in node_log['items']:
+                    if item['status'] == 'processed':
+                        f.write(f"  ✓ {item['info']}\n")
+                    else:
+                        f.write(f"  ✗ {item['info']} - {item['reason']}\n")
+                
+                if total_node_items > self.SAMPLE_ITEMS:
+                    f.write(f"  ... and {total_node_items - self.SAMPLE_ITEMS} more items\n")
+
+
+class SpatialIndex:
+    """Grid index over job coordinates for radius and nearest-neighbour queries.
+
+    Points are projected to feet on a local equirectangular plane (plenty
+    accurate at job scale) and bucketed into SPATIAL_CELL_FEET cells, so a
+    query only looks at the cells its radius touches.
+    """
+
+    EARTH_RADIUS_FEET = 20_902_231
+
+    def __init__(self, cell_feet=SPATIAL_CELL_FEET):
+        self.cell_feet = cell_feet
+        self.cells = defaultdict(list)  # (cx, cy) -> [(x, y, key)]
+        self.points = {}  # key -> (lat, lon)
+        self._lat0 = None
+        self._bounds = None  # [min cx, max cx, min cy, max cy] of occupied cells
+
+    @classmethod
+    def from_job(cls, job_data):
+        """Index every node as ('node', node_id). Connection sections are not
+        indexed; nothing queries them."""
+        index = cls()
+        for node_id, node_data in job_data.get("nodes", {}).items():
+            index.add(('node', node_id), node_data.get("latitude"), node_data.get("longitude"))
+        return index
+
+    def _project(self, lat, lon):
+        lat, lon = float(lat), float(lon)
+        if self._lat0 is None:
+            self._lat0 = lat
+        x = math.radians(lon) * math.cos(math.radians(self._lat0)) * self.EARTH_RADIUS_FEET
+        y = math.radians(lat) * self.EARTH_RADIUS_FEET
+        return x, y
+
+    def _cell(self, x, y):
+        return int(x // self.cell_feet), int(y // self.cell_feet)
+
+    def add(self, key, lat, lon):
+        """Index a point; points without both coordinates are ignored"""
+        if lat is None or lon is None:
+            return
+        try:
+            x, y = self._project(lat, lon)
+        except (TypeError, ValueError):
+            return
+        self.points[key] = (float(lat), float(lon))
+        cx, cy = self._cell(x, y)
+        self.cells[(cx, cy)].append((x, y, key))
+        if self._bounds is None:
+            self._bounds = [cx, cx, cy, cy]
+        else:
+            b = self._bounds
+            b[0], b[1], b[2], b[3] = min(b[0], cx), max(b[1], cx), min(b[2], cy), max(b[3], cy)
+
+    def coordinates(self, key):
+        """(lat, lon) of an indexed point, or None"""
+        return self.points.get(key)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _ring(self, cx, cy, r):
+        """Cells at Chebyshev distance exactly r from (cx, cy)"""
+        if r == 0:
+            yield cx, cy
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def within(self, lat, lon, radius_feet, kind=None):
+        """[(distance_feet, key)] for points within radius, nearest first.
+        `kind` limits results to keys starting with it (e.g. 'node')."""
+        if not self.points:
+            return []
+        qx, qy = self._project(lat, lon)
+        cx, cy = self._cell(qx, qy)
+        reach = int(math.ceil(radius_feet / self.cell_feet))
+        found = []
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                for x, y, key in self.cells.get((gx, gy), ()):
+                    if kind is not None and key[0] != kind:
+                        continue
+                    distance = math.hypot(x - qx, y - qy)
+                    if distance <= radius_feet:
+                        found.append((distance, key))
+        found.sort()
+        return found
+
+    def nearest(self, lat, lon, k=1, kind=None, exclude=(), max_feet=None):
+        """Up to k [(distance_feet, key)] closest to (lat, lon), nearest first.
+
+        Searches outward ring by ring and stops once the next ring cannot
+        hold anything closer than the k-th match found so far.
+        """
+        if not self.points:
+            return []
+        qx, qy = self._project(lat, lon)
+        cx, cy = self._cell(qx, qy)
+        min_x, max_x, min_y, max_y = self._bounds
+        max_ring = max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+        found = []
+        for r in range(max_ring + 1):
+            # Anything in ring r is at least (r - 1) cells away from the query
+            ring_floor = (r - 1) * self.cell_feet
+            if max_feet is not None and ring_floor > max_feet:
+                break
+            if len(found) >= k and ring_floor > found[k - 1][0]:
+                break
+            for cell in self._ring(cx, cy, r):
+                for x, y, key in self.cells.get(cell, ()):
+                    if key in exclude or (kind is not None and key[0] != kind):
+                        continue
+                    distance = math.hypot(x - qx, y - qy)
+                    if max_feet is None or distance <= max_feet:
+                        found.append((distance, key))
+            found.sort()
+        return found[:k]
+
+
+class GisPoleIndex:
+    """Join from job poles to GIS pole features in a GeoJSON layer.
+
+    Built in one pass over the features: hash maps on normalized DLOC and
+    SCID, plus a SpatialIndex for the nearest-point fallback, so matching
+    every pole in a job is linear in nodes + features.
+    """
+
+    def __init__(self):
+        self.by_dloc = {}
+        self.by_scid = {}
+        self.points = SpatialIndex()
+        self.features = []  # (lat, lon, properties)
+
+    @staticmethod
+    def normalize_dloc(value):
+        text = str(value).strip().upper()
+        return text[2:].strip() if text.startswith('PL') else text
+
+    @staticmethod
+    def normalize_scid(value):
+        text = str(value).strip().upper()
+        head, dot, tail = text.partition('.')
+        if head.isdigit():
+            head = head.lstrip('0') or '0'  # "001" in the job, 1 in GIS
+        return head + dot + tail
+
+    @classmethod
+    def from_geojson(cls, geojson_data):
+        index = cls()
+        features = geojson_data.get("features", []) if isinstance(geojson_data, dict) else []
+        for feature in features:
+            geometry = (feature or {}).get("geometry") or {}
+            coords = geometry.get("coordinates")
+            if geometry.get("type") == "MultiPoint" and coords:
+                coords = coords[0]
+            if geometry.get("type") not in ("Point", "MultiPoint") or not coords or len(coords) < 2:
+                continue
+            lon, lat = coords[0], coords[1]  # GeoJSON order is [lon, lat]
+            props = {str(k).lower(): v for k, v in (feature.get("properties") or {}).items()}
+            position = len(index.features)
+            index.features.append((lat, lon, props))
+            index.points.add(('gis', position), lat, lon)
+            for name in GIS_DLOC_PROPERTIES:
+                if props.get(name) not in (None, ''):
+                    index.by_dloc.setdefault(cls.normalize_dloc(props[name]), position)
+            for name in GIS_SCID_PROPERTIES:
+                if props.get(name) not in (None, ''):
+                    index.by_scid.setdefault(cls.normalize_scid(props[name]), position)
+        return index
+
+    def __len__(self):
+        return len(self.features)
+
+    def match(self, scid=None, dloc=None, lat=None, lon=None):
+        """(lat, lon, properties) of the matching GIS pole, or None.
+        Tries DLOC, then SCID, then the nearest feature within GIS_MATCH_RADIUS_FEET."""
+        position = None
+        if dloc and dloc != 'N/A':
+            position = self.by_dloc.get(self.normalize_dloc(dloc))
+        if position is None and scid and scid != 'N/A':
+            position = self.by_scid.get(self.normalize_scid(scid))
+        if position is None and lat is not None and lon is not None:
+            nearest = self.points.nearest(lat, lon, max_feet=GIS_MATCH_RADIUS_FEET)
+            if nearest:
+                position = nearest[0][1][1]
+        return self.features[position] if position is not None else None
+
+
+class ConnectionGraph:
+    """Per-node adjacency lists over job_data["connections"], built in one pass.
+
+    Every list keeps the job's connection order, so code that used to take
+    the first match from a scan over all connections gets the same answer
+    in O(degree).
+    """
+
+    def __init__(self, job_data):
+        self.connections = job_data.get("connections", {})
+        self.outgoing = defaultdict(list)     # node_id -> connection ids where it is node_id_1
+        self.incoming = defaultdict(list)     # node_id -> connection ids where it is node_id_2
+        self.ref = defaultdict(list)          # node_id -> Ref-tool connection ids touching it
+        self.aerial = defaultdict(list)       # node_id -> aerial cable connection ids touching it
+        self.underground = defaultdict(list)  # node_id -> underground cable connection ids touching it
+        self._neighbors = defaultdict(set)
+        for conn_id, conn_data in self.connections.items():
+            node_id_1 = conn_data.get("node_id_1")
+            node_id_2 = conn_data.get("node_id_2")
+            ends = [n for n in (node_id_1, node_id_2) if n]
+            if node_id_1:
+                self.outgoing[node_id_1].append(conn_id)
+            if node_id_2:
+                self.incoming[node_id_2].append(conn_id)
+            connection_type = conn_data.get("attributes", {}).get("connection_type", {}).get("button_added", "")
+            for node_id in dict.fromkeys(ends):
+                if conn_data.get("button") == "ref":
+                    self.ref[node_id].append(conn_id)
+                if connection_type == "aerial cable":
+                    self.aerial[node_id].append(conn_id)
+                elif connection_type == "underground cable":
+                    self.underground[node_id].append(conn_id)
+            if node_id_1 and node_id_2:
+                self._neighbors[node_id_1].add(node_id_2)
+                self._neighbors[node_id_2].add(node_id_1)
+
+    def neighbors(self, node_id):
+        """Nodes sharing any connection with node_id"""
+        return self._neighbors.get(node_id, set())
+
+    def backspans(self, node_id):
+        """Connections ending at node_id, in job order"""
+        return self.incoming.get(node_id, [])
+
+    def aerial_backspans(self, node_id):
+        """Aerial cable connections ending at node_id; more than one means a multi-backspan pole"""
+        aerial = set(self.aerial.get(node_id, ()))
+        return [conn_id for conn_id in self.incoming.get(node_id, []) if conn_id in aerial]
+
+    def references(self, node_id):
+        """Ref-tool connections touching node_id, in job order"""
+        return self.ref.get(node_id, [])
+
+
+def _to_float(value):
+    """float(value), or NaN for None / anything unparseable"""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return math.nan
+
+
+def iter_main_photos(job_data):
+    """Yield (owner, main_photo_id) for every node and connection section that has a main photo,
+    in job order. owner is ('node', node_id) or ('section', connection_id, section_id)."""
+    for node_id, node_data in job_data.get("nodes", {}).items():
+        photos = node_data.get("photos") or {}
+        main_photo_id = next((pid for pid, pdata in photos.items() if pdata.get("association") == "main"), None)
+        if main_photo_id:
+            yield ('node', node_id), main_photo_id
+    for conn_id, conn_data in job_data.get("connections", {}).items():
+        for section_id, section_data in (conn_data.get("sections") or {}).items():
+            photos = section_data.get("photos") or {}
+            main_photo_id = next((pid for pid, pdata in photos.items() if pdata.get("association") == "main"), None)
+            if main_photo_id:
+                yield ('section', conn_id, section_id), main_photo_id
+
+
+class PhotoItemTable:
+    """Flat, columnar view of every wire/equipment/guying item on the job's main photos.
+
+    One row per photofirst item, stored photo by photo in job order, so the
+    rows of a photo are a contiguous slice and "first item" means the same
+    thing it does when walking the dicts. Trace-level attributes live in
+    arrays indexed by the row's trace code; the last trace slot stands for
+    items whose `_trace` is missing or unknown.
+    """
+
+    CATEGORIES = ("wire", "equipment", "guying")
+    WIRE, EQUIPMENT, GUYING = range(3)
+    CPS_VARIATIONS = ("cps energy", "cps", "cpse")
+
+    def __init__(self, job_data):
+        trace_data = job_data.get("traces", {}).get("trace_data", {})
+        self.trace_ids = list(trace_data)
+        trace_code = {trace_id: code for code, trace_id in enumerate(self.trace_ids)}
+        self.no_trace = len(self.trace_ids)
+        traces = [trace_data[trace_id] for trace_id in self.trace_ids] + [{}]
+
+        company = [(t.get("company") or "").strip() for t in traces]
+        cable_type = [(t.get("cable_type") or "").strip() for t in traces]
+        equipment_type = [(t.get("equipment_type") or "").strip() for t in traces]
+        self.trace_company = np.array(company, dtype=object)
+        self.trace_proposed = np.array([bool(t.get("proposed", False)) for t in traces])
+        self.trace_is_cps = np.array([any(v in c.lower() for v in self.CPS_VARIATIONS) for c in company])
+        self.trace_is_primary = np.array([c.lower() == "primary" for c in cable_type])
+        self.trace_is_cps_neutral = np.array([
+            co.lower() == "cps energy" and ca.lower() == "neutral" for co, ca in zip(company, cable_type)])
+        self.trace_is_cps_electric_wire = np.array([c.lower() in ("neutral", "street light") for c in cable_type])
+        self.trace_has_equipment_type = np.array([bool(e) for e in equipment_type])
+        # Attacher name as the span columns build it: "{company} {cable_type}"
+        attacher_code = {}
+        codes = []
+        for co, ca in zip(company, cable_type):
+            name = f"{co} {ca}".strip()
+            codes.append(attacher_code.setdefault(name, len(attacher_code)))
+        self.attacher_names = list(attacher_code)
+        self.trace_attacher = np.array(codes, dtype=np.int64)
+
+        # Main photos of every node and section, in job order
+        main_photos = dict.fromkeys(photo_id for _, photo_id in iter_main_photos(job_data))
+
+        photo_col, category_col, trace_col = [], [], []
+        height_col, mr_move_col, effective_col, has_effective_col, move_total_col = [], [], [], [], []
+        self.photo_ids = []
+        self.photo_slices = {}  # photo_id -> (start, stop) row range
+        all_photos = job_data.get("photos", {})
+        for photo_id in main_photos:
+            photofirst_data = all_photos.get(photo_id, {}).get("photofirst_data") or {}
+            start = len(photo_col)
+            photo_code = len(self.photo_ids)
+            for category_code, category in enumerate(self.CATEGORIES):
+                for item in (photofirst_data.get(category) or {}).values():
+                    if not isinstance(item, dict):
+                        continue
+                    mr_move = _to_float(item.get("mr_move", 0))
+                    effective_moves = item.get("_effective_moves")
+                    effective_moves = effective_moves.values() if isinstance(effective_moves, dict) else ()
+                    moves = [m for m in map(_to_float, effective_moves) if not math.isnan(m)]
+                    nonzero = [m for m in moves if abs(m) > 0.01]
+                    photo_col.append(photo_code)
+                    category_col.append(category_code)
+                    trace_col.append(trace_code.get(item.get("_trace"), self.no_trace))
+                    height_col.append(_to_float(item.get("_measured_height")))
+                    mr_move_col.append(mr_move)
+                    effective_col.append(sum(nonzero))
+                    has_effective_col.append(bool(nonzero))
+                    move_total_col.append((0.0 if math.isnan(mr_move) else mr_move) + sum(moves))
+            self.photo_ids.append(photo_id)
+            self.photo_slices[photo_id] = (start, len(photo_col))
+
+        self.photo = np.array(photo_col, dtype=np.int64)
+        self.category = np.array(category_col, dtype=np.int8)
+        self.trace = np.array(trace_col, dtype=np.int64)
+        self.height = np.array(height_col, dtype=np.float64)  # _measured_height, NaN if missing
+        self.mr_move = np.array(mr_move_col, dtype=np.float64)  # NaN if unparseable
+        self.effective_move = np.array(effective_col, dtype=np.float64)  # sum of nonzero _effective_moves
+        self.has_effective_move = np.array(has_effective_col, dtype=bool)
+        self.move_total = np.array(move_total_col, dtype=np.float64)  # mr_move + every numeric effective move
+
+        # Per-photo neutral height: first CPS ENERGY neutral wire with a height, in item order
+        neutral = (self.category == self.WIRE) & self.trace_is_cps_neutral[self.trace] & ~np.isnan(self.height)
+        rows = np.flatnonzero(neutral)
+        photos, first = np.unique(self.photo[rows], return_index=True)
+        self.neutral_heights = {self.photo_ids[p]: float(self.height[rows[i]]) for p, i in zip(photos, first)}
+
+    def __len__(self):
+        return len(self.photo)
+
+    def neutral_height(self, photo_id):
+        return self.neutral_heights.get(photo_id)
+
+    def rows(self, photo_ids):
+        """Row indices for the given photos, in the order given"""
+        ranges = [np.arange(*self.photo_slices[pid]) for pid in photo_ids if pid in self.photo_slices]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def span_summary(self, photo_ids):
+        """Lowest com / CPS heights and per-attacher lowest wire for a span's section photos.
+
+        Returns (lowest_com, lowest_cps, attachers, counts): heights are None
+        when nothing qualifies; attachers maps attacher name to the row of its
+        lowest wire (ties keep the earliest row).
+        """
+        idx = self.rows(photo_ids)
+        category = self.category[idx]
+        trace = self.trace[idx]
+        height = self.height[idx]
+        wires = category == self.WIRE
+        equipment = category == self.EQUIPMENT
+        measured = (trace != self.no_trace) & ~np.isnan(height)
+        is_cps = self.trace_is_cps[trace]
+
+        cps = measured & is_cps & ((wires & self.trace_is_cps_electric_wire[trace]) |
+                                   (equipment & self.trace_has_equipment_type[trace]))
+        com = measured & ~is_cps & (self.trace_company[trace] != "") & (wires | equipment)
+        lowest_com = float(height[com].min()) if com.any() else None
+        lowest_cps = float(height[cps].min()) if cps.any() else None
+
+        candidates = np.flatnonzero(measured & wires & ~self.trace_is_primary[trace])
+        attachers = {}
+        if len(candidates):
+            codes = self.trace_attacher[trace[candidates]]
+            # Sort by attacher, then height, then position; the first row of each attacher is its lowest
+            order = np.lexsort((candidates, height[candidates], codes))
+            _, first = np.unique(codes[order], return_index=True)
+            for row in candidates[order[first]]:
+                attachers[self.attacher_names[self.trace_attacher[trace[row]]]] = int(idx[row])
+
+        counts = {
+            'wire_count': int(wires.sum()),
+            'equipment_count': int(equipment.sum()),
+            'com_matches': int(com.sum()),
+            'cps_matches': int(cps.sum()),
+        }
+        return lowest_com, lowest_cps, attachers, counts
+
+
+class TraceIndex:
+    """Reverse index from trace id to every photofirst item carrying it on the job's main photos.
+
+    Built once per job; answers "where is this trace on photo P" in O(1) and
+    can follow one physical cable across every pole and midspan it appears on.
+    """
+
+    def __init__(self, job_data):
+        self.trace_data = job_data.get("traces", {}).get("trace_data", {})
+        self.occurrences = defaultdict(list)  # trace_id -> [(photo_id, category, item_key, item)]
+        self.by_photo = defaultdict(list)     # (trace_id, photo_id) -> [(category, item_key, item)]
+        self.photo_owner = {}                 # photo_id -> owner, as yielded by iter_main_photos
+        all_photos = job_data.get("photos", {})
+        for owner, photo_id in iter_main_photos(job_data):
+            if photo_id in self.photo_owner:
+                continue
+            self.photo_owner[photo_id] = owner
+            photofirst_data = all_photos.get(photo_id, {}).get("photofirst_data") or {}
+            # Same order and key collisions as {**wire, **equipment, **guying}
+            merged = {}
+            for category in PhotoItemTable.CATEGORIES:
+                for item_key, item in (photofirst_data.get(category) or {}).items():
+                    merged[item_key] = (category, item)
+            for item_key, (category, item) in merged.items():
+                trace_id = item.get("_trace") if isinstance(item, dict) else None
+                if not trace_id:
+                    continue
+                self.occurrences[trace_id].append((photo_id, category, item_key, item))
+                self.by_photo[(trace_id, photo_id)].append((category, item_key, item))
+
+    def in_photo(self, trace_id, photo_id):
+        """[(category, item_key, item)] for trace_id on photo_id, in item order"""
+        return self.by_photo.get((trace_id, photo_id), [])
+
+    def follow(self, trace_id):
+        """Every pole and midspan the trace appears on, in job order"""
+        stops = []
+        for photo_id, category, item_key, item in self.occurrences.get(trace_id, []):
+            owner = self.photo_owner[photo_id]
+            stop = {'kind': 'pole' if owner[0] == 'node' else 'midspan'}
+            if owner[0] == 'node':
+                stop['node_id'] = owner[1]
+            else:
+                stop['connection_id'], stop['section_id'] = owner[1], owner[2]
+            stop.update({
+                'photo_id': photo_id,
+                'category': category,
+                'item_key': item_key,
+                'measured_height': item.get("_measured_height"),
+                'mr_move': item.get("mr_move"),
+                'effective_moves': item.get("_effective_moves") or {},
+            })
+            stops.append(stop)
+        return stops
+
+
+class ConnectionTraceIndex:
+    """Traces per connection, built once per job from traces.trace_data and traces.trace_items.
+
+    by_connection_id follows trace_data's own "connection_id" field (trace_data
+    order, what the underground remedy text uses first); on_sections lists the
+    traces whose trace_items land on one of the connection's section photos,
+    the remedy text's fallback when trace_data names no trace for the connection.
+    """
+
+    def __init__(self, job_data):
+        traces = job_data.get("traces", {})
+        self.by_connection_id = defaultdict(list)
+        for trace_id, trace_info in (traces.get("trace_data") or {}).items():
+            connection_id = trace_info.get("connection_id") if isinstance(trace_info, dict) else None
+            if connection_id:
+                self.by_connection_id[connection_id].append(trace_id)
+
+        photo_connection = {}
+        for conn_id, conn_data in job_data.get("connections", {}).items():
+            for section_data in (conn_data.get("sections") or {}).values():
+                for photo_id in (section_data.get("photos") or {}):
+                    photo_connection.setdefault(photo_id, conn_id)
+        self.on_sections = defaultdict(list)
+        for trace_id, photos in (traces.get("trace_items") or {}).items():
+            seen = set()
+            for photo_id in (photos or {}):
+                conn_id = photo_connection.get(photo_id)
+                if conn_id and conn_id not in seen:
+                    seen.add(conn_id)
+                    self.on_sections[conn_id].append(trace_id)
+
+    def traces_for(self, connection_id):
+        """Trace ids whose trace_data names this connection"""
+        return self.by_connection_id.get(connection_id, [])
+
+    def traces_on(self, connection_id):
+        """Trace ids with items on this connection's section photos"""
+        return self.on_sections.get(connection_id, [])
+
+
+class NodeAttributes:
+    """Values derived from one node, each computed on first access and then
+    reused for the rest of the job. Get these through
+    FileProcessor.get_node_attributes() so every caller shares one instance.
+    """
+
+    def __init__(self, processor, job_data, node_id):
+        self._processor = processor
+        self._job_data = job_data
+        self.node_id = node_id
+        self.node_data = job_data.get("nodes", {}).get(node_id, {})
+
+    @cached_property
+    def main_photo_id(self):
+        photos = self.node_data.get("photos", {})
+        return next((pid for pid, pdata in photos.items() if pdata.get("association") == "main"), None)
+
+    @cached_property
+    def scid(self):
+        return get_scid_from_node_data(self.node_data, missing='N/A')
+
+    @cached_property
+    def scid_key(self):
+        return parse_scid(self.scid)
+
+    @cached_property
+    def neutral_height(self):
+        if not self.main_photo_id:
+            return None
+        return self._processor.get_photo_item_table(self._job_data).neutral_height(self.main_photo_id)
+
+    @cached_property
+    def work_type(self):
+        return self._processor.get_work_type(self._job_data, self.node_id)
+
+    @cached_property
+    def responsible_party(self):
+        return self._processor.get_responsible_party(self._job_data, self.node_id)
+
+    @cached_property
+    def pole_structure(self):
+        return self._processor.get_pole_structure(self._job_data, self.node_id)
+
+    @cached_property
+    def proposed_guy(self):
+        return self._processor.get_proposed_guy_value(self._job_data, self.node_id)
+
+
+def distance_feet(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance between two points, in feet"""
+    φ1, φ2 = math.radians(float(lat1)), math.radians(float(lat2))
+    Δφ = φ2 - φ1
+    Δλ = math.radians(float(lon2) - float(lon1))
+    a = math.sin(Δφ / 2) ** 2 + math.cos(φ1) * math.cos(φ2) * math.sin(Δλ / 2) ** 2
+    return 2 * SpatialIndex.EARTH_RADIUS_FEET * math.asin(math.sqrt(a))
+
+
+# One node's movement text: every attacher, CPS Energy only, and per company
+# (company -> text, only companies with at least one line).
+MovementSummary = namedtuple('MovementSummary', ['all', 'cps', 'by_company'])
+
+
+@lru_cache(maxsize=None)
+def height_text_inches(text):
+    """Inches for a formatted height such as 25'-6", or None when it does not parse.
+    Parsed the way the movement summary always has: the part after the
+    foot mark is taken as a signed number."""
+    parts = text.replace('"', '').split("'")
+    try:
+        return int(parts[0]) * 12 + int(parts[1])
+    except (ValueError, IndexError):
+        return None
+
+
+def movement_line(attacher):
+    """Movement summary line for one attacher, or None when it has nothing to report"""
+    name = attacher['name']
+    existing = attacher['existing_height']
+    proposed = attacher['proposed_height']
+    if attacher.get('is_proposed', False):
+        if '(Guy)' in name or '(Down Guy)' in name:
+            return f"Add {name} at {existing}"
+        return f"Install proposed {name} at {existing}"
+    if not (proposed and existing):
+        return None
+    existing_inches = height_text_inches(existing)
+    proposed_inches = height_text_inches(proposed)
+    if existing_inches is None or proposed_inches is None:
+        return None
+    movement = proposed_inches - existing_inches
+    if movement == 0:
+        return None
+    action = "Raise" if movement > 0 else "Lower"
+    return f"{action} {name} {abs(movement)}\" from {existing} to {proposed}"
+
+
+def summarize_movements(attachers):
+    """MovementSummary for attacher dicts, in the order given, walking them once"""
+    all_lines, cps_lines = [], []
+    by_company = defaultdict(list)
+    for attacher in attachers:
+        line = movement_line(attacher)
+        if line is None:
+            continue
+        all_lines.append(line)
+        if attacher['name'].lower().startswith("cps energy"):
+            cps_lines.append(line)
+        by_company[attacher.get('company', '')].append(line)
+    return MovementSummary("\n".join(all_lines), "\n".join(cps_lines),
+                           {company: "\n".join(lines) for company, lines in by_company.items()})
+
+
+def node_attachers(main_attachers, reference_spans, backspan_data):
+    """Main, reference span and backspan attachers as one sequence, in summary order"""
+    yield from main_attachers
+    for ref_span in reference_spans:
+        yield from ref_span.get('data', [])
+    yield from backspan_data
+
+
+def excel_cell_value(value):
+    """A row value as pandas' to_excel wrote it: None/NaN blank, numpy scalars as Python values"""
+    if value is None:
+        return ""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return ""
+    return value
+
+
+class WorkbookStreamWriter:
+    """Writes the MakeReadyData and refs sheets as rows arrive.
+
+    The sheet comes out as the pandas to_excel pass used to write it: each
+    column header is merged over rows 1-3 above a bold header row, columns
+    A-I are merged per Operation Number, and every column is as wide as its
+    longest value + 2. Merges and widths are applied once the MakeReadyData
+    rows are done, when the first refs rows arrive or on close(). Until then
+    add_rows only writes cells.
+    """
+    def __init__(self, path):
+        self.workbook = xlsxwriter.Workbook(path)
+        self.sheet = self.workbook.add_worksheet('MakeReadyData')
+        # Formats in the order the pandas version created them (pandas' header style first)
+        column_format = self.workbook.add_format({
+            'bold': True, 'align': 'center', 'valign': 'top',
+            'top': 1, 'right': 1, 'bottom': 1, 'left': 1
+        })
+        # Format for the merged header cells
+        self.header_format = self.workbook.add_format({
+            'bold': True,
+            'align': 'center',
+            'valign': 'vcenter',
+            'border': 1
+        })
+        # Format for merged data cells
+        self.data_format = self.workbook.add_format({
+            'align': 'center',
+            'valign': 'vcenter',
+            'border': 1
+        })
+        for idx, col_name in enumerate(MAKE_READY_COLUMNS):
+            self.sheet.write(EXCEL_DATA_START_ROW - 1, idx, col_name, column_format)
+        self.widths = [len(col_name) for col_name in MAKE_READY_COLUMNS]
+        self.next_row = EXCEL_DATA_START_ROW  # 0-based; the header row is EXCEL_DATA_START_ROW - 1
+        self.operation_groups = {}  # Operation Number -> [first row, last row, first row's values]
+        self.ref_sheet = None
+        self.next_ref_row = 1  # Start data from row 2 (index 1)
+
+    def add_rows(self, rows):
+        """Write MakeReadyData rows (dicts keyed by MAKE_READY_COLUMNS), layout rows included"""
+        for row in rows:
+            row_idx = self.next_row
+            self.next_row += 1
+            for idx, col_name in enumerate(MAKE_READY_COLUMNS):
+                value = row.get(col_name, "")
+                self.sheet.write(row_idx, idx, excel_cell_value(value))
+                self.widths[idx] = max(self.widths[idx], len(str(value)))
+            # Group rows by pole (identified by Operation Number), skipping the empty layout rows
+            op_num = str(row.get("Operation Number", ""))
+            if not op_num:
+                continue
+            group = self.operation_groups.get(op_num)
+            if group is None:
+                self.operation_groups[op_num] = [row_idx, row_idx, row]
+            else:
+                group[1] = row_idx
+
+    def add_ref_rows(self, ref_rows):
+        """Write refs sheet rows (lists in REF_COLUMNS order)"""
+        if self.ref_sheet is None:
+            self._finish_make_ready()
+        for values in ref_rows:
+            for c_idx, value in enumerate(values):
+                self.ref_sheet.write(self.next_ref_row, c_idx, value)
+            self.next_ref_row += 1
+
+    def close(self):
+        if self.ref_sheet is None:
+            self._finish_make_ready()
+        self.workbook.close()
+
+    def abort(self):
+        """Drop the workbook; nothing is written until close()"""
+        self.workbook = None
+
+    def _finish_make_ready(self):
+        # Merge each column header vertically from rows 1-3
+        for idx, col_name in enumerate(MAKE_READY_COLUMNS):
+            self.sheet.merge_range(0, idx, 2, idx, col_name, self.header_format)
+
+        # Merge columns A-I (A=0, ..., I=8) for each pole with more than one row,
+        # using the values from the pole's first row
+        for start_row, end_row, first_row in self.operation_groups.values():
+            if end_row > start_row:
+                for col_idx in range(9):
+                    value = excel_cell_value(first_row.get(MAKE_READY_COLUMNS[col_idx], ""))
+                    self.sheet.merge_range(start_row, col_idx, end_row, col_idx, value, self.data_format)
+
+        # Auto-fit all columns: longest value or column name, plus a little extra space
+        for idx, width in enumerate(self.widths):
+            self.sheet.set_column(idx, idx, width + 2)
+
+        # Add a new sheet for reference data with detailed attachers
+        self.ref_sheet = self.workbook.add_worksheet('refs')
+        for c_idx, header in enumerate(REF_COLUMNS):
+            self.ref_sheet.write(0, c_idx, header)
+        # Auto-fit columns for the "refs" sheet
+        self.ref_sheet.set_column(0, 0, 12)  # Pole #
+        self.ref_sheet.set_column(1, 1, 15)  # SCID
+        self.ref_sheet.set_column(2, 2, 20)  # Ref. Structure SCID
+        self.ref_sheet.set_column(3, 3, 30)  # Attacher Name
+        self.ref_sheet.set_column(4, 4, 25)  # Main Pole Existing Height
+        self.ref_sheet.set_column(5, 5, 25)  # Main Pole Proposed Height
+        self.ref_sheet.set_column(6, 6, 25)  # Mid-Span Existing Height
+        self.ref_sheet.set_column(7, 7, 25)  # Mid-Span Proposed Height
+
+
+def excel_writer_process(path, messages, result_conn):
+    """Writer side of PipelinedWorkbookWriter: apply ('rows' | 'refs', payload)
+    messages to a WorkbookStreamWriter until ('close', None) or ('abort', None).
+    Sends None on success or the error text through result_conn. Exits without
+    writing if the job process dies (e.g. SIGKILLed after a cancel)."""
+    error = None
+    # The process that started this one; with forkserver that is not os.getppid()
+    parent = multiprocessing.parent_process()
+    try:
+        writer = WorkbookStreamWriter(path)
+        while True:
+            try:
+                kind, payload = messages.get(timeout=PIPELINE_POLL_SECONDS)
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    return
+                continue
+            if kind == 'rows':
+                writer.add_rows(payload)
+            elif kind == 'refs':
+                writer.add_ref_rows(payload)
+            elif kind == 'close':
+                writer.close()
+                break
+            else:  # abort: leave the file unwritten
+                break
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    result_conn.send(error)
+    result_conn.close()
+
+
+def child_process_context():
+    """forkserver (preloading this module) where available, else spawn. Never fork:
+    the job process may have other threads running (e.g. profile_files' StackSampler)
+    and a forked child would inherit whatever locks they hold."""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class PipelinedWorkbookWriter:
+    """WorkbookStreamWriter in a dedicated writer process, fed through a bounded queue.
+
+    The analysing process keeps producing row blocks while the writer process
+    writes cells, and at close() merges, serialises and compresses the
+    workbook. A full queue makes the producer wait, so memory stays bounded
+    when the writer falls behind.
+    """
+    def __init__(self, path, cancel_check=None):
+        context = child_process_context()
+        self.messages = context.Queue(maxsize=PIPELINE_QUEUE_BLOCKS)
+        self.result_reader, result_writer = context.Pipe(duplex=False)
+        self.cancel_check = cancel_check
+        self.process = context.Process(target=excel_writer_process, args=(path, self.messages, result_writer),
+                                       name="excel-writer")
+        self.process.start()
+        result_writer.close()
+
+    def _put(self, message):
+        while True:
+            if self.cancel_check is not None:
+                self.cancel_check()
+            if not self.process.is_alive():
+                raise WorkbookWriterError(f"Excel writer process exited early: {self._result()}")
+            try:
+                self.messages.put(message, timeout=PIPELINE_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _result(self):
+        try:
+            if self.result_reader.poll():
+                return self.result_reader.recv()
+        except EOFError:
+            pass
+        return f"exit code {self.process.exitcode}"
+
+    def add_rows(self, rows):
+        self._put(('rows', rows))
+
+    def add_ref_rows(self, ref_rows):
+        self._put(('refs', ref_rows))
+
+    def close(self):
+        self._put(('close', None))
+        self.process.join()
+        error = self._result()
+        if error is not None:
+            raise WorkbookWriterError(f"Excel writer process failed: {error}")
+
+    def abort(self):
+        """Stop the writer without writing the workbook"""
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        # Rows still in the feeder thread's buffer can never be delivered now;
+        # don't let interpreter exit block on flushing them
+        self.messages.cancel_join_thread()
+        self.messages.close()
+
+
+def plan_shards(records, shard_by, shard_size):
+    """Split records [(operation_number, scid), ...] into shards.
+
+    Returns [{'label': str, 'records': [index, ...]}, ...] with record indexes in
+    their original order. 'operations' starts a new shard every shard_size
+    distinct Operation Numbers. 'scid' groups numeric SCID bases into ranges
+    of shard_size (000-099, 100-199, ...); non-numeric, empty and N/A SCIDs go
+    to a final 'scid_other' shard.
+    """
+    shards = []
+    if shard_by == 'operations':
+        operations = set()
+        for index, (operation, _) in enumerate(records):
+            if operation not in operations and len(operations) >= shard_size:
+                shards[-1]['label'] = f"ops_{shards[-1]['first']}-{shards[-1]['last']}"
+                operations = set()
+            if not operations:
+                shards.append({'first': operation, 'records': []})
+            operations.add(operation)
+            shards[-1]['records'].append(index)
+            shards[-1]['last'] = operation
+        if shards:
+            shards[-1]['label'] = f"ops_{shards[-1]['first']}-{shards[-1]['last']}"
+        return [{'label': shard['label'], 'records': shard['records']} for shard in shards]
+
+    buckets = defaultdict(list)
+    for index, (_, scid) in enumerate(records):
+        key = parse_scid(scid)
+        # parse_scid sorts an empty base as 0; for sharding it is not a numeric SCID
+        numeric = not key.na and key.base[0] == 0 and key.text.split('.')[0] != ''
+        buckets[key.base[1] // shard_size if numeric else None].append(index)
+    for bucket in sorted(b for b in buckets if b is not None):
+        low = bucket * shard_size
+        shards.append({'label': f"scid_{low:03d}-{low + shard_size - 1:03d}", 'records': buckets[bucket]})
+    if None in buckets:
+        shards.append({'label': "scid_other", 'records': buckets[None]})
+    return shards
+
+
+def write_workbook(path, rows, ref_rows):
+    """Write a complete MakeReadyData + refs workbook from prepared rows.
+    Runs in shard worker processes, so it only takes plain lists and dicts."""
+    writer = WorkbookStreamWriter(path)
+    writer.add_rows(rows)
+    writer.add_ref_rows(ref_rows)
+    writer.close()
+    return path
 
 
 class FileProcessor:
-    def __init__(self, output_dir=None):
+    def __init__(self, output_dir=None, cancel_event=None, log_detail=False):
         # Centralized path management with fallback logic
         if output_dir:
             self.downloads_path = output_dir
@@ -214,12 +1389,131 @@ class FileProcessor:
         os.makedirs(self.downloads_path, exist_ok=True)
         
         self.job_data = None
+        # Lookup structures built once per job (spatial index, connection graph, ...), see _job_index()
+        self._job_indexes = {}
+        self._indexed_job = None
+        self.multi_backspan_nodes = {}  # node_id -> backspan connection ids, when there is more than one
+        self.gis_coordinates = {}  # node_id -> (lat, lon) from GeoJSON, for nodes the job has no position for
         self.logger = ProcessingLogger()
+        # Also stream every logged item to {base}_LogDetail_{timestamp}.jsonl
+        self.log_detail = log_detail
+        # threading/multiprocessing Event; checked between nodes and connections
+        self.cancel_event = cancel_event
+        # Instrumentation, read by the API's /api/metrics via metrics_snapshot()
+        self.stage_seconds = {}
+        self.counters = {}
+        self.cache_stats = {}  # cache name -> [hits, misses]
+        self.profiling = False  # Set by profile_files
+
+    def record_stage(self, stage, started):
+        """Add the wall time since `started` (a time.perf_counter() value) to `stage`"""
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + time.perf_counter() - started
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_cache(self, cache, hit):
+        """Record one lookup in a named cache, for hit-ratio metrics"""
+        stats = self.cache_stats.setdefault(cache, [0, 0])
+        stats[0 if hit else 1] += 1
+
+    def write_report(self, path, job_json_path):
+        """Write the machine-readable counterpart of the text log (see REPORT_VERSION)"""
+        report = {
+            'report_version': REPORT_VERSION,
+            'source_file': os.path.basename(job_json_path),
+            'generated': datetime.datetime.now().isoformat(),
+            **self.logger.to_report(),
+            'scid_index': self.get_scid_index(self.job_data) if self.job_data is not None else {},
+            'movements_by_company': {
+                node_id: summary.by_company
+                for node_id, summary in self.get_movement_summaries(self.job_data).items()
+                if summary.by_company
+            } if self.job_data is not None else {},
+            'multi_backspan_nodes': [
+                {'node_id': node_id, 'connections': conn_ids}
+                for node_id, conn_ids in self.multi_backspan_nodes.items()
+            ],
+            'stage_seconds': dict(self.stage_seconds),
+            'counters': dict(self.counters)
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    def metrics_snapshot(self):
+        """Plain-dict copy of the instrumentation, safe to send between processes"""
+        return {
+            'stage_seconds': dict(self.stage_seconds),
+            'counters': dict(self.counters),
+            'cache': {cache: {'hits': hits, 'misses': misses} for cache, (hits, misses) in self.cache_stats.items()},
+        }
+
+    def check_cancelled(self):
+        """Raise ProcessingCancelled if the caller has asked us to stop"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ProcessingCancelled()
 
     def load_json(self, path):
-        with open(path, 'r', encoding='utf-8') as file:
+        with open_json_stream(path) as file:
             return json.load(file)
 
+    def _job_index(self, job_data, name, build):
+        """Return the lookup structure `name` for job_data, calling build(job_data)
+        the first time it is asked for. Everything is dropped when a different job is passed."""
+        if job_data is not self._indexed_job:
+            self._indexed_job = job_data
+            self._job_indexes = {}
+        if name not in self._job_indexes:
+            started = time.perf_counter()
+            self._job_indexes[name] = build(job_data)
+            self.record_stage(name, started)
+        return self._job_indexes[name]
+
+    def get_spatial_index(self, job_data):
+        """SpatialIndex over the job's node coordinates (sections are not indexed)"""
+        return self._job_index(job_data, 'spatial_index', SpatialIndex.from_job)
+
+    def get_photo_item_table(self, job_data):
+        """PhotoItemTable (columnar photofirst items) over the job's main photos"""
+        return self._job_index(job_data, 'photo_item_table', PhotoItemTable)
+
+    def get_trace_index(self, job_data):
+        """TraceIndex (trace id -> photofirst items) over the job's main photos"""
+        return self._job_index(job_data, 'trace_index', TraceIndex)
+
+    def get_connection_traces(self, job_data):
+        """ConnectionTraceIndex (connection id -> trace ids) for the job"""
+        return self._job_index(job_data, 'connection_traces', ConnectionTraceIndex)
+
+    def get_node_attributes(self, job_data, node_id):
+        """Shared NodeAttributes for a node, created on first request"""
+        nodes = self._job_index(job_data, 'node_attributes', lambda _: {})
+        attributes = nodes.get(node_id)
+        self.record_cache('node_attributes', attributes is not None)
+        if attributes is None:
+            attributes = nodes[node_id] = NodeAttributes(self, job_data, node_id)
+        return attributes
+
+    def get_movement_summaries(self, job_data):
+        """node id -> MovementSummary for the nodes summarised so far in this job"""
+        return self._job_index(job_data, 'movement_summaries', lambda _: {})
+
+    def get_scid_index(self, job_data):
+        """SCID -> node ids (see build_scid_index), built once per job"""
+        return self._job_index(job_data, 'scid_index', build_scid_index)
+
+    def get_connection_graph(self, job_data):
+        """ConnectionGraph (per-node adjacency lists) over the job's connections"""
+        return self._job_index(job_data, 'connection_graph', ConnectionGraph)
+
+    def node_coordinates(self, job_data, node_id):
+        """(lat, lon) of a node from the job, else from the GIS join, else (None, None)"""
+        node = job_data.get("nodes", {}).get(node_id, {})
+        lat, lon = node.get("latitude"), node.get("longitude")
+        if None in (lat, lon):
+            lat, lon = self.gis_coordinates.get(node_id, (None, None))
+        return lat, lon
+
     def format_height_feet_inches(self, total_in):
         if not isinstance(total_in, (int, float)):
             # Consider logging this as a warning if it's unexpected
@@ -265,8 +1559,9 @@ class FileProcessor:
         photofirst_data = photo_data.get("photofirst_data", {})
         trace_data = job_data.get("traces", {}).get("trace_data", {})
         
-        # First pass: collect all power wires to find the lowest one
+        # Single pass: collect every labelled item, noting power wires (CPS owned) and their heights
         power_wires = {}
+        candidates = []  # (attacher_name, trace_id, is_power)
         for category in ["wire", "equipment", "guying"]:
             for item in photofirst_data.get(category, {}).values():
                 trace_id = item.get("_trace")
@@ -278,15 +1573,17 @@ class FileProcessor:
                 if not type_label:
                     continue
                 
-                # Check if it's a power wire (CPS owned)
-                if company.lower() == "cps energy" and type_label.lower() in ["primary", "neutral", "street light"]:
+                is_power = company.lower() == "cps energy" and type_label.lower() in ["primary", "neutral", "street light"]
+                if is_power:
                     measured = item.get("_measured_height")
                     if measured is not None:
                         try:
                             measured = float(measured)
                             power_wires[type_label] = (measured, trace_id)
                         except:
-                            continue
+                            pass
+                attacher_name = type_label if company.lower() == "cps energy" else f"{company} {type_label}"
+                candidates.append((attacher_name, trace_id, is_power))
         
         # Find the lowest power wire
         lowest_power_wire = None
@@ -296,25 +1593,11 @@ class FileProcessor:
                 lowest_height = height
                 lowest_power_wire = (wire_type, trace_id)
         
-        # Second pass: collect all non-power wires and only the lowest power wire
-        for category in ["wire", "equipment", "guying"]:
-            for item in photofirst_data.get(category, {}).values():
-                trace_id = item.get("_trace")
-                if not trace_id or trace_id not in trace_data:
-                    continue
-                trace_entry = trace_data[trace_id]
-                company = trace_entry.get("company", "").strip()
-                type_label = trace_entry.get("cable_type", "") if category in ["wire", "guying"] else trace_entry.get("equipment_type", "")
-                if not type_label:
-                    continue
-                
-                # Skip if it's a power wire that's not the lowest one
-                if company.lower() == "cps energy" and type_label.lower() in ["primary", "neutral", "street light"]:
-                    if not lowest_power_wire or trace_id != lowest_power_wire[1]:
-                        continue
-                
-                attacher_name = type_label if company.lower() == "cps energy" else f"{company} {type_label}"
-                attachers[attacher_name] = trace_id
+        # Keep all non-power attachers and only the lowest power wire
+        for attacher_name, trace_id, is_power in candidates:
+            if is_power and (not lowest_power_wire or trace_id != lowest_power_wire[1]):
+                continue
+            attachers[attacher_name] = trace_id
         return attachers
 
     def get_heights_for_node_trace_attachers(self, job_data, node_id, attacher_trace_map):
@@ -323,12 +1606,9 @@ class FileProcessor:
         main_photo_id = next((pid for pid, pdata in photo_ids.items() if pdata.get("association") == "main"), None)
         if not main_photo_id:
             return heights
-        photofirst_data = job_data.get("photos", {}).get(main_photo_id, {}).get("photofirst_data", {})
-        all_sections = {**photofirst_data.get("wire", {}), **photofirst_data.get("equipment", {}), **photofirst_data.get("guying", {})}
+        trace_index = self.get_trace_index(job_data)
         for attacher_name, trace_id in attacher_trace_map.items():
-            for item in all_sections.values():
-                if item.get("_trace") != trace_id:
-                    continue
+            for _, _, item in trace_index.in_photo(trace_id, main_photo_id):
                 measured = item.get("_measured_height")
                 mr_move = item.get("mr_move", 0)
                 if measured is not None:
@@ -344,6 +1624,17 @@ class FileProcessor:
                         print(f"Height parse error: {str(e)}")
         return heights
 
+    def follow_cable(self, job_data, trace_id):
+        """Trace attributes plus every pole and midspan the cable appears on (see TraceIndex.follow)"""
+        trace_info = job_data.get("traces", {}).get("trace_data", {}).get(trace_id, {})
+        return {
+            'trace_id': trace_id,
+            'company': trace_info.get("company", ""),
+            'cable_type': trace_info.get("cable_type", "") or trace_info.get("equipment_type", ""),
+            'proposed': bool(trace_info.get("proposed", False)),
+            'stops': self.get_trace_index(job_data).follow(trace_id),
+        }
+
     def get_main_pole_attacher_heights(self, job_data, node_id):
         """Get a dictionary of attacher heights from the main pole's main photo
         Returns: {attacher_name: {'existing': str, 'proposed': str, 'raw_height': float}}
@@ -437,36 +1728,8 @@ class FileProcessor:
 
 
     def get_neutral_wire_height(self, job_data, node_id):
-        """Find the height of the neutral wire for a given node"""
-        # Get the node's photos
-        node_photos = job_data.get("nodes", {}).get(node_id, {}).get("photos", {})
-        # Find the main photo
-        main_photo_id = next((pid for pid, pdata in node_photos.items() if pdata.get("association") == "main"), None)
-        
-        if main_photo_id:
-            # Get photofirst_data from the main photo
-            photo_data = job_data.get("photos", {}).get(main_photo_id, {})
-            photofirst_data = photo_data.get("photofirst_data", {})
-            
-            # Get trace_data
-            trace_data = job_data.get("traces", {}).get("trace_data", {})
-            
-            # Look through wire section for neutral wire
-            for wire in photofirst_data.get("wire", {}).values():
-                trace_id = wire.get("_trace")
-                if trace_id and trace_id in trace_data:
-                    trace_info = trace_data[trace_id]
-                    company = trace_info.get("company", "").strip()
-                    cable_type = trace_info.get("cable_type", "").strip()
-                    
-                    if company.lower() == "cps energy" and cable_type.lower() == "neutral":
-                        measured_height = wire.get("_measured_height")
-                        if measured_height is not None:
-                            try:
-                                return float(measured_height)
-                            except (ValueError, TypeError):
-                                continue
-        return None
+        """Find the height of the neutral wire for a given node (first CPS ENERGY neutral on its main photo)"""
+        return self.get_node_attributes(job_data, node_id).neutral_height
 
     def get_attachers_for_node(self, job_data, node_id):
         """Get all attachers for a node including guying and drip loops"""
@@ -476,12 +1739,8 @@ class FileProcessor:
         # Get neutral wire height
         neutral_height = self.get_neutral_wire_height(job_data, node_id)
         
-        # Get SCID for logging
-        node_props = job_data.get("nodes", {}).get(node_id, {}).get("attributes", {})
-        scid_data = node_props.get("scid", {})
-        scid = next(iter(scid_data.values()), "Unknown") if scid_data else "Unknown"
-        
-        # Start logging for this node
+        # Start logging for this node, with the same SCID the sheet shows
+        scid = self.get_node_attributes(job_data, node_id).scid
         self.logger.log_node_start(node_id, scid, neutral_height)
         
         # Get the node's photos
@@ -635,6 +1894,7 @@ class FileProcessor:
                     'proposed_height': proposed_height_fmt,
                     'raw_height': measured_height_val,  # Keep raw for sorting
                     'is_proposed': is_proposed,  # For movement summary
+                    'company': company,
                 })
                 
                 # Log successful processing
@@ -668,123 +1928,86 @@ class FileProcessor:
             }
         }
 
-    def get_lowest_heights_for_connection(self, job_data, connection_id):
-        """Get the lowest heights for communication and CPS electrical attachments in a connection
-        Returns: (lowest_com_formatted, lowest_cps_formatted)
+    def get_span_profile(self, job_data, connection_id):
+        """Span profile for a connection (see build_span_profile), built once per job"""
+        profiles = self._job_index(job_data, 'span_profiles', lambda _: {})
+        hit = connection_id in profiles
+        self.record_cache('span_profile', hit)
+        if not hit:
+            started = time.perf_counter()
+            profiles[connection_id] = self.build_span_profile(job_data, connection_id)
+            self.record_stage('span_profiles', started)
+        return profiles[connection_id]
+
+    def build_span_profile(self, job_data, connection_id):
+        """Collect everything the mid-span and lowest-height columns need for a
+        connection, as one grouped reduction over its section photos in the
+        PhotoItemTable.
+
+        Returns None if the connection is missing or has no sections, else a dict:
+          attachers:  "{company} {cable_type}" (primary excluded) ->
+                      lowest_height, total_move, has_move, proposed
+          lowest_com / lowest_cps: lowest heights in inches, or None
+          wire_count / equipment_count / com_matches / cps_matches: for debug output
         """
-        print(f"DEBUG: Processing connection {connection_id} for lowest heights")
-        lowest_com = float('inf')
-        lowest_cps = float('inf')
-        
-        # Get the connection data
         connection_data = job_data.get("connections", {}).get(connection_id, {})
         if not connection_data:
-            print(f"WARNING: No connection data found for {connection_id}")
-            return "", ""
-            
-        # Get sections from the connection
+            return None
         sections = connection_data.get("sections", {})
         if not sections:
-            print(f"WARNING: No sections found for connection {connection_id}")
-            return "", ""
-            
-        print(f"DEBUG: Found {len(sections)} sections in connection {connection_id}")
-        
-        # Get trace_data
-        trace_data = job_data.get("traces", {}).get("trace_data", {})
-        
-        wire_count = 0
-        equipment_count = 0
-        cps_matches = 0
-        com_matches = 0
-        
-        # Look through each section's photos
-        for section_id, section_data in sections.items():
+            return None
+
+        table = self.get_photo_item_table(job_data)
+        photo_ids = []
+        for section_data in sections.values():
             photos = section_data.get("photos", {})
             main_photo_id = next((pid for pid, pdata in photos.items() if pdata.get("association") == "main"), None)
-            if not main_photo_id:
-                continue
-                
-            # Get photofirst_data
-            photo_data = job_data.get("photos", {}).get(main_photo_id, {})
-            photofirst_data = photo_data.get("photofirst_data", {})
-            
-            # Process wire data
-            for wire in photofirst_data.get("wire", {}).values():
-                wire_count += 1
-                trace_id = wire.get("_trace")
-                if not trace_id or trace_id not in trace_data:
-                    continue
-                    
-                trace_info = trace_data[trace_id]
-                company = trace_info.get("company", "").strip()
-                cable_type = trace_info.get("cable_type", "").strip()
-                measured_height = wire.get("_measured_height")
-                
-                if measured_height is not None:
-                    try:
-                        height = float(measured_height)
-                        
-                        # Enhanced CPS Energy electrical matching - more flexible company name check
-                        cps_variations = ["cps energy", "cps", "cpse"]
-                        is_cps = any(cps_var in company.lower() for cps_var in cps_variations)
-                        
-                        # For CPS ENERGY electrical (Neutral or Street Light)
-                        if is_cps and cable_type.lower() in ["neutral", "street light"]:
-                            lowest_cps = min(lowest_cps, height)
-                            cps_matches += 1
-                        # For communication attachments (non-CPS companies)
-                        elif not is_cps and company:  # Only non-empty, non-CPS companies
-                            lowest_com = min(lowest_com, height)
-                            com_matches += 1
-                    except (ValueError, TypeError):
-                        continue
-            
-            # Also check equipment section for CPS electrical equipment
-            for equipment in photofirst_data.get("equipment", {}).values():
-                equipment_count += 1
-                trace_id = equipment.get("_trace")
-                if not trace_id or trace_id not in trace_data:
-                    continue
-                    
-                trace_info = trace_data[trace_id]
-                company = trace_info.get("company", "").strip()
-                equipment_type = trace_info.get("equipment_type", "").strip()
-                measured_height = equipment.get("_measured_height")
-                
-                if measured_height is not None:
-                    try:
-                        height = float(measured_height)
-                        
-                        # Enhanced CPS Energy electrical matching
-                        cps_variations = ["cps energy", "cps", "cpse"]
-                        is_cps = any(cps_var in company.lower() for cps_var in cps_variations)
-                        
-                        # For CPS electrical equipment (transformers, switches, etc.)
-                        if is_cps and equipment_type:
-                            lowest_cps = min(lowest_cps, height)
-                            cps_matches += 1
-                        # For communication equipment (non-CPS companies)
-                        elif not is_cps and company:  # Only non-empty, non-CPS companies
-                            lowest_com = min(lowest_com, height)
-                            com_matches += 1
-                    except (ValueError, TypeError):
-                        continue
-        
-        print(f"DEBUG: Processed {wire_count} wires, {equipment_count} equipment items")
-        print(f"DEBUG: Found {cps_matches} CPS matches, {com_matches} communication matches")
+            if main_photo_id:
+                photo_ids.append(main_photo_id)
+        lowest_com, lowest_cps, lowest_rows, profile = table.span_summary(photo_ids)
+
+        # Moves at each attacher's lowest section; only nonzero moves count
+        attachers = {}
+        for attacher_name, row in lowest_rows.items():
+            mr_move = table.mr_move[row]
+            has_mr_move = abs(mr_move) > 0.01  # False for NaN
+            has_effective_move = bool(table.has_effective_move[row])
+            attachers[attacher_name] = {
+                'lowest_height': float(table.height[row]),
+                'total_move': (float(mr_move) if has_mr_move else 0.0) + float(table.effective_move[row]),
+                'has_move': bool(has_mr_move or has_effective_move),
+                'proposed': bool(table.trace_proposed[table.trace[row]]),
+            }
+
+        profile['attachers'] = attachers
+        profile['lowest_com'] = lowest_com
+        profile['lowest_cps'] = lowest_cps
+        return profile
+
+    def get_lowest_heights_for_connection(self, job_data, connection_id):
+        """Get the lowest heights for communication and CPS electrical attachments in a connection
+        Returns: (lowest_com_formatted, lowest_cps_formatted)
+        """
+        print(f"DEBUG: Processing connection {connection_id} for lowest heights")
+        profile = self.get_span_profile(job_data, connection_id)
+        if profile is None:
+            print(f"WARNING: No connection data or sections found for {connection_id}")
+            return "", ""
+
+        print(f"DEBUG: Processed {profile['wire_count']} wires, {profile['equipment_count']} equipment items")
+        print(f"DEBUG: Found {profile['cps_matches']} CPS matches, {profile['com_matches']} communication matches")
         
         # Format the heights
         lowest_com_formatted = ""
-        if lowest_com != float('inf'):
-            feet = int(lowest_com) // 12
-            inches = round(lowest_com - (feet * 12))
+        if profile['lowest_com'] is not None:
+            feet = int(profile['lowest_com']) // 12
+            inches = round(profile['lowest_com'] - (feet * 12))
             lowest_com_formatted = f"{feet}'-{inches}\""
             
         lowest_cps_formatted = ""
-        if lowest_cps != float('inf'):
-            feet = int(lowest_cps) // 12
-            inches = round(lowest_cps - (feet * 12))
+        if profile['lowest_cps'] is not None:
+            feet = int(profile['lowest_cps']) // 12
+            inches = round(profile['lowest_cps'] - (feet * 12))
             lowest_cps_formatted = f"{feet}'-{inches}\""
             
         print(f"DEBUG: Connection {connection_id} - Lowest Com: {lowest_com_formatted}, Lowest CPS: {lowest_cps_formatted}")
@@ -823,16 +2046,14 @@ class FileProcessor:
     
     def cardinal_between_nodes(self, job_data, pole_id, ref_id, conn):
         """Return 'N', 'NE', … from pole → reference."""
-        pole = job_data["nodes"].get(pole_id, {})
-        lat1, lon1 = pole.get("latitude"), pole.get("longitude")
+        lat1, lon1 = self.node_coordinates(job_data, pole_id)
 
         # fallback: use first survey point if pole lacks coordinates
         if None in (lat1, lon1):
             first_section = next(iter(conn.get("sections", {}).values()), {})
             lat1, lon1 = first_section.get("latitude"), first_section.get("longitude")
 
-        ref = job_data["nodes"].get(ref_id, {})
-        lat2, lon2 = ref.get("latitude"), ref.get("longitude")
+        lat2, lon2 = self.node_coordinates(job_data, ref_id)
 
         if None in (lat1, lon1, lat2, lon2):
             return "??"                   # can't solve direction
@@ -851,6 +2072,40 @@ class FileProcessor:
         
         return (bearing, cardinal)
 
+    def get_span_length_summary(self, job_data, from_node_id, to_node_id, node_properties):
+        """Text for the "Span Length / Nearby Structure" column.
+
+        Span length between the two nodes (flagged past SPAN_LENGTH_LIMIT_FEET),
+        then any pole within NEARBY_STRUCTURE_RADIUS_FEET of the from-pole that
+        shares no connection with it.
+        """
+        index = self.get_spatial_index(job_data)
+        start = index.coordinates(('node', from_node_id))
+        end = index.coordinates(('node', to_node_id))
+        parts = []
+
+        if start and end:
+            span_feet = distance_feet(start[0], start[1], end[0], end[1])
+            if span_feet > SPAN_LENGTH_LIMIT_FEET:
+                parts.append(f"{span_feet:.0f} ft (check span length)")
+            else:
+                parts.append(f"{span_feet:.0f} ft")
+
+        if start:
+            skip = {from_node_id, to_node_id} | self.get_connection_graph(job_data).neighbors(from_node_id)
+            for distance, (_, node_id) in index.within(start[0], start[1], NEARBY_STRUCTURE_RADIUS_FEET, kind='node'):
+                props = node_properties.get(node_id, {})
+                if node_id in skip or props.get('node_type') != 'pole':
+                    continue
+                label = props.get('DLOC_number')
+                if not label or label == 'N/A':
+                    label = props.get('pole_tag', 'N/A')
+                if label == 'N/A':
+                    label = props.get('scid', 'N/A')
+                parts.append(f"Nearby pole {label} ({distance:.0f} ft)")
+
+        return "; ".join(parts)
+
     def get_backspan_attachers(self, job_data, current_node_id):
         """Find backspan attachers by finding a connection where current_node_id matches node_id_2"""
         backspan_data = []
@@ -862,34 +2117,40 @@ class FileProcessor:
         # Get trace_data
         trace_data = job_data.get("traces", {}).get("trace_data", {})
         
-        # Find the connection where our current_node_id matches node_id_2
+        # Backspan = the first connection ending at this pole (node_id_2), as before.
+        # Poles with several aerial backspans are listed in the report.
+        graph = self.get_connection_graph(job_data)
+        backspan_ids = graph.backspans(current_node_id)
+        aerial_backspans = graph.aerial_backspans(current_node_id)
+        if len(aerial_backspans) > 1 and current_node_id not in self.multi_backspan_nodes:
+            self.multi_backspan_nodes[current_node_id] = aerial_backspans
+            self.count('multi_backspan_poles')
         backspan_connection = None
-        for conn_id, conn_data in job_data.get("connections", {}).items():
-            if conn_data.get("node_id_2") == current_node_id:
-                backspan_connection = conn_data
-                # Calculate bearing from coordinates
-                sections = conn_data.get("sections", {})
-                if sections:
-                    first_section = next(iter(sections.values()))
-                    if first_section:
-                        lat = first_section.get("latitude")
-                        lon = first_section.get("longitude")
-                        if lat and lon:
-                            # Get the from pole coordinates
-                            from_node = job_data.get("nodes", {}).get(current_node_id, {})
-                            from_photos = from_node.get("photos", {})
-                            if from_photos:
-                                main_photo_id = next((pid for pid, pdata in from_photos.items() if pdata.get("association") == "main"), None)
-                                if main_photo_id:
-                                    photo_data = job_data.get("photos", {}).get(main_photo_id, {})
-                                    if photo_data and "latitude" in photo_data and "longitude" in photo_data:
-                                        from_lat = photo_data["latitude"]
-                                        from_lon = photo_data["longitude"]
-                                        # Calculate bearing
-                                        degrees, cardinal = self.calculate_bearing(from_lat, from_lon, lat, lon)
-                                        bearing = f"{cardinal} ({int(degrees)}°)"
-                break
-        
+        for conn_id in backspan_ids[:1]:
+            conn_data = graph.connections[conn_id]
+            backspan_connection = conn_data
+            # Calculate bearing from coordinates
+            sections = conn_data.get("sections", {})
+            if sections:
+                first_section = next(iter(sections.values()))
+                if first_section:
+                    lat = first_section.get("latitude")
+                    lon = first_section.get("longitude")
+                    if lat and lon:
+                        # Get the from pole coordinates
+                        from_node = job_data.get("nodes", {}).get(current_node_id, {})
+                        from_photos = from_node.get("photos", {})
+                        if from_photos:
+                            main_photo_id = next((pid for pid, pdata in from_photos.items() if pdata.get("association") == "main"), None)
+                            if main_photo_id:
+                                photo_data = job_data.get("photos", {}).get(main_photo_id, {})
+                                if photo_data and "latitude" in photo_data and "longitude" in photo_data:
+                                    from_lat = photo_data["latitude"]
+                                    from_lon = photo_data["longitude"]
+                                    # Calculate bearing
+                                    degrees, cardinal = self.calculate_bearing(from_lat, from_lon, lat, lon)
+                                    bearing = f"{cardinal} ({int(degrees)}°)"
+    
         if not backspan_connection:
             return [], ""
             
@@ -931,7 +2192,8 @@ class FileProcessor:
                             attacher_sections[attacher_name] = {
                                 "measured_height": measured_height,
                                 "mr_move": mr_move,
-                                "effective_moves": effective_moves
+                                "effective_moves": effective_moves,
+                                "company": company
                             }
                     except (ValueError, TypeError):
                         continue
@@ -955,7 +2217,8 @@ class FileProcessor:
                                 attacher_sections[attacher_name] = {
                                     "measured_height": guy_height,
                                     "mr_move": mr_move,
-                                    "effective_moves": effective_moves
+                                    "effective_moves": effective_moves,
+                                    "company": company
                                 }
                     except (ValueError, TypeError):
                         continue
@@ -984,7 +2247,8 @@ class FileProcessor:
                 'name': attacher_name,
                 'existing_height': existing_height,
                 'proposed_height': proposed_height,
-                'raw_height': measured_height
+                'raw_height': measured_height,
+                'company': info["company"]
             })
         backspan_data.sort(key=lambda x: x['raw_height'], reverse=True)
         return backspan_data, bearing
@@ -999,7 +2263,9 @@ class FileProcessor:
         # GET MAIN POLE HEIGHTS LOOKUP - This was missing!
         main_pole_attachers_lookup = self.get_main_pole_attacher_heights(job_data, current_node_id)
 
-        for conn_id, conn_data in job_data.get("connections", {}).items():
+        graph = self.get_connection_graph(job_data)
+        for conn_id in graph.references(current_node_id):
+            conn_data = graph.connections[conn_id]
             # Use the new helper function to check if this is a valid reference connection
             if is_reference_connection(conn_data, nodes_data, current_node_id):
                 
@@ -1017,12 +2283,12 @@ class FileProcessor:
                 pole_node_data = nodes_data.get(pole_id, {})
                 ref_node_data = nodes_data.get(ref_id, {})
 
-                lat1, lon1 = pole_node_data.get("latitude"), pole_node_data.get("longitude")
+                lat1, lon1 = self.node_coordinates(job_data, pole_id)
                 if None in (lat1, lon1) and conn_data.get("sections"): # Check if sections exist
                     first_section_data = next(iter(conn_data.get("sections", {}).values()), {})
                     lat1, lon1 = first_section_data.get("latitude"), first_section_data.get("longitude")
 
-                lat2, lon2 = ref_node_data.get("latitude"), ref_node_data.get("longitude")
+                lat2, lon2 = self.node_coordinates(job_data, ref_id)
 
                 numeric_bearing = -1 
                 cardinal_bearing_str = "??"
@@ -1137,6 +2403,7 @@ class FileProcessor:
                                         'existing_height': main_pole_heights['existing'], # Use height from main pole
                                         'proposed_height': main_pole_heights['proposed'], # Use height from main pole
                                         'raw_height': measured_height_val, # Keep raw height from ref span for sorting if needed
+                                        'company': trace_info.get('company', '').strip(),
                                     })
                                     self.logger.log_item_processed(f"RefSpan-{category_pf}", f"{description} at {main_pole_heights['existing']}") # Log with main pole height
                         
@@ -1322,96 +2589,29 @@ class FileProcessor:
             attacher_data: List of attacher data
             cps_only: If True, only include CPS Energy movements
         """
-        summaries = []
-        
-        # First handle movements of existing attachments
-        for attacher in attacher_data:
-            name = attacher['name']
-            existing = attacher['existing_height']
-            proposed = attacher['proposed_height']
-            is_proposed = attacher.get('is_proposed', False)
-            is_guy = '(Guy)' in name or '(Down Guy)' in name
-            
-            # Skip if cps_only is True and this is not a CPS attachment
-            if cps_only and not name.lower().startswith("cps energy"):
-                continue
-            
-            # Handle proposed new attachments (including guys)
-            if is_proposed:
-                if is_guy:
-                    summaries.append(f"Add {name} at {existing}")
-                else:
-                    summaries.append(f"Install proposed {name} at {existing}")
-                continue
-                
-            # Handle movements of existing attachments
-            if proposed and existing:
-                try:
-                    existing_parts = existing.replace('"', '').split("'")
-                    proposed_parts = proposed.replace('"', '').split("'")
-                    
-                    existing_inches = int(existing_parts[0]) * 12 + int(existing_parts[1])
-                    proposed_inches = int(proposed_parts[0]) * 12 + int(proposed_parts[1])
-                    
-                    # Calculate movement
-                    movement = proposed_inches - existing_inches
-                    
-                    if movement != 0:
-                        # Determine if raising or lowering
-                        action = "Raise" if movement > 0 else "Lower"
-                        # Get absolute movement in inches
-                        inches_moved = abs(movement)
-                        
-                        summary = f"{action} {name} {inches_moved}\" from {existing} to {proposed}"
-                        summaries.append(summary)
-                except (ValueError, IndexError):
-                    continue
-        
-        return "\n".join(summaries) if summaries else ""
-    
+        summary = summarize_movements(attacher_data)
+        return summary.cps if cps_only else summary.all
+
     def get_all_movements_summary(self, main_attachers, reference_spans, backspan_data):
         """Generate comprehensive movement summary including all attachers"""
-        all_attachers = []
-        
-        # Add main attachers
-        all_attachers.extend(main_attachers)
-        print(f"DEBUG: Added {len(main_attachers)} main attachers to movement summary")
-        
-        # Add reference span attachers
-        ref_count = 0
-        for ref_span in reference_spans:
-            ref_attachers = ref_span.get('data', [])
-            all_attachers.extend(ref_attachers)
-            ref_count += len(ref_attachers)
-        print(f"DEBUG: Added {ref_count} reference span attachers to movement summary")
-        
-        # Add backspan attachers
-        all_attachers.extend(backspan_data)
-        print(f"DEBUG: Added {len(backspan_data)} backspan attachers to movement summary")
-        
-        summary = self.get_movement_summary(all_attachers, cps_only=False)
-        print(f"DEBUG: Generated movement summary with {len(summary.split(chr(10)) if summary else [])} movement lines")
-        
-        return summary
-    
+        return summarize_movements(node_attachers(main_attachers, reference_spans, backspan_data)).all
+
     def get_cps_movements_only(self, main_attachers, reference_spans, backspan_data):
         """Generate movement summary for CPS Energy attachments only (for Remedy Description)"""
-        all_attachers = []
-        
-        # Add main attachers
-        all_attachers.extend(main_attachers)
-        
-        # Add reference span attachers
-        for ref_span in reference_spans:
-            all_attachers.extend(ref_span.get('data', []))
-        
-        # Add backspan attachers
-        all_attachers.extend(backspan_data)
-        
-        summary = self.get_movement_summary(all_attachers, cps_only=True)
-        print(f"DEBUG: Generated CPS-only movement summary with {len(summary.split(chr(10)) if summary else [])} movement lines")
-        
-        return summary
+        return summarize_movements(node_attachers(main_attachers, reference_spans, backspan_data)).cps
+
+    def get_node_movements(self, job_data, node_id, attacher_data):
+        """MovementSummary for a node's attachers (get_attachers_for_node output), built once per job"""
+        movements = self.get_movement_summaries(job_data)
+        hit = node_id in movements
+        self.record_cache('movement_summary', hit)
+        if not hit:
+            movements[node_id] = summarize_movements(node_attachers(
+                attacher_data['main_attachers'],
+                attacher_data['reference_spans'],
+                attacher_data['backspan']['data']
+            ))
+        return movements[node_id]
 
     def _is_number(self, value):
         try:
@@ -1426,103 +2626,19 @@ class FileProcessor:
         1. Find the section with the lowest measured height
         2. Use that section to check for mr_move or effective_moves
         3. If there are moves (nonzero), calculate and return the proposed height
-        4. If no moves, return empty string"""
-        # Get the connection data
-        connection_data = job_data.get("connections", {}).get(connection_id, {})
-        if not connection_data:
+        4. If no moves, return empty string
+        The per-attacher numbers come from the connection's span profile."""
+        profile = self.get_span_profile(job_data, connection_id)
+        if profile is None:
             return ""
-            
-        # Get sections from the connection
-        sections = connection_data.get("sections", {})
-        if not sections:
+        attacher = profile['attachers'].get(attacher_name.strip())
+        if attacher is None:
             return ""
-            
-        # Get trace_data
-        trace_data = job_data.get("traces", {}).get("trace_data", {})
-        
-        # Store the lowest height section for this attacher
-        lowest_height = float('inf')
-        lowest_section = None
-        
-        # First pass: find the section with the lowest measured height for this attacher
-        for section_id, section_data in sections.items():
-            photos = section_data.get("photos", {})
-            main_photo_id = next((pid for pid, pdata in photos.items() if pdata.get("association") == "main"), None)
-            if not main_photo_id:
-                continue
-                
-            # Get photofirst_data
-            photo_data = job_data.get("photos", {}).get(main_photo_id, {})
-            photofirst_data = photo_data.get("photofirst_data", {})
-            
-            # Process wire data
-            for wire in photofirst_data.get("wire", {}).values():
-                trace_id = wire.get("_trace")
-                if not trace_id or trace_id not in trace_data:
-                    continue
-                    
-                trace_info = trace_data[trace_id]
-                company = trace_info.get("company", "").strip()
-                cable_type = trace_info.get("cable_type", "").strip()
-                
-                # Skip if cable_type is "Primary"
-                if cable_type.lower() == "primary":
-                    continue
-                
-                # Construct the attacher name the same way as in the main list
-                current_attacher = f"{company} {cable_type}"
-                
-                if current_attacher.strip() == attacher_name.strip():
-                    measured_height = wire.get("_measured_height")
-                    if measured_height is not None:
-                        try:
-                            measured_height = float(measured_height)
-                            if measured_height < lowest_height:
-                                lowest_height = measured_height
-                                lowest_section = (section_data, wire, trace_info)
-                        except (ValueError, TypeError):
-                            continue
-        
-        # If we found a section with this attacher
-        if lowest_section:
-            section_data, wire, trace_info = lowest_section
-            
-            # Check if this is a proposed wire
-            is_proposed = trace_info.get("proposed", False)
-            if is_proposed:
-                return self.format_height_feet_inches(lowest_height)
-            
-            # Check for moves
-            mr_move = wire.get("mr_move", 0)
-            effective_moves = wire.get("_effective_moves", {})
-            
-            # Only consider nonzero moves
-            has_mr_move = False
-            try:
-                has_mr_move = abs(float(mr_move)) > 0.01
-            except (ValueError, TypeError):
-                has_mr_move = False
-            has_effective_move = any(abs(float(mv)) > 0.01 for mv in effective_moves.values() if self._is_number(mv))
-            
-            if not has_mr_move and not has_effective_move:
-                return ""
-            
-            # Calculate total move
-            total_move = float(mr_move) if has_mr_move else 0.0
-            if has_effective_move:
-                for move in effective_moves.values():
-                    try:
-                        move_value = float(move)
-                        # Only add if nonzero - using full effective_moves value for consistency with pole attachments
-                        if abs(move_value) > 0.01:
-                            total_move += move_value
-                    except (ValueError, TypeError):
-                        continue
-            # Calculate proposed height
-            proposed_height = lowest_height + total_move
-            return self.format_height_feet_inches(proposed_height)
-        
-        return ""  # Return empty string if no section found or if there was an error
+        if attacher['proposed']:
+            return self.format_height_feet_inches(attacher['lowest_height'])
+        if not attacher['has_move']:
+            return ""
+        return self.format_height_feet_inches(attacher['lowest_height'] + attacher['total_move'])
 
     def process_data(self, job_data, geojson_data):
         """Process job data to extract connections, nodes, and create structured DataFrame"""
@@ -1531,9 +2647,18 @@ class FileProcessor:
         data = []
         operation_number = 1
         
+        # Index the GIS layer once so each pole below is a hash lookup, not a scan
+        gis_index = None
+        self.gis_coordinates = {}
+        if geojson_data:
+            gis_index = GisPoleIndex.from_geojson(geojson_data)
+            self.count('gis_features', len(gis_index))
+        spatial_index = self.get_spatial_index(job_data)
+
         # Create a mapping of node IDs to their properties
         node_properties = {}
         for node_id, node_data in job_data.get("nodes", {}).items():
+            self.check_cancelled()
             attributes = node_data.get("attributes", {})
             
             # Get DLOC_number - it's stored under attributes.DLOC_number with a dynamic key
@@ -1556,22 +2681,9 @@ class FileProcessor:
                 if pole_tag != 'N/A' and not pole_tag.upper().startswith('NT') and 'PL' not in pole_tag.upper():
                     pole_tag = f"PL{pole_tag}"
             
-            # Get SCID and store both string and numeric versions
-            scid_data = attributes.get('scid', {})
-            # First try auto_button, then -Imported, then any other key
-            scid_value = None
-            for key in ['auto_button', '-Imported']:
-                if key in scid_data:
-                    scid_value = scid_data[key]
-                    break
-            if scid_value is None and scid_data:
-                # If no specific key found but scid_data is not empty, get the first value
-                scid_value = next(iter(scid_data.values()), 'N/A')
-            
-            # Convert to string and handle empty values
-            scid_value = str(scid_value) if scid_value is not None else 'N/A'
-            if not scid_value.strip():
-                scid_value = 'N/A'
+            # SCID: auto_button, then -Imported, then any other key; 'N/A' if none
+            node_attributes = self.get_node_attributes(job_data, node_id)
+            scid_value = node_attributes.scid
                 
             # Get node type - first try -Imported, then any other key
             node_type_data = attributes.get('node_type', {})
@@ -1586,6 +2698,7 @@ class FileProcessor:
                 
             node_properties[node_id] = {
                 'scid': scid_value,  # Store as string for comparison
+                'scid_key': node_attributes.scid_key,  # Parsed once, for ordering from/to poles
                 'scid_display': scid_value,  # Keep original string for display
                 'DLOC_number': dloc_number,
                 'pole_tag': pole_tag,
@@ -1595,12 +2708,24 @@ class FileProcessor:
                 'riser': attributes.get('riser', {}).get('button_added', "No"),
                 'final_passing_capacity_%': '',  # Changed from N/A to empty string
                 'construction_grade': attributes.get('construction_grade', ''),
-                'work_type': self.get_work_type(job_data, node_id),
-                'responsible_party': self.get_responsible_party(job_data, node_id),
-                'node_type': node_type_value  # Store the node type value
+                'work_type': node_attributes.work_type,
+                'responsible_party': node_attributes.responsible_party,
+                'node_type': node_type_value,  # Store the node type value
+                'gis_missing': ''  # YES/NO once a GIS layer has been joined
             }
+
+            if gis_index is not None and node_type_value == 'pole':
+                lat, lon = node_data.get("latitude"), node_data.get("longitude")
+                gis_pole = gis_index.match(scid_value, dloc_number, lat, lon)
+                node_properties[node_id]['gis_missing'] = "NO" if gis_pole else "YES"
+                self.count('gis_matched' if gis_pole else 'gis_missing')
+                if gis_pole and None in (lat, lon):
+                    # GIS position stands in for the missing survey position
+                    self.gis_coordinates[node_id] = (gis_pole[0], gis_pole[1])
+                    spatial_index.add(('node', node_id), gis_pole[0], gis_pole[1])
         
         print(f"DEBUG: Processed {len(node_properties)} nodes")
+        self.count('poles', len(node_properties))
         
         # First pass: collect all underground connections for each pole
         pole_underground_connections = {}
@@ -1617,6 +2742,7 @@ class FileProcessor:
         # Process connections and store in a list for sorting
         connection_data_list = []
         for connection_id, connection_data in job_data.get("connections", {}).items():
+            self.check_cancelled()
             # Check if this is an aerial cable or underground cable with a pole
             connection_type = connection_data.get("attributes", {}).get("connection_type", {}).get("button_added", "")
             is_aerial = connection_type == "aerial cable"
@@ -1674,9 +2800,12 @@ class FileProcessor:
                 to_node_id = pedestal_node_id
             else:
                 # For aerial cables, determine from/to based on SCID
-                scid_1 = node_properties.get(node_id_1, {}).get('scid', 'N/A')
-                scid_2 = node_properties.get(node_id_2, {}).get('scid', 'N/A')
-                if self.compare_scids(scid_1, scid_2) <= 0:
+                scid_key_1 = node_properties.get(node_id_1, {}).get('scid_key', NA_SCID_KEY)
+                scid_key_2 = node_properties.get(node_id_2, {}).get('scid_key', NA_SCID_KEY)
+                # Same outcome as compare_scids(scid_1, scid_2) <= 0 unless exactly one base is
+                # non-numeric ("9" vs "10A": numeric first here, text order there); equal SCIDs
+                # keep node_id_2 first
+                if scid_key_1 < scid_key_2:
                     from_node_id = node_id_1
                     to_node_id = node_id_2
                 else:
@@ -1708,36 +2837,38 @@ class FileProcessor:
             # For underground connections, get the company and bearing for the remedy description
             remedy_description = ""
             if is_underground:
-                # Get the company from the connection's trace data
+                # Get the company from the connection's trace data, falling back to
+                # the traces with items on the connection's section photos
                 trace_data = job_data.get("traces", {}).get("trace_data", {})
-                for trace_id, trace_info in trace_data.items():
-                    if trace_info.get("connection_id") == connection_id:
-                        company = trace_info.get("company", "").strip()
-                        if company:
-                            # Calculate bearing from coordinates
-                            from_node = job_data.get("nodes", {}).get(from_node_id, {})
-                            from_photos = from_node.get("photos", {})
-                            if from_photos:
-                                main_photo_id = next((pid for pid, pdata in from_photos.items() if pdata.get("association") == "main"), None)
-                                if main_photo_id:
-                                    photo_data = job_data.get("photos", {}).get(main_photo_id, {})
-                                    if photo_data and "latitude" in photo_data and "longitude" in photo_data:
-                                        from_lat = photo_data["latitude"]
-                                        from_lon = photo_data["longitude"]
-                                        # Get the other node's coordinates
-                                        to_node = job_data.get("nodes", {}).get(to_node_id, {})
-                                        to_photos = to_node.get("photos", {})
-                                        if to_photos:
-                                            main_photo_id = next((pid for pid, pdata in to_photos.items() if pdata.get("association") == "main"), None)
-                                            if main_photo_id:
-                                                photo_data = job_data.get("photos", {}).get(main_photo_id, {})
-                                                if photo_data and "latitude" in photo_data and "longitude" in photo_data:
-                                                    to_lat = photo_data["latitude"]
-                                                    to_lon = photo_data["longitude"]
-                                                    # Calculate bearing
-                                                    degrees, cardinal = self.calculate_bearing(from_lat, from_lon, to_lat, to_lon)
-                                                    remedy_description = f"Proposed {company} to transition to UG connection to the {cardinal} ({int(degrees)}°)"
-                                                    break
+                connection_traces = self.get_connection_traces(job_data)
+                for trace_id in connection_traces.traces_for(connection_id) or connection_traces.traces_on(connection_id):
+                    trace_info = trace_data.get(trace_id) or {}
+                    company = trace_info.get("company", "").strip()
+                    if company:
+                        # Calculate bearing from coordinates
+                        from_node = job_data.get("nodes", {}).get(from_node_id, {})
+                        from_photos = from_node.get("photos", {})
+                        if from_photos:
+                            main_photo_id = next((pid for pid, pdata in from_photos.items() if pdata.get("association") == "main"), None)
+                            if main_photo_id:
+                                photo_data = job_data.get("photos", {}).get(main_photo_id, {})
+                                if photo_data and "latitude" in photo_data and "longitude" in photo_data:
+                                    from_lat = photo_data["latitude"]
+                                    from_lon = photo_data["longitude"]
+                                    # Get the other node's coordinates
+                                    to_node = job_data.get("nodes", {}).get(to_node_id, {})
+                                    to_photos = to_node.get("photos", {})
+                                    if to_photos:
+                                        main_photo_id = next((pid for pid, pdata in to_photos.items() if pdata.get("association") == "main"), None)
+                                        if main_photo_id:
+                                            photo_data = job_data.get("photos", {}).get(main_photo_id, {})
+                                            if photo_data and "latitude" in photo_data and "longitude" in photo_data:
+                                                to_lat = photo_data["latitude"]
+                                                to_lon = photo_data["longitude"]
+                                                # Calculate bearing
+                                                degrees, cardinal = self.calculate_bearing(from_lat, from_lon, to_lat, to_lon)
+                                                remedy_description = f"Proposed {company} to transition to UG connection to the {cardinal} ({int(degrees)}°)"
+                                                break
 
             row = {
                 "Connection ID": connection_id,
@@ -1747,9 +2878,9 @@ class FileProcessor:
                 "Pole #": pole_number,
                 "SCID": from_pole_props.get('scid_display', 'N/A'),
                 "SCID_sort": from_pole_props.get('scid', 'N/A'),
-                "Pole Structure": self.get_pole_structure(job_data, from_node_id),
+                "Pole Structure": self.get_node_attributes(job_data, from_node_id).pole_structure,
                 "Proposed Riser": "YES (1)" if is_underground else ("YES ({})".format(pole_underground_connections[from_node_id]) if from_node_id in pole_underground_connections else "No"),
-                "Proposed Guy": self.get_proposed_guy_value(job_data, from_node_id),
+                "Proposed Guy": self.get_node_attributes(job_data, from_node_id).proposed_guy,
                 "PLA (%) with proposed attachment": final_capacity,
                 "Construction Grade of Analysis": "C",
                 "Height Lowest Com": "NA" if is_underground else "",
@@ -1758,9 +2889,11 @@ class FileProcessor:
                 "Remedy Description": remedy_description if is_underground else "",
                 "Responsible Party": from_pole_props.get('responsible_party', 'N/A'),
                 "Existing CPSE Red Tag on Pole": "YES" if has_red_tag else "NO",
-                "Pole Data Missing in GIS": "",
+                "Pole Data Missing in GIS": from_pole_props.get('gis_missing', ''),
                 "CPSE Application Comments": "",
                 "Movement Summary": "",  # Will be populated in create_output_excel
+                "Span Length / Nearby Structure": self.get_span_length_summary(
+                    job_data, from_node_id, to_node_id, node_properties),
                 "node_id_1": from_node_id,
                 "node_id_2": to_node_id,
                 "From Pole Properties": from_pole_props,
@@ -1770,10 +2903,11 @@ class FileProcessor:
             operation_number += 1
         
         print(f"DEBUG: Processed {len(connection_data_list)} connections")
+        self.count('connections', len(connection_data_list))
         
-        # Sort the connection data by from pole's SCID
+        # Sort the connection data by from pole's SCID (N/A last, then SCID text, then to pole's SCID)
         connection_data_list.sort(key=lambda x: (
-            self.compare_scids(x['From Pole Properties'].get('scid', 'N/A'), 'N/A'),
+            x['From Pole Properties'].get('scid_key', NA_SCID_KEY).na,
             x['From Pole Properties'].get('scid', 'N/A'),
             x['To Pole Properties'].get('scid', 'N/A')
         ))
@@ -1793,422 +2927,431 @@ class FileProcessor:
         
         return df
 
-    def create_output_excel(self, path, df, job_data):
-        """Create a simplified Excel output with flat single sheet structure"""
-        
-        # Define columns for the flat single sheet
-        # Connection ID, SCID, and Bearing are excluded from Excel output but kept in DataFrame for processing
-        desired_columns = [
-            "Operation Number", "Attachment Action", "Pole Owner", 
-            "Pole #", "Pole Structure", "Proposed Riser", "Proposed Guy", 
-            "PLA (%) with proposed attachment", "Construction Grade of Analysis",
-            "Height Lowest Com", "Height Lowest CPS Electrical", 
-            "Data Category", "Attacher Description",
-            "Attachment Height - Existing", "Attachment Height - Proposed",
-            "Mid-Span (same span as existing)",
-            "One Touch Transfer", "Remedy Description", "Responsible Party",
-            "Existing CPSE Red Tag on Pole", "Pole Data Missing in GIS", 
-            "CPSE Application Comments", "Movement Summary", "From Pole", "To Pole"
-        ]
-        
-        df_final_rows = [] 
-        writer = None 
+    def iter_make_ready_blocks(self, df, job_data):
+        """Yield the MakeReadyData rows one connection at a time, in Operation Number order.
 
-        try:
-            writer = pd.ExcelWriter(path, engine='xlsxwriter')
-            workbook = writer.book
+        Each block is a list of row dicts keyed by MAKE_READY_COLUMNS (rows also
+        carry Connection ID, SCID and Bearing). The Excel-only From Pole / To Pole
+        layout rows are not included (see pole_pair_rows). An empty df yields one
+        sample block.
+        """
+        if df.empty:
+            print("DataFrame is empty, processing job_data directly to create sample structure.")
+            sample_row = {
+                "Connection ID": "SAMPLE_CONN_001",
+                "Operation Number": 1,
+                "Attachment Action": "I",
+                "Pole Owner": "CPS",
+                "Pole #": "PL12345",
+                "SCID": "12345",
+                "Pole Structure": "35-5",
+                "Proposed Riser": "No",
+                "Proposed Guy": "No",
+                "PLA (%) with proposed attachment": "",
+                "Construction Grade of Analysis": "C",
+                "Height Lowest Com": "",
+                "Height Lowest CPS Electrical": "",
+                "Data Category": "Sample_Data",
+                "Bearing": "",
+                "Attacher Description": "Sample - No actual data processed",
+                "Attachment Height - Existing": "",
+                "Attachment Height - Proposed": "",
+                "Mid-Span (same span as existing)": "",
+                "One Touch Transfer": "",
+                "Remedy Description": "",
+                "Responsible Party": "",
+                "Existing CPSE Red Tag on Pole": "NO",
+                "Pole Data Missing in GIS": "",
+                "CPSE Application Comments": "",
+                "Movement Summary": "",
+                "From Pole": "PL12345",
+                "To Pole": "PL12346",
+                "Span Length / Nearby Structure": ""
+            }
+            yield [sample_row]
+            return
+
+        print("Processing DataFrame with actual data...")
+        
+        # Process each connection in order
+        for _, record in df.iterrows():
+            self.check_cancelled()
+            block = []
+            connection_id = record.get('Connection ID', '')
+            node_id_1 = record.get('node_id_1', '')
             
-            if df.empty:
-                print("DataFrame is empty, processing job_data directly to create sample structure.")
-                sample_row = {
-                    "Connection ID": "SAMPLE_CONN_001",
-                    "Operation Number": 1,
-                    "Attachment Action": "I",
-                    "Pole Owner": "CPS",
-                    "Pole #": "PL12345",
-                    "SCID": "12345",
-                    "Pole Structure": "35-5",
-                    "Proposed Riser": "No",
-                    "Proposed Guy": "No",
-                    "PLA (%) with proposed attachment": "",
-                    "Construction Grade of Analysis": "C",
-                    "Height Lowest Com": "",
-                    "Height Lowest CPS Electrical": "",
-                    "Data Category": "Sample_Data",
-                    "Bearing": "",
-                    "Attacher Description": "Sample - No actual data processed",
-                    "Attachment Height - Existing": "",
-                    "Attachment Height - Proposed": "",
-                    "Mid-Span (same span as existing)": "",
-                    "One Touch Transfer": "",
-                    "Remedy Description": "",
-                    "Responsible Party": "",
-                    "Existing CPSE Red Tag on Pole": "NO",
-                    "Pole Data Missing in GIS": "",
-                    "CPSE Application Comments": "",
-                    "Movement Summary": "",
-                    "From Pole": "PL12345",
-                    "To Pole": "PL12346"
-                }
-                df_final_rows.append(sample_row)
+            # Check if this is an underground connection
+            connection_data = job_data.get("connections", {}).get(connection_id, {})
+            is_underground = connection_data.get("attributes", {}).get("connection_type", {}).get("button_added") == "underground cable"
+            
+            # Get attacher data using enhanced methods
+            attacher_data = self.get_attachers_for_node(job_data, node_id_1)
+            
+            # Get lowest heights for this connection (only for aerial)
+            lowest_com = ""
+            lowest_cps = ""
+            if not is_underground:
+                lowest_com, lowest_cps = self.get_lowest_heights_for_connection(job_data, connection_id)
             else:
-                print("Processing DataFrame with actual data...")
-                
-                # Process each connection in order
-                for _, record in df.iterrows():
-                    connection_id = record.get('Connection ID', '')
-                    node_id_1 = record.get('node_id_1', '')
-                    
-                    # Check if this is an underground connection
-                    connection_data = job_data.get("connections", {}).get(connection_id, {})
-                    is_underground = connection_data.get("attributes", {}).get("connection_type", {}).get("button_added") == "underground cable"
-                    
-                    # Get attacher data using enhanced methods
-                    attacher_data = self.get_attachers_for_node(job_data, node_id_1)
-                    
-                    # Get lowest heights for this connection (only for aerial)
-                    lowest_com = ""
-                    lowest_cps = ""
-                    if not is_underground:
-                        lowest_com, lowest_cps = self.get_lowest_heights_for_connection(job_data, connection_id)
-                    else:
-                        lowest_com = "NA"
-                        lowest_cps = "NA"
-                    
-                    # Get From Pole/To Pole values
-                    from_pole_props = record.get("From Pole Properties", {})
-                    to_pole_props = record.get("To Pole Properties", {})
-                    
-                    # Get From Pole value (DLOC_number or SCID)
-                    from_pole_value = from_pole_props.get('DLOC_number')
-                    if not from_pole_value or from_pole_value == 'N/A':
-                        from_pole_value = from_pole_props.get('pole_tag', 'N/A')
-                    if from_pole_value == 'N/A':
-                        from_pole_value = from_pole_props.get('scid', 'N/A')
-                    
-                    # Get To Pole value (DLOC_number or SCID)
-                    to_pole_value = to_pole_props.get('DLOC_number')
-                    if not to_pole_value or to_pole_value == 'N/A':
-                        to_pole_value = to_pole_props.get('pole_tag', 'N/A')
-                    if to_pole_value == 'N/A':
-                        to_pole_value = to_pole_props.get('scid', 'N/A')
-                    
-                    # For underground connections, set To Pole value to "UG"
-                    if is_underground:
-                        to_pole_value = "UG"
-                    else:
-                        # Add PL prefix if needed for To Pole value
-                        if to_pole_value != 'N/A' and not to_pole_value.upper().startswith('NT') and 'PL' not in to_pole_value.upper():
-                            to_pole_value = f"PL{to_pole_value}"
-                    
-                    # Generate movement summaries for this connection using enhanced methods
-                    all_movements = self.get_all_movements_summary(
-                        attacher_data['main_attachers'], 
-                        attacher_data['reference_spans'], 
-                        attacher_data['backspan']['data']
-                    )
-                    cps_movements = self.get_cps_movements_only(
-                        attacher_data['main_attachers'], 
-                        attacher_data['reference_spans'], 
-                        attacher_data['backspan']['data']
-                    )
-                    
-                    # Base pole data for all rows related to this connection
-                    base_row_data = {
-                        "Connection ID": connection_id,
-                        "Operation Number": record.get("Operation Number", ""),
-                        "Attachment Action": record.get("Attachment Action", "I"),
-                        "Pole Owner": record.get("Pole Owner", "CPS"),
-                        "Pole #": record.get("Pole #", ""),
-                        "SCID": record.get("SCID", ""),
-                        "Pole Structure": record.get("Pole Structure", ""),
-                        "Proposed Riser": "YES (1)" if is_underground else record.get("Proposed Riser", "No"),
-                        "Proposed Guy": record.get("Proposed Guy", "No"),
-                        "PLA (%) with proposed attachment": record.get("PLA (%) with proposed attachment", ""),
-                        "Construction Grade of Analysis": record.get("Construction Grade of Analysis", "C"),
-                        "Height Lowest Com": lowest_com,
-                        "Height Lowest CPS Electrical": lowest_cps,
-                        "One Touch Transfer": record.get("One Touch Transfer", ""),
-                        "Remedy Description": cps_movements if cps_movements else record.get("Remedy Description", ""),
-                        "Responsible Party": record.get("Responsible Party", ""),
-                        "Existing CPSE Red Tag on Pole": record.get("Existing CPSE Red Tag on Pole", "NO"),
-                        "Pole Data Missing in GIS": record.get("Pole Data Missing in GIS", ""),
-                        "CPSE Application Comments": record.get("CPSE Application Comments", ""),
-                        "Movement Summary": all_movements if all_movements else record.get("Movement Summary", ""),
-                        "From Pole": from_pole_value,
-                        "To Pole": to_pole_value,
-                    }
-                    
-                    # Main Attachers
-                    for i, attacher in enumerate(attacher_data['main_attachers']):
-                        row = base_row_data.copy()
-                        row["Data Category"] = "Main_Attacher"
-                        row["Bearing"] = ""
-                        row["Attacher Description"] = attacher.get('name', '')
-                        row["Attachment Height - Existing"] = attacher.get('existing_height', '')
-                        row["Attachment Height - Proposed"] = attacher.get('proposed_height', '')
-                        
-                        # New logic for "Mid-Span (same span as existing)" based on feedback
-                        midspan_val_to_set = ""
-                        # If the pole attachment has a proposed height (meaning it's new or moved)
-                        if attacher.get('proposed_height'): 
-                            midspan_val_to_set = self.get_midspan_proposed_heights(job_data, connection_id, attacher.get('name', ''))
-                        row["Mid-Span (same span as existing)"] = midspan_val_to_set
-                        
-                        # For the flat sheet structure, only put Movement Summary and Remedy Description in the first main attacher row
-                        if i > 0:
-                            row["Movement Summary"] = ""
-                            row["Remedy Description"] = ""
-                        
-                        df_final_rows.append(row)
-                    
-                    # Reference Spans
-                    for ref_span in attacher_data['reference_spans']:
-                        # Reference span header row
-                        ref_header_row = base_row_data.copy()
-                        ref_header_row["Data Category"] = "Ref_Span_Header"
-                        ref_header_row["Bearing"] = ref_span.get('bearing', '') # Keep bearing for potential other uses
-                        ref_header_row["Attacher Description"] = ref_span.get('header_text', f"REF ({ref_span.get('bearing', '')})") # Use new header_text
-                        ref_header_row["Attachment Height - Existing"] = ""
-                        ref_header_row["Attachment Height - Proposed"] = ""
-                        ref_header_row["Mid-Span (same span as existing)"] = ""
-                        ref_header_row["Movement Summary"] = ""  # Don't repeat in reference spans
-                        ref_header_row["Remedy Description"] = ""
-                        df_final_rows.append(ref_header_row)
-                        
-                        # Reference span attacher rows
-                        for attacher in ref_span.get('data', []):
-                            row = base_row_data.copy()
-                            row["Data Category"] = "Ref_Span_Attacher"
-                            row["Bearing"] = ref_span.get('bearing', '')
-                            row["Attacher Description"] = attacher.get('name', '')
-                            row["Attachment Height - Existing"] = attacher.get('existing_height', '')
-                            row["Attachment Height - Proposed"] = attacher.get('proposed_height', '')
-                            row["Mid-Span (same span as existing)"] = ""  # Not applicable for ref spans
-                            row["Movement Summary"] = ""  # Don't repeat in reference spans
-                            row["Remedy Description"] = ""
-                            df_final_rows.append(row)
-                    
-                    # Backspan
-                    backspan_info = attacher_data['backspan']
-                    if backspan_info['data']:
-                        # Backspan header row
-                        back_header_row = base_row_data.copy()
-                        back_header_row["Data Category"] = "Backspan_Header"
-                        back_header_row["Bearing"] = backspan_info.get('bearing', '')
-                        back_header_row["Attacher Description"] = f"Backspan ({backspan_info.get('bearing', '')})"
-                        back_header_row["Attachment Height - Existing"] = ""
-                        back_header_row["Attachment Height - Proposed"] = ""
-                        back_header_row["Mid-Span (same span as existing)"] = ""
-                        back_header_row["Movement Summary"] = ""  # Don't repeat in backspans
-                        back_header_row["Remedy Description"] = ""
-                        df_final_rows.append(back_header_row)
-                        
-                        # Backspan attacher rows
-                        for attacher in backspan_info['data']:
-                            row = base_row_data.copy()
-                            row["Data Category"] = "Backspan_Attacher"
-                            row["Bearing"] = backspan_info.get('bearing', '')
-                            row["Attacher Description"] = attacher.get('name', '')
-                            row["Attachment Height - Existing"] = attacher.get('existing_height', '')
-                            row["Attachment Height - Proposed"] = attacher.get('proposed_height', '')
-                            row["Mid-Span (same span as existing)"] = ""  # Not applicable for backspans
-                            row["Movement Summary"] = ""  # Don't repeat in backspans
-                            row["Remedy Description"] = ""
-                            df_final_rows.append(row)
-                    
-                    # If no attachers/refs/backspans, ensure at least one pole-only row is written
-                    if not attacher_data['main_attachers'] and not attacher_data['reference_spans'] and not (attacher_data['backspan'] and attacher_data['backspan']['data']):
-                        row = base_row_data.copy()
-                        row["Data Category"] = "Pole_Only"
-                        row["Bearing"] = ""
-                        row["Attacher Description"] = "No attachers found"
-                        row["Attachment Height - Existing"] = ""
-                        row["Attachment Height - Proposed"] = ""
-                        row["Mid-Span (same span as existing)"] = ""
-                        # Keep Movement Summary and Remedy Description for pole-only rows
-                        df_final_rows.append(row)
-                    
-                    # First row: Add headers "From Pole" and "To Pole"
-                    header_row = {col: "" for col in desired_columns}
-                    header_row["Height Lowest Com"] = "From Pole"  # Column J
-                    header_row["Height Lowest CPS Electrical"] = "To Pole"  # Column K
-                    df_final_rows.append(header_row)
-                    
-                    # Second row: Add the actual pole values
-                    values_row = {col: "" for col in desired_columns}
-                    # Get the "From Pole" value (current pole number)
-                    from_pole_value = base_row_data.get("Pole #", "")
-                    # Get the "To Pole" value (destination pole)
-                    to_pole_value = base_row_data.get("To Pole", "")
-                    # Add the values to the second row
-                    values_row["Height Lowest Com"] = from_pole_value  # Value for From Pole in Column J
-                    values_row["Height Lowest CPS Electrical"] = to_pole_value  # Value for To Pole in Column K
-                    df_final_rows.append(values_row)
+                lowest_com = "NA"
+                lowest_cps = "NA"
             
-            # Create final DataFrame and write to Excel
-            final_df = pd.DataFrame(df_final_rows, columns=desired_columns)
-            # Write data starting at the configured row (Excel is 1-based, pandas is 0-based)
-            final_df.to_excel(writer, sheet_name='MakeReadyData', index=False, startrow=EXCEL_DATA_START_ROW-1)
+            # Get From Pole/To Pole values
+            from_pole_props = record.get("From Pole Properties", {})
+            to_pole_props = record.get("To Pole Properties", {})
             
-            # Get the worksheet after writing the data
-            worksheet = writer.sheets['MakeReadyData']
+            # Get From Pole value (DLOC_number or SCID)
+            from_pole_value = from_pole_props.get('DLOC_number')
+            if not from_pole_value or from_pole_value == 'N/A':
+                from_pole_value = from_pole_props.get('pole_tag', 'N/A')
+            if from_pole_value == 'N/A':
+                from_pole_value = from_pole_props.get('scid', 'N/A')
             
-            # Format for the merged header cells
-            header_format = workbook.add_format({
-                'bold': True,
-                'align': 'center',
-                'valign': 'vcenter',
-                'border': 1
-            })
+            # Get To Pole value (DLOC_number or SCID)
+            to_pole_value = to_pole_props.get('DLOC_number')
+            if not to_pole_value or to_pole_value == 'N/A':
+                to_pole_value = to_pole_props.get('pole_tag', 'N/A')
+            if to_pole_value == 'N/A':
+                to_pole_value = to_pole_props.get('scid', 'N/A')
             
-            # Format for merged data cells
-            data_format = workbook.add_format({
-                'align': 'center',
-                'valign': 'vcenter',
-                'border': 1
-            })
+            # For underground connections, set To Pole value to "UG"
+            if is_underground:
+                to_pole_value = "UG"
+            else:
+                # Add PL prefix if needed for To Pole value
+                if to_pole_value != 'N/A' and not to_pole_value.upper().startswith('NT') and 'PL' not in to_pole_value.upper():
+                    to_pole_value = f"PL{to_pole_value}"
             
-            # Merge each column header vertically from rows 1-3
-            for idx, col_name in enumerate(desired_columns):
-                # Convert index to Excel column letter (A, B, C, etc.)
-                col_letter = chr(65 + idx) if idx < 26 else chr(64 + idx // 26) + chr(65 + idx % 26)
-                
-                # Merge cells for this column from row 1 to 3
-                worksheet.merge_range(f'{col_letter}1:{col_letter}3', col_name, header_format)
+            # Movement summaries for the from-pole: all attachers and CPS only, one pass per node
+            movements = self.get_node_movements(job_data, node_id_1, attacher_data)
+            all_movements = movements.all
+            cps_movements = movements.cps
             
-            # Now merge cells for columns A-I for each unique pole
-            # Group rows by pole (identified by Operation Number)
-            operation_groups = {}
-            excel_row = EXCEL_DATA_START_ROW  # Starting row in Excel (1-based)
+            # Base pole data for all rows related to this connection
+            base_row_data = {
+                "Connection ID": connection_id,
+                "Operation Number": record.get("Operation Number", ""),
+                "Attachment Action": record.get("Attachment Action", "I"),
+                "Pole Owner": record.get("Pole Owner", "CPS"),
+                "Pole #": record.get("Pole #", ""),
+                "SCID": record.get("SCID", ""),
+                "Pole Structure": record.get("Pole Structure", ""),
+                "Proposed Riser": "YES (1)" if is_underground else record.get("Proposed Riser", "No"),
+                "Proposed Guy": record.get("Proposed Guy", "No"),
+                "PLA (%) with proposed attachment": record.get("PLA (%) with proposed attachment", ""),
+                "Construction Grade of Analysis": record.get("Construction Grade of Analysis", "C"),
+                "Height Lowest Com": lowest_com,
+                "Height Lowest CPS Electrical": lowest_cps,
+                "One Touch Transfer": record.get("One Touch Transfer", ""),
+                "Remedy Description": cps_movements if cps_movements else record.get("Remedy Description", ""),
+                "Responsible Party": record.get("Responsible Party", ""),
+                "Existing CPSE Red Tag on Pole": record.get("Existing CPSE Red Tag on Pole", "NO"),
+                "Pole Data Missing in GIS": record.get("Pole Data Missing in GIS", ""),
+                "CPSE Application Comments": record.get("CPSE Application Comments", ""),
+                "Movement Summary": all_movements if all_movements else record.get("Movement Summary", ""),
+                "From Pole": from_pole_value,
+                "To Pole": to_pole_value,
+                "Span Length / Nearby Structure": record.get("Span Length / Nearby Structure", ""),
+            }
             
-            # First, group rows by Operation Number, skipping empty rows
-            for i, row in enumerate(df_final_rows):
-                op_num = str(row.get("Operation Number", ""))
-                # Skip empty rows (they have empty Operation Number)
-                if not op_num:
-                    continue
-                    
-                if op_num not in operation_groups:
-                    operation_groups[op_num] = []
-                operation_groups[op_num].append((excel_row + i, row))
+            # Main Attachers
+            for i, attacher in enumerate(attacher_data['main_attachers']):
+                row = base_row_data.copy()
+                row["Data Category"] = "Main_Attacher"
+                row["Bearing"] = ""
+                row["Attacher Description"] = attacher.get('name', '')
+                row["Attachment Height - Existing"] = attacher.get('existing_height', '')
+                row["Attachment Height - Proposed"] = attacher.get('proposed_height', '')
+                
+                # New logic for "Mid-Span (same span as existing)" based on feedback
+                midspan_val_to_set = ""
+                # If the pole attachment has a proposed height (meaning it's new or moved)
+                if attacher.get('proposed_height'): 
+                    midspan_val_to_set = self.get_midspan_proposed_heights(job_data, connection_id, attacher.get('name', ''))
+                row["Mid-Span (same span as existing)"] = midspan_val_to_set
+                
+                # For the flat sheet structure, only put Movement Summary and Remedy Description in the first main attacher row
+                if i > 0:
+                    row["Movement Summary"] = ""
+                    row["Remedy Description"] = ""
+                
+                block.append(row)
             
-            # Now merge cells for each group in columns A-I
-            for op_num, rows in operation_groups.items():
-                if len(rows) > 1:  # Only merge if there are multiple rows for this pole
-                    start_row = rows[0][0]
-                    end_row = rows[-1][0]
-                    
-                    # Merge cells in columns A through I
-                    for col_idx in range(9):  # A=0, B=1, ..., I=8
-                        col_letter = chr(65 + col_idx)  # A, B, C, etc.
-                        
-                        # Get the value from the first row of this group
-                        value = rows[0][1].get(desired_columns[col_idx], "")
-                        
-                        # Merge the cells and set the value
-                        worksheet.merge_range(f'{col_letter}{start_row+1}:{col_letter}{end_row+1}', value, data_format)
+            # Reference Spans
+            for ref_span in attacher_data['reference_spans']:
+                # Reference span header row
+                ref_header_row = base_row_data.copy()
+                ref_header_row["Data Category"] = "Ref_Span_Header"
+                ref_header_row["Bearing"] = ref_span.get('bearing', '') # Keep bearing for potential other uses
+                ref_header_row["Attacher Description"] = ref_span.get('header_text', f"REF ({ref_span.get('bearing', '')})") # Use new header_text
+                ref_header_row["Attachment Height - Existing"] = ""
+                ref_header_row["Attachment Height - Proposed"] = ""
+                ref_header_row["Mid-Span (same span as existing)"] = ""
+                ref_header_row["Movement Summary"] = ""  # Don't repeat in reference spans
+                ref_header_row["Remedy Description"] = ""
+                block.append(ref_header_row)
+                
+                # Reference span attacher rows
+                for attacher in ref_span.get('data', []):
+                    row = base_row_data.copy()
+                    row["Data Category"] = "Ref_Span_Attacher"
+                    row["Bearing"] = ref_span.get('bearing', '')
+                    row["Attacher Description"] = attacher.get('name', '')
+                    row["Attachment Height - Existing"] = attacher.get('existing_height', '')
+                    row["Attachment Height - Proposed"] = attacher.get('proposed_height', '')
+                    row["Mid-Span (same span as existing)"] = ""  # Not applicable for ref spans
+                    row["Movement Summary"] = ""  # Don't repeat in reference spans
+                    row["Remedy Description"] = ""
+                    block.append(row)
             
-            # Auto-fit all columns
-            for idx, col in enumerate(final_df.columns):
-                # Get the maximum length in this column, handle potential empty series
-                max_data_len = final_df[col].astype(str).map(len).max()
-                if pd.isna(max_data_len): # Handle case where column might be all NaN or empty
-                    max_data_len = 0
+            # Backspan
+            backspan_info = attacher_data['backspan']
+            if backspan_info['data']:
+                # Backspan header row
+                back_header_row = base_row_data.copy()
+                back_header_row["Data Category"] = "Backspan_Header"
+                back_header_row["Bearing"] = backspan_info.get('bearing', '')
+                back_header_row["Attacher Description"] = f"Backspan ({backspan_info.get('bearing', '')})"
+                back_header_row["Attachment Height - Existing"] = ""
+                back_header_row["Attachment Height - Proposed"] = ""
+                back_header_row["Mid-Span (same span as existing)"] = ""
+                back_header_row["Movement Summary"] = ""  # Don't repeat in backspans
+                back_header_row["Remedy Description"] = ""
+                block.append(back_header_row)
                 
-                max_len = max(
-                    max_data_len,  # Length of data
-                    len(str(col))    # Length of column name
-                ) + 2  # Add a little extra space
-                worksheet.set_column(idx, idx, max_len)  # Set column width
-
-            # Add a new sheet for reference data with detailed attachers
-            ref_sheet = workbook.add_worksheet('refs')
-            ref_headers = [
-                "Pole #", "SCID", "Ref. Structure SCID", "Attacher Name", 
-                "Main Pole Existing Height", "Main Pole Proposed Height",
-                "Mid-Span Existing Height", "Mid-Span Proposed Height"
-            ]
-            for c_idx, header in enumerate(ref_headers):
-                ref_sheet.write(0, c_idx, header)
+                # Backspan attacher rows
+                for attacher in backspan_info['data']:
+                    row = base_row_data.copy()
+                    row["Data Category"] = "Backspan_Attacher"
+                    row["Bearing"] = backspan_info.get('bearing', '')
+                    row["Attacher Description"] = attacher.get('name', '')
+                    row["Attachment Height - Existing"] = attacher.get('existing_height', '')
+                    row["Attachment Height - Proposed"] = attacher.get('proposed_height', '')
+                    row["Mid-Span (same span as existing)"] = ""  # Not applicable for backspans
+                    row["Movement Summary"] = ""  # Don't repeat in backspans
+                    row["Remedy Description"] = ""
+                    block.append(row)
             
-            ref_row_num = 1 # Start data from row 2 (index 1)
-
-            # Iterate through the original DataFrame `df` which contains main pole/connection records
-            for _, record in df.iterrows():
-                pole_number_main = record.get("Pole #", "")
-                scid_main = record.get("SCID", "")
-                node_id_main = record.get("node_id_1", "") # ID of the main pole for this record
-
-                if not node_id_main:
-                    continue
+            # If no attachers/refs/backspans, ensure at least one pole-only row is written
+            if not attacher_data['main_attachers'] and not attacher_data['reference_spans'] and not (attacher_data['backspan'] and attacher_data['backspan']['data']):
+                row = base_row_data.copy()
+                row["Data Category"] = "Pole_Only"
+                row["Bearing"] = ""
+                row["Attacher Description"] = "No attachers found"
+                row["Attachment Height - Existing"] = ""
+                row["Attachment Height - Proposed"] = ""
+                row["Mid-Span (same span as existing)"] = ""
+                # Keep Movement Summary and Remedy Description for pole-only rows
+                block.append(row)
+
+            yield block
+
+    def pole_pair_rows(self, row):
+        """The two From Pole / To Pole layout rows the workbook puts after each connection"""
+        # First row: Add headers "From Pole" and "To Pole"
+        header_row = {col: "" for col in MAKE_READY_COLUMNS}
+        header_row["Height Lowest Com"] = "From Pole"  # Column J
+        header_row["Height Lowest CPS Electrical"] = "To Pole"  # Column K
+
+        # Second row: Add the actual pole values
+        values_row = {col: "" for col in MAKE_READY_COLUMNS}
+        values_row["Height Lowest Com"] = row.get("Pole #", "")  # Value for From Pole in Column J
+        values_row["Height Lowest CPS Electrical"] = row.get("To Pole", "")  # Value for To Pole in Column K
+        return [header_row, values_row]
+
+    def flat_rows(self, df, job_data):
+        """MakeReadyData rows as lists in MAKE_READY_COLUMNS order, blank where the sheet leaves a cell empty"""
+        for block in self.iter_make_ready_blocks(df, job_data):
+            for row in block:
+                values = []
+                for col in MAKE_READY_COLUMNS:
+                    value = row.get(col, "")
+                    if value is None or (isinstance(value, float) and math.isnan(value)):
+                        value = ""
+                    values.append(value)
+                yield values
+
+    def create_output_csv(self, path, df, job_data):
+        """Stream the flat MakeReadyData rows to a CSV file"""
+        started = time.perf_counter()
+        row_count = 0
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(MAKE_READY_COLUMNS)
+            for values in self.flat_rows(df, job_data):
+                writer.writerow(values)
+                row_count += 1
+        print(f"CSV file created: {path} ({row_count} rows)")
+        self.record_stage('create_output_csv', started)
+        self.count('output_rows_main', row_count)
+
+    def create_output_parquet(self, path, df, job_data):
+        """Stream the flat MakeReadyData rows to a zstd-compressed Parquet file.
+
+        Operation Number is int64; every other column is a string.
+        """
+        if pyarrow is None:
+            raise RuntimeError("pyarrow is not installed; cannot write Parquet output (pip install pyarrow)")
+        started = time.perf_counter()
+        schema = pyarrow.schema([
+            (col, pyarrow.int64() if col == "Operation Number" else pyarrow.string())
+            for col in MAKE_READY_COLUMNS
+        ])
+        row_count = 0
+        batch = []
+
+        def write_batch(writer):
+            columns = list(zip(*batch))
+            arrays = [
+                pyarrow.array([int(v) if v != "" else None for v in values], pyarrow.int64())
+                if col == "Operation Number" else
+                pyarrow.array([str(v) for v in values], pyarrow.string())
+                for col, values in zip(MAKE_READY_COLUMNS, columns)
+            ]
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+            batch.clear()
+
+        with pyarrow.parquet.ParquetWriter(path, schema, compression='zstd') as writer:
+            for values in self.flat_rows(df, job_data):
+                batch.append(values)
+                row_count += 1
+                if len(batch) >= PARQUET_BATCH_ROWS:
+                    write_batch(writer)
+            if batch:
+                write_batch(writer)
+        print(f"Parquet file created: {path} ({row_count} rows)")
+        self.record_stage('create_output_parquet', started)
+        self.count('output_rows_main', row_count)
+
+    def create_output(self, path, df, job_data, output_format='xlsx'):
+        """Write the job's output in one of OUTPUT_FORMATS"""
+        if output_format == 'csv':
+            self.create_output_csv(path, df, job_data)
+        elif output_format == 'parquet':
+            self.create_output_parquet(path, df, job_data)
+        else:
+            self.create_output_excel(path, df, job_data)
+
+    def iter_ref_rows(self, df, job_data):
+        """Yield the refs sheet rows (lists in REF_COLUMNS order) for each record of df, in order.
+        Records without a main pole yield an empty list, so blocks line up with df."""
+        for _, record in df.iterrows():
+            self.check_cancelled()
+            pole_number_main = record.get("Pole #", "")
+            scid_main = record.get("SCID", "")
+            node_id_main = record.get("node_id_1", "") # ID of the main pole for this record
+
+            if not node_id_main:
+                yield []
+                continue
 
-                # Fetch attacher_data for the current main pole being processed for the "refs" sheet
-                # This call is needed here to get the attacher_data for the main pole
-                # to determine if there are any reference spans associated with it.
-                # The lookup itself is now generated inside get_reference_attachers.
-                attacher_data = self.get_attachers_for_node(job_data, node_id_main)
+            # Fetch attacher_data for the current main pole being processed for the "refs" sheet
+            # This call is needed here to get the attacher_data for the main pole
+            # to determine if there are any reference spans associated with it.
+            # The lookup itself is now generated inside get_reference_attachers.
+            attacher_data = self.get_attachers_for_node(job_data, node_id_main)
+
+            # We still need the main pole attacher lookup here to populate columns N and O
+            # in the 'refs' sheet with the main pole's heights.
+            main_pole_attachers_lookup = self.get_main_pole_attacher_heights(job_data, node_id_main)
+
+            ref_rows = []
+            data_actually_written_for_pole_refs = False # Initialize flag for "002.A" logic
+            if attacher_data and 'reference_spans' in attacher_data:
+                for ref_span_detail in attacher_data['reference_spans']:
+                    ref_structure_scid = ref_span_detail.get('ref_scid', 'Unknown Ref SCID')
+                    
+                    for attacher_on_ref_span in ref_span_detail.get('data', []):
+                        attacher_name = attacher_on_ref_span.get('name', '')
+                        # These heights are from the ref span's mid-point photo, used for columns P and Q
+                        mid_span_existing_h = attacher_on_ref_span.get('existing_height', '')
+                        mid_span_proposed_h = attacher_on_ref_span.get('proposed_height', '')
+
+                        # Look up heights from the main pole's attacher data for columns N and O
+                        main_pole_heights = main_pole_attachers_lookup.get(attacher_name, {'existing': '', 'proposed': ''})
+                        main_pole_existing_h = main_pole_heights['existing']
+                        main_pole_proposed_h = main_pole_heights['proposed']
+
+                        ref_rows.append([
+                            pole_number_main,
+                            scid_main,
+                            ref_structure_scid,
+                            attacher_name,
+                            main_pole_existing_h, # Column N: Main Pole Existing Height
+                            main_pole_proposed_h, # Column O: Main Pole Proposed Height
+                            mid_span_proposed_h,  # Column P: Mid-Span Proposed Height (Header: Mid-Span Existing Height)
+                            mid_span_existing_h,  # Column Q: Mid-Span Existing Height (Header: Mid-Span Proposed Height)
+                        ])
+                        data_actually_written_for_pole_refs = True # Set flag as data was written
+        
+            # Check for "002.A" SCID for the main pole
+            if "002.A" in str(scid_main):
+                if not data_actually_written_for_pole_refs: # Only add if no ref data was actually written for this pole
+                    ref_rows.append([
+                        pole_number_main,
+                        scid_main,
+                        "N/A - Pole is 002.A",
+                        "Pole SCID is 002.A",
+                        "", # Main Pole Existing
+                        "", # Main Pole Proposed
+                        "", # Mid-Span Existing
+                        "", # Mid-Span Proposed
+                    ])
+
+            yield ref_rows
+
+    def open_workbook_writer(self, path, record_count):
+        """Row sink for create_output_excel: a PipelinedWorkbookWriter process when
+        there is a spare CPU and at least PIPELINE_MIN_RECORDS records to write,
+        otherwise a WorkbookStreamWriter in this process. Profiled runs write
+        inline so the profile includes the writing."""
+        if (EXCEL_WRITER_PROCESS and (os.cpu_count() or 1) > 1
+                and record_count >= PIPELINE_MIN_RECORDS and not self.profiling
+                and not multiprocessing.current_process().daemon):
+            return PipelinedWorkbookWriter(path, cancel_check=self.check_cancelled)
+        return WorkbookStreamWriter(path)
 
-                # We still need the main pole attacher lookup here to populate columns N and O
-                # in the 'refs' sheet with the main pole's heights.
-                main_pole_attachers_lookup = self.get_main_pole_attacher_heights(job_data, node_id_main)
+    def create_output_excel(self, path, df, job_data):
+        """Create a simplified Excel output with flat single sheet structure.
+        Row blocks are streamed to the workbook writer as each connection is analysed."""
+        main_started = time.perf_counter()
+        
+        main_rows = 0
+        ref_count = 0
+        writer = None 
 
-                data_actually_written_for_pole_refs = False # Initialize flag for "002.A" logic
-                if attacher_data and 'reference_spans' in attacher_data:
-                    for ref_span_detail in attacher_data['reference_spans']:
-                        ref_structure_scid = ref_span_detail.get('ref_scid', 'Unknown Ref SCID')
-                        
-                        for attacher_on_ref_span in ref_span_detail.get('data', []):
-                            attacher_name = attacher_on_ref_span.get('name', '')
-                            # These heights are from the ref span's mid-point photo, used for columns P and Q
-                            mid_span_existing_h = attacher_on_ref_span.get('existing_height', '')
-                            mid_span_proposed_h = attacher_on_ref_span.get('proposed_height', '')
-
-                            # Look up heights from the main pole's attacher data for columns N and O
-                            main_pole_heights = main_pole_attachers_lookup.get(attacher_name, {'existing': '', 'proposed': ''})
-                            main_pole_existing_h = main_pole_heights['existing']
-                            main_pole_proposed_h = main_pole_heights['proposed']
-
-                            ref_sheet.write(ref_row_num, 0, pole_number_main)
-                            ref_sheet.write(ref_row_num, 1, scid_main)
-                            ref_sheet.write(ref_row_num, 2, ref_structure_scid)
-                            ref_sheet.write(ref_row_num, 3, attacher_name)
-                            ref_sheet.write(ref_row_num, 4, main_pole_existing_h) # Column N: Main Pole Existing Height
-                            ref_sheet.write(ref_row_num, 5, main_pole_proposed_h) # Column O: Main Pole Proposed Height
-                            ref_sheet.write(ref_row_num, 6, mid_span_proposed_h)  # Column P: Mid-Span Proposed Height (Header: Mid-Span Existing Height)
-                            ref_sheet.write(ref_row_num, 7, mid_span_existing_h)  # Column Q: Mid-Span Existing Height (Header: Mid-Span Proposed Height)
-                            data_actually_written_for_pole_refs = True # Set flag as data was written
-                            ref_row_num += 1
-            
-                # Check for "002.A" SCID for the main pole
-                if "002.A" in str(scid_main):
-                    if not data_actually_written_for_pole_refs: # Only add if no ref data was actually written for this pole
-                        ref_sheet.write(ref_row_num, 0, pole_number_main)
-                        ref_sheet.write(ref_row_num, 1, scid_main)
-                        ref_sheet.write(ref_row_num, 2, "N/A - Pole is 002.A") 
-                        ref_sheet.write(ref_row_num, 3, "Pole SCID is 002.A") 
-                        ref_sheet.write(ref_row_num, 4, "") # Main Pole Existing
-                        ref_sheet.write(ref_row_num, 5, "") # Main Pole Proposed
-                        ref_sheet.write(ref_row_num, 6, "") # Mid-Span Existing
-                        ref_sheet.write(ref_row_num, 7, "") # Mid-Span Proposed
-                        ref_row_num += 1
+        try:
+            writer = self.open_workbook_writer(path, len(df))
             
-            # Auto-fit columns for the "refs" sheet
-            ref_sheet.set_column(0, 0, 12)  # Pole #
-            ref_sheet.set_column(1, 1, 15)  # SCID
-            ref_sheet.set_column(2, 2, 20)  # Ref. Structure SCID
-            ref_sheet.set_column(3, 3, 30)  # Attacher Name
-            ref_sheet.set_column(4, 4, 25)  # Main Pole Existing Height
-            ref_sheet.set_column(5, 5, 25)  # Main Pole Proposed Height
-            ref_sheet.set_column(6, 6, 25)  # Mid-Span Existing Height
-            ref_sheet.set_column(7, 7, 25)  # Mid-Span Proposed Height
+            for block in self.iter_make_ready_blocks(df, job_data):
+                if not df.empty:
+                    block = block + self.pole_pair_rows(block[0])
+                writer.add_rows(block)
+                main_rows += len(block)
+
+            self.record_stage('create_output_excel_main', main_started)
+            refs_started = time.perf_counter()
 
+            # refs rows for each main pole/connection record of df, in order
+            for rows in self.iter_ref_rows(df, job_data):
+                if rows:
+                    writer.add_ref_rows(rows)
+                    ref_count += len(rows)
 
             print(f"Excel file created: {path}")
-            print(f"Total rows written to Excel (MakeReadyData): {len(df_final_rows)}") 
-            print(f"Total data rows written to Excel (refs): {ref_row_num -1 }")
+            print(f"Total rows written to Excel (MakeReadyData): {main_rows}") 
+            print(f"Total data rows written to Excel (refs): {ref_count}")
+            self.record_stage('create_output_excel_refs', refs_started)
+            self.count('output_rows_main', main_rows)
+            self.count('output_rows_refs', ref_count)
 
 
+        except (ProcessingCancelled, WorkbookWriterError):
+            # A failed writer means a missing or truncated workbook: let the job fail
+            if writer:
+                writer.abort()
+                writer = None
+            raise
         except Exception as e:
             print(f"Error during Excel file creation or formatting: {str(e)}")
             # Optionally re-raise or handle as needed
@@ -2216,22 +3359,171 @@ class FileProcessor:
         finally:
             if writer:
                 try:
+                    save_started = time.perf_counter()
                     writer.close()
+                    self.record_stage('save_workbook', save_started)
                     print(f"Excel writer closed for {path}.")
+                except WorkbookWriterError as e:
+                    print(f"Error closing Excel writer for {path}: {str(e)}")
+                    raise
                 except Exception as e:
                     print(f"Error closing Excel writer for {path}: {str(e)}")
 
 
-    def process_files(self, job_json_path, geojson_path=None):
-        """Main processing function that replaces the GUI version"""
+    def create_output_shards(self, path, df, job_data, shard_by, shard_size=None, source_file=None):
+        """Write the workbook as a ZIP of shard workbooks plus manifest.json (see plan_shards).
+
+        Rows are built here, in the order create_output_excel builds them. The
+        shard workbooks are then written in parallel by write_shards.
+        """
+        shard_size = shard_size or SHARD_DEFAULT_SIZE[shard_by]
+        rows_started = time.perf_counter()
+        blocks = list(self.iter_make_ready_blocks(df, job_data))
+        ref_blocks = list(self.iter_ref_rows(df, job_data))
+        self.record_stage('shard_rows', rows_started)
+
+        shards = plan_shards(list(zip(df["Operation Number"], df["SCID"])), shard_by, shard_size)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        manifest = {
+            'manifest_version': MANIFEST_VERSION,
+            'source_file': source_file,
+            'generated': datetime.datetime.now().isoformat(),
+            'shard_by': shard_by,
+            'shard_size': shard_size,
+            'shards': []
+        }
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(path) or None) as shard_dir:
+            shard_paths = []
+
+            def shard_jobs():
+                # Built one shard at a time as write_shards asks for it; each source
+                # block is dropped once copied so the rows are only held once
+                for number, shard in enumerate(shards, start=1):
+                    rows, ref_rows = [], []
+                    for index in shard['records']:
+                        block, blocks[index] = blocks[index], None
+                        rows.extend(block)
+                        rows.extend(self.pole_pair_rows(block[0]))
+                        ref_rows.extend(ref_blocks[index])
+                        ref_blocks[index] = None
+                    filename = f"{stem}_shard{number:03d}_{shard['label']}.xlsx"
+                    shard_paths.append(os.path.join(shard_dir, filename))
+                    first, last = shard['records'][0], shard['records'][-1]
+                    manifest['shards'].append({
+                        'file': filename,
+                        'label': shard['label'],
+                        'operations': [int(df["Operation Number"].iloc[first]), int(df["Operation Number"].iloc[last])],
+                        'scids': [str(df["SCID"].iloc[first]), str(df["SCID"].iloc[last])],
+                        'connections': len(shard['records']),
+                        'rows': len(rows),
+                        'ref_rows': len(ref_rows)
+                    })
+                    self.count('output_rows_main', len(rows))
+                    self.count('output_rows_refs', len(ref_rows))
+                    yield shard_paths[-1], rows, ref_rows
+
+            write_started = time.perf_counter()
+            self.write_shards(shard_jobs(), len(shards))
+            self.record_stage('write_shards', write_started)
+
+            bundle_started = time.perf_counter()
+            for entry, shard_path in zip(manifest['shards'], shard_paths):
+                entry['bytes'] = os.path.getsize(shard_path)
+            with zipfile.ZipFile(path, 'w') as bundle:
+                # Manifest first so a streaming reader sees it before the shards
+                bundle.writestr('manifest.json', json.dumps(manifest, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+                for shard_path in shard_paths:
+                    # xlsx is already deflated; store it as-is
+                    bundle.write(shard_path, os.path.basename(shard_path), compress_type=zipfile.ZIP_STORED)
+            self.record_stage('bundle_shards', bundle_started)
+        self.count('output_shards', len(shard_paths))
+        print(f"Sharded workbook bundle created: {path} ({len(shard_paths)} shards by {shard_by}, size {shard_size})")
+        return manifest
+
+    def write_shards(self, jobs, count):
+        """Run write_workbook for each of count (path, rows, ref_rows) jobs, in parallel
+        worker processes when this process may have children (daemonic processes may not).
+        Jobs are taken from the iterable only as workers free up."""
+        workers = min(count, SHARD_MAX_WORKERS, os.cpu_count() or 1)
+        if workers <= 1 or multiprocessing.current_process().daemon:
+            for job in jobs:
+                self.check_cancelled()
+                write_workbook(*job)
+            return
+        # Not fork, as for PipelinedWorkbookWriter: the workers need only this module
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=child_process_context())
+
+        def wait_for(limit):
+            nonlocal pending
+            while len(pending) > limit:
+                self.check_cancelled()
+                done, pending = wait(pending, timeout=SHARD_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+
+        pending = set()
+        try:
+            for job in jobs:
+                wait_for(workers - 1)
+                pending.add(pool.submit(write_workbook, *job))
+                job = None
+            wait_for(0)
+        except BaseException:
+            # Don't wait for running write_workbook calls (the job worker may be
+            # SIGKILLed first and orphan them); kill the workers now
+            for process in list((pool._processes or {}).values()):
+                process.terminate()
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+    def process_files(self, job_json_path, geojson_path=None, output_format='xlsx', shard_by=None, shard_size=None):
+        """Main processing function that replaces the GUI version.
+
+        output_format picks the output file: 'xlsx' (the formatted workbook),
+        'csv' or 'parquet' (flat MakeReadyData rows only, see OUTPUT_FORMATS).
+        shard_by ('operations' or 'scid', xlsx only) writes a ZIP of shard
+        workbooks instead of one workbook (see create_output_shards).
+        """
+        output_excel_path = None
         try:
             # Validate job JSON path
             if not os.path.exists(job_json_path):
                 print(f"Error: Job JSON file not found: {job_json_path}")
                 return False
+            if output_format not in OUTPUT_FORMATS:
+                print(f"Error: Unknown output format: {output_format} (expected one of {', '.join(OUTPUT_FORMATS)})")
+                return False
+            if output_format == 'parquet' and pyarrow is None:
+                print("Error: pyarrow is not installed; cannot write Parquet output (pip install pyarrow)")
+                return False
+            if shard_by is not None and (shard_by not in SHARD_BY or output_format != 'xlsx'):
+                print(f"Error: Sharding needs xlsx output and shard_by in {', '.join(SHARD_BY)} (got {shard_by}, {output_format})")
+                return False
+            if shard_size is not None and shard_size < 1:
+                print(f"Error: shard_size must be at least 1 (got {shard_size})")
+                return False
 
+            load_started = time.perf_counter()
             self.job_data = self.load_json(job_json_path)
+            self.record_stage('load_json', load_started)
             print("Job JSON file loaded successfully.")
+            self.check_cancelled()
+            self.get_spatial_index(self.job_data)
+            self.get_connection_graph(self.job_data)
+            self.get_photo_item_table(self.job_data)
+            self.get_trace_index(self.job_data)
+            self.get_connection_traces(self.job_data)
+            self.get_scid_index(self.job_data)
+
+            if self.log_detail:
+                detail_base = strip_json_suffix(os.path.basename(job_json_path))
+                detail_path = os.path.join(
+                    self.downloads_path,
+                    f"{detail_base}_LogDetail_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+                )
+                self.logger.open_detail(detail_path)
+                print(f"Streaming detailed item log to: {detail_path}")
             
             # Make GeoJSON loading optional
             geojson_data = None
@@ -2245,12 +3537,14 @@ class FileProcessor:
             else:
                 print("No GeoJSON file provided. Processing without GeoJSON data...")
 
+            process_started = time.perf_counter()
             df = self.process_data(self.job_data, geojson_data)
+            self.record_stage('process_data', process_started)
 
             if df.empty:
                 print("Warning: DataFrame is empty. No data to export.")
                 # Still create a log file indicating no data was processed.
-                json_base = os.path.splitext(os.path.basename(job_json_path))[0]
+                json_base = strip_json_suffix(os.path.basename(job_json_path))
                 log_filename_empty = f"{json_base}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_Processing_Log.txt"
                 log_path_empty = os.path.join(self.downloads_path, log_filename_empty)
                 self.logger.write_summary(log_path_empty) # Log will show 0 items processed
@@ -2259,21 +3553,26 @@ class FileProcessor:
 
             # Generate unique output filenames using timestamp to prevent conflicts
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            json_base_name = os.path.splitext(os.path.basename(job_json_path))[0]
+            json_base_name = strip_json_suffix(os.path.basename(job_json_path))
             
-            output_excel_filename = f"{json_base_name}_Output_{timestamp}.xlsx"
+            output_suffix = '.zip' if shard_by else OUTPUT_FORMATS[output_format]
+            output_excel_filename = f"{json_base_name}_Output_{timestamp}{output_suffix}"
             output_excel_path = os.path.join(self.downloads_path, output_excel_filename)
             
             # Versioning (if somehow a file with the exact same timestamp exists, though unlikely)
             version = 2
             temp_excel_path = output_excel_path
             while os.path.exists(temp_excel_path):
-                temp_excel_filename = f"{json_base_name}_Output_{timestamp}_v{version}.xlsx"
+                temp_excel_filename = f"{json_base_name}_Output_{timestamp}_v{version}{output_suffix}"
                 temp_excel_path = os.path.join(self.downloads_path, temp_excel_filename)
                 version += 1
             output_excel_path = temp_excel_path # Use the versioned path if needed
 
-            self.create_output_excel(output_excel_path, df, self.job_data)
+            if shard_by:
+                self.create_output_shards(output_excel_path, df, self.job_data, shard_by, shard_size,
+                                          source_file=os.path.basename(job_json_path))
+            else:
+                self.create_output(output_excel_path, df, self.job_data, output_format)
             # Corrected log message for clarity
             excel_row_count = 0
             try:
@@ -2295,14 +3594,127 @@ class FileProcessor:
             log_path = os.path.join(self.downloads_path, log_filename)
             self.logger.write_summary(log_path)
             print(f"Processing log written to: {log_path}")
+
+            report_path = os.path.join(self.downloads_path, f"{json_base_name}_Report_{timestamp}.json")
+            self.write_report(report_path, job_json_path)
+            print(f"Processing report written to: {report_path}")
             
             return True
             
+        except ProcessingCancelled:
+            print(f"Processing cancelled: {job_json_path}")
+            # Don't leave a half-written workbook behind
+            if output_excel_path and os.path.exists(output_excel_path):
+                os.remove(output_excel_path)
+            return False
         except Exception as e:
             print(f"Error processing files: {str(e)}")
             import traceback
             print(f"Traceback: {traceback.format_exc()}")
             return False
+        finally:
+            self.logger.close_detail()
+
+    def profile_files(self, job_json_path, geojson_path=None, output_format='xlsx', shard_by=None, shard_size=None):
+        """Run process_files under cProfile and a stack sampler.
+
+        Writes {base}_Profile_{timestamp}.zip next to the other outputs with
+        collapsed_stacks.txt (flamegraph.pl / speedscope input) and
+        methods.txt (per-function table for this module). Returns
+        (success, profile_path).
+        """
+        sampler = StackSampler(threading.get_ident())
+        profiler = cProfile.Profile()
+        self.profiling = True
+        sampler.start()
+        profiler.enable()
+        try:
+            success = self.process_files(job_json_path, geojson_path, output_format, shard_by, shard_size)
+        finally:
+            profiler.disable()
+            sampler.stop()
+            self.profiling = False
+
+        json_base_name = strip_json_suffix(os.path.basename(job_json_path))
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        profile_path = os.path.join(self.downloads_path, f"{json_base_name}_Profile_{timestamp}.zip")
+        with zipfile.ZipFile(profile_path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr('collapsed_stacks.txt', sampler.collapsed())
+            bundle.writestr('methods.txt', self._method_table(profiler))
+        print(f"Profile written to: {profile_path}")
+        return success, profile_path
+
+    def _method_table(self, profiler):
+        """cProfile stats for functions defined in this module, by cumulative time"""
+        stats = pstats.Stats(profiler)
+        rows = []
+        for (filename, lineno, funcname), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            if os.path.abspath(filename) == os.path.abspath(__file__):
+                rows.append((cumtime, tottime, ncalls, f"{funcname} (line {lineno})"))
+        rows.sort(reverse=True)
+        lines = [f"{'cumtime (s)':>12} {'tottime (s)':>12} {'calls':>9}  function"]
+        for cumtime, tottime, ncalls, name in rows:
+            lines.append(f"{cumtime:12.4f} {tottime:12.4f} {ncalls:9d}  {name}")
+        lines.append("")
+        lines.append(f"Total profiled time: {stats.total_tt:.4f}s (includes cProfile overhead)")
+        return "\n".join(lines) + "\n"
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts"""
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = defaultdict(int)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """One "frame;frame;frame count" line per distinct stack, root first"""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+
+def process_files_in_worker(output_dir, job_json_path, cancel_event=None, metrics_conn=None, profile=False,
+                            log_detail=False, output_format='xlsx', shard_by=None, shard_size=None):
+    """Entry point for a worker process: the exit code is 0 on success, 1 otherwise.
+
+    When given the write end of a Pipe, the processor's metrics_snapshot() is
+    sent through it before exiting. With profile=True the run goes through
+    profile_files and leaves a Profile zip next to the outputs; log_detail=True
+    adds the LogDetail JSONL. output_format, shard_by and shard_size are passed
+    to process_files.
+    """
+    processor = FileProcessor(output_dir=output_dir, cancel_event=cancel_event, log_detail=log_detail)
+    if profile:
+        success, _ = processor.profile_files(job_json_path, output_format=output_format,
+                                             shard_by=shard_by, shard_size=shard_size)
+    else:
+        success = processor.process_files(job_json_path, output_format=output_format,
+                                          shard_by=shard_by, shard_size=shard_size)
+    if metrics_conn is not None:
+        metrics_conn.send(processor.metrics_snapshot())
+        metrics_conn.close()
+    raise SystemExit(0 if success else 1)
 
 
 def main():
@@ -2310,10 +3722,37 @@ def main():
     # This main function is intended for local testing and development.
     # In a production environment, FileProcessor().process_files() would be called
     # by the Flask/FastAPI application.
+    parser = argparse.ArgumentParser(description="Generate the MakeReady report from a Katapult job export")
+    parser.add_argument("job_json", nargs="?", help="Job export (.json, .json.gz or .json.zst)")
+    parser.add_argument("--geojson", help="Optional GeoJSON file")
+    parser.add_argument("--output-dir", help="Output directory (default: ./outputs)")
+    parser.add_argument("--log-detail", action="store_true",
+                        help="Also stream every logged item to a LogDetail .jsonl file")
+    parser.add_argument("--profile", action="store_true",
+                        help="Also write a profile zip (collapsed stacks + per-method table)")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default='xlsx',
+                        help="Output file: the xlsx workbook (default) or flat csv/parquet rows")
+    parser.add_argument("--shard-by", choices=list(SHARD_BY),
+                        help="Write a ZIP of shard workbooks (with manifest.json) split by operations or SCID range")
+    parser.add_argument("--shard-size", type=int,
+                        help="Operations per shard, or SCID range width (defaults: operations 500, scid 100)")
+    parser.add_argument("--follow-trace", metavar="TRACE_ID",
+                        help="Print every pole and midspan a trace appears on as JSON, then exit")
+    args = parser.parse_args()
+
+    if args.follow_trace:
+        if not args.job_json:
+            parser.error("--follow-trace needs a job file")
+        processor = FileProcessor(output_dir=args.output_dir)
+        job_data = processor.load_json(args.job_json)
+        print(json.dumps(processor.follow_cable(job_data, args.follow_trace), indent=2))
+        return
 
-    # Example: Create a dummy JSON file for testing if one doesn't exist
     test_json_filename = "test_job_data.json"
-    if not os.path.exists(test_json_filename):
+    if args.job_json:
+        job_json_path = args.job_json
+    # Example: Create a dummy JSON file for testing if one doesn't exist
+    elif not os.path.exists(test_json_filename):
         print(f"Creating dummy '{test_json_filename}' for testing.")
         dummy_data = {
             "nodes": {
@@ -2342,15 +3781,18 @@ def main():
 
     # Create processor instance. For local testing, output_dir can be specified.
     # If None, it will use the default logic (e.g., system temp).
-    # For this example, let's create an 'outputs' directory in the current working directory.
-    local_output_dir = os.path.join(os.getcwd(), "outputs")
+    # By default, create an 'outputs' directory in the current working directory.
+    local_output_dir = args.output_dir or os.path.join(os.getcwd(), "outputs")
     os.makedirs(local_output_dir, exist_ok=True)
     print(f"Local test outputs will be saved to: {local_output_dir}")
     
-    processor = FileProcessor(output_dir=local_output_dir)
+    processor = FileProcessor(output_dir=local_output_dir, log_detail=args.log_detail)
     
     # Call process_files, which now handles loading JSON internally
-    success = processor.process_files(job_json_path) # GeoJSON is optional
+    if args.profile:
+        success, _ = processor.profile_files(job_json_path, args.geojson, args.format, args.shard_by, args.shard_size)
+    else:
+        success = processor.process_files(job_json_path, args.geojson, args.format, args.shard_by, args.shard_size) # GeoJSON is optional
 
     if success:
         print("--- Local Test Run Completed Successfully ---")
@@ -15,6 +15,12 @@ export interface UploadResponse {
   status: string
 }
 
+export type OutputFileType = 'excel' | 'csv' | 'parquet' | 'bundle' | 'log' | 'report' | 'profile' | 'log_detail'
+
+export type OutputFormat = 'xlsx' | 'csv' | 'parquet'
+
+export type ShardBy = 'operations' | 'scid'
+
 export interface TaskStatus {
   task_id: string
   filename: string
@@ -22,13 +28,24 @@ export interface TaskStatus {
   created: string
   progress?: number
   files?: Array<{
-    type: 'excel' | 'log'
+    type: OutputFileType
     filename: string
   }>
   error?: string
+  output_format?: OutputFormat
+  shard_by?: ShardBy | null
+  shard_size?: number | null
+}
+
+export interface UploadOptions {
+  profile?: boolean
+  logDetail?: boolean
+  outputFormat?: OutputFormat
+  shardBy?: ShardBy
+  shardSize?: number
 }
 
-export const uploadFile = async (file: File): Promise<UploadResponse> => {
+export const uploadFile = async (file: File, options: UploadOptions = {}): Promise<UploadResponse> => {
   const formData = new FormData()
   formData.append('file', file)
   
@@ -36,6 +53,13 @@ export const uploadFile = async (file: File): Promise<UploadResponse> => {
     headers: {
       'Content-Type': 'multipart/form-data',
     },
+    params: {
+      ...(options.profile ? { profile: true } : {}),
+      ...(options.logDetail ? { log_detail: true } : {}),
+      ...(options.outputFormat ? { output_format: options.outputFormat } : {}),
+      ...(options.shardBy ? { shard_by: options.shardBy } : {}),
+      ...(options.shardBy && options.shardSize ? { shard_size: options.shardSize } : {}),
+    },
   })
   
   return response.data
@@ -46,7 +70,11 @@ export const getTaskStatus = async (taskId: string): Promise<TaskStatus> => {
   return response.data
 }
 
-export const downloadFile = (taskId: string, fileType: 'excel' | 'log'): string => {
+export const taskEventsUrl = (taskId: string): string => {
+  return `${API_BASE_URL}/tasks/${taskId}/events`
+}
+
+export const downloadFile = (taskId: string, fileType: OutputFileType): string => {
   return `${API_BASE_URL}/tasks/${taskId}/download/${fileType}`
 }
 
@@ -14,10 +14,11 @@ export default function FileUpload({ onUploadSuccess, onUploadError }: FileUploa
   const onDrop = useCallback((acceptedFiles: File[]) => {
     if (acceptedFiles.length > 0) {
       const file = acceptedFiles[0]
-      if (file.type === 'application/json' || file.name.endsWith('.json')) {
+      const name = file.name.toLowerCase()
+      if (file.type === 'application/json' || name.endsWith('.json') || name.endsWith('.json.gz') || name.endsWith('.json.zst')) {
         setSelectedFile(file)
       } else {
-        onUploadError('Please select a JSON file.')
+        onUploadError('Please select a JSON file (.json, .json.gz or .json.zst).')
       }
     }
   }, [onUploadError])
@@ -25,7 +26,9 @@ export default function FileUpload({ onUploadSuccess, onUploadError }: FileUploa
   const { getRootProps, getInputProps, isDragActive } = useDropzone({
     onDrop,
     accept: {
-      'application/json': ['.json']
+      'application/json': ['.json'],
+      'application/gzip': ['.gz'],
+      'application/zstd': ['.zst']
     },
     maxFiles: 1,
     disabled: isUploading
@@ -1,4 +1,18 @@
-import { TaskStatus, downloadFile, cleanupTask } from '../api/client'
+import { TaskStatus, OutputFileType, downloadFile, cleanupTask } from '../api/client'
+
+const FILE_TYPE_LABELS: Record<OutputFileType, string> = {
+  excel: 'Excel Report',
+  csv: 'MakeReadyData (CSV)',
+  parquet: 'MakeReadyData (Parquet)',
+  bundle: 'Sharded Excel Reports (ZIP)',
+  log: 'Processing Log',
+  report: 'Processing Report (JSON)',
+  profile: 'Performance Profile',
+  log_detail: 'Detailed Item Log (JSONL)',
+}
+
+// Outputs holding the MakeReadyData rows get the spreadsheet icon
+const DATA_FILE_TYPES: OutputFileType[] = ['excel', 'csv', 'parquet', 'bundle']
 
 interface ResultsProps {
   taskId: string
@@ -7,7 +21,7 @@ interface ResultsProps {
 }
 
 export default function Results({ taskId, files, onReset }: ResultsProps) {
-  const handleDownload = (fileType: 'excel' | 'log') => {
+  const handleDownload = (fileType: OutputFileType) => {
     const url = downloadFile(taskId, fileType)
     window.open(url, '_blank')
   }
@@ -59,7 +73,7 @@ export default function Results({ taskId, files, onReset }: ResultsProps) {
           >
             <div className="flex items-center space-x-3">
               <div className="p-2 bg-primary-100 rounded group-hover:bg-primary-200 transition-colors">
-                {file.type === 'excel' ? (
+                {DATA_FILE_TYPES.includes(file.type) ? (
                   <svg 
                     className="w-6 h-6 text-primary-600" 
                     fill="none" 
@@ -92,7 +106,7 @@ export default function Results({ taskId, files, onReset }: ResultsProps) {
               <div className="text-left">
                 <p className="font-medium text-gray-900">{file.filename}</p>
                 <p className="text-sm text-gray-500">
-                  {file.type === 'excel' ? 'Excel Report' : 'Processing Log'}
+                  {FILE_TYPE_LABELS[file.type]}
                 </p>
               </div>
             </div>
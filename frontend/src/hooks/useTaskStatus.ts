@@ -1,5 +1,5 @@
 import { useState, useEffect, useRef } from 'react'
-import { getTaskStatus, TaskStatus } from '../api/client'
+import { taskEventsUrl, TaskStatus } from '../api/client'
 
 interface UseTaskStatusOptions {
   onComplete?: () => void
@@ -10,7 +10,7 @@ export function useTaskStatus(taskId: string | null, options: UseTaskStatusOptio
   const [status, setStatus] = useState<TaskStatus['status']>('queued')
   const [progress, setProgress] = useState(0)
   const [files, setFiles] = useState<TaskStatus['files']>([])
-  const intervalRef = useRef<number | null>(null)
+  const eventSourceRef = useRef<EventSource | null>(null)
   const wsRef = useRef<WebSocket | null>(null)
   const isCleanedUpRef = useRef(false)
   const optionsRef = useRef(options)
@@ -49,25 +49,14 @@ export function useTaskStatus(taskId: string | null, options: UseTaskStatusOptio
       ws.onmessage = (event) => {
         if (isCleanedUpRef.current) return
         
-        const data: TaskStatus = JSON.parse(event.data)
-        setStatus(data.status)
-        setProgress(data.progress || 0)
-        setFiles(data.files || [])
-
-        if (data.status === 'complete') {
-          optionsRef.current.onComplete?.()
-          cleanup()
-        } else if (data.status === 'failed') {
-          optionsRef.current.onError?.(data.error || 'Processing failed')
-          cleanup()
-        }
+        handleStatus(JSON.parse(event.data))
       }
 
       ws.onerror = (error) => {
         console.error(`WebSocket error for task ${taskId || 'unknown'}:`, error)
         if (!wsConnected && !isCleanedUpRef.current) {
-          // Fall back to polling if WebSocket fails to connect
-          startPolling()
+          // Fall back to server-sent events if WebSocket fails to connect
+          startEventStream()
         }
       }
 
@@ -77,15 +66,15 @@ export function useTaskStatus(taskId: string | null, options: UseTaskStatusOptio
           // Reconnect if connection was lost unexpectedly (not a normal close)
           setTimeout(() => {
             if (!isCleanedUpRef.current) {
-              startPolling()
+              startEventStream()
             }
           }, 1000)
         }
       }
     } catch (error) {
       console.error(`WebSocket creation failed for task ${taskId || 'unknown'}:`, error)
-      // Fall back to polling
-      startPolling()
+      // Fall back to server-sent events
+      startEventStream()
     }
 
     function cleanup() {
@@ -94,9 +83,9 @@ export function useTaskStatus(taskId: string | null, options: UseTaskStatusOptio
       isCleanedUpRef.current = true
       console.log(`Cleaning up task ${taskId || 'unknown'}`)
       
-      if (intervalRef.current) {
-        clearInterval(intervalRef.current)
-        intervalRef.current = null
+      if (eventSourceRef.current) {
+        eventSourceRef.current.close()
+        eventSourceRef.current = null
       }
       
       if (wsRef.current) {
@@ -105,57 +94,41 @@ export function useTaskStatus(taskId: string | null, options: UseTaskStatusOptio
       }
     }
 
-    function startPolling() {
-      if (isCleanedUpRef.current) return
-      
-      // Initial check
-      checkStatus()
-      
-      // Poll every 2 seconds
-      if (!intervalRef.current) {
-        intervalRef.current = setInterval(checkStatus, 2000)
+    function handleStatus(data: TaskStatus) {
+      setStatus(data.status)
+      setProgress(data.progress || 0)
+      setFiles(data.files || [])
+
+      if (data.status === 'complete') {
+        optionsRef.current.onComplete?.()
+        cleanup()
+      } else if (data.status === 'failed') {
+        optionsRef.current.onError?.(data.error || 'Processing failed')
+        cleanup()
       }
     }
 
-    async function checkStatus() {
-      if (isCleanedUpRef.current || !taskId) return
+    function startEventStream() {
+      if (isCleanedUpRef.current || eventSourceRef.current || !taskId) return
       
-      try {
-        const data = await getTaskStatus(taskId)
-        
+      // The server pushes every status change; EventSource reconnects on its own
+      // and resumes from the last event id it saw, so there is nothing to poll
+      const source = new EventSource(taskEventsUrl(taskId))
+      eventSourceRef.current = source
+
+      source.addEventListener('status', (event) => {
         if (isCleanedUpRef.current) return
         
-        setStatus(data.status)
-        setProgress(data.progress || 0)
-        setFiles(data.files || [])
+        handleStatus(JSON.parse((event as MessageEvent).data))
+      })
 
-        if (data.status === 'complete') {
-          optionsRef.current.onComplete?.()
-          cleanup()
-        } else if (data.status === 'failed') {
-          optionsRef.current.onError?.(data.error || 'Processing failed')
-          cleanup()
-        }
-      } catch (error: any) {
+      source.onerror = () => {
         if (isCleanedUpRef.current) return
         
-        // If we get a 404, the task was deleted - stop polling
-        if (error?.response?.status === 404) {
-          console.log(`Task ${taskId || 'unknown'} not found (404) - stopping status checks`)
+        // CLOSED means the server refused the stream (e.g. 404 once the task was deleted)
+        if (source.readyState === EventSource.CLOSED) {
+          console.log(`Event stream for task ${taskId || 'unknown'} closed - stopping status updates`)
           cleanup()
-          return
-        }
-        
-        console.error('Error checking status:', error)
-        
-        // For other errors, continue polling but with exponential backoff
-        if (intervalRef.current) {
-          clearInterval(intervalRef.current)
-          intervalRef.current = setTimeout(() => {
-            if (!isCleanedUpRef.current) {
-              startPolling()
-            }
-          }, 5000) // Wait 5 seconds before retrying
         }
       }
     }
@@ -0,0 +1,161 @@
+import copy
+import os
+import sys
+
+import pytest
+
+# Tests import `barebones` and `backend.app` the way `uvicorn backend.app:app` does: from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def trace(company, cable_type=None, equipment_type=None, proposed=False, connection_id=None):
+    info = {'company': company, 'proposed': proposed}
+    if cable_type is not None:
+        info['cable_type'] = cable_type
+    if equipment_type is not None:
+        info['equipment_type'] = equipment_type
+    if connection_id is not None:
+        info['connection_id'] = connection_id
+    return info
+
+
+def item(trace_id, height, **extra):
+    return dict({'_trace': trace_id, '_measured_height': height}, **extra)
+
+
+def node(scid, photo_id, lat, lon, node_type='pole'):
+    return {
+        'attributes': {'scid': {'auto_button': scid}, 'node_type': {'button_added': node_type}},
+        'photos': {photo_id: {'association': 'main'}, f'{photo_id}_extra': {'association': True}},
+        'latitude': lat,
+        'longitude': lon,
+    }
+
+
+def connection(node_id_1, node_id_2, button, connection_type, sections):
+    return {'node_id_1': node_id_1, 'node_id_2': node_id_2, 'button': button,
+            'attributes': {'connection_type': {'button_added': connection_type}}, 'sections': sections}
+
+
+def section(photo_id, lat, lon):
+    return {'photos': {photo_id: {'association': 'main'}}, 'latitude': lat, 'longitude': lon}
+
+
+# Three poles in a row (A -> B -> C), a reference off A and an underground run from C.
+# Heights are in inches; the CPS ENERGY neutral sits at 300" on A, 310" on B and 305" on C.
+SMALL_JOB = {
+    'nodes': {
+        'nA': node('001', 'pA', 29.4000, -98.5000),
+        'nB': node('002', 'pB', 29.4003, -98.5000),
+        'nC': node('10A', 'pC', 29.4003, -98.4996),
+        'nR': node('001.A', 'pR', 29.3999, -98.5004, node_type='reference'),
+        'nP': node('003', 'pP', 29.4005, -98.4996, node_type='pedestal'),
+    },
+    'connections': {
+        'cAB': connection('nA', 'nB', 'aerial', 'aerial cable',
+                          {'s1': section('ps1', 29.4001, -98.5000), 's2': section('ps2', 29.4002, -98.5000)}),
+        'cBC': connection('nB', 'nC', 'aerial', 'aerial cable', {'s3': section('ps3', 29.4003, -98.4998)}),
+        'cAR': connection('nA', 'nR', 'ref', 'reference', {'s4': section('ps4', 29.39995, -98.5002)}),
+        'cCP': connection('nC', 'nP', 'underground', 'underground cable', {}),
+    },
+    'traces': {
+        'trace_data': {
+            'neutral': trace('CPS ENERGY', 'Neutral'),
+            'primary': trace('CPS ENERGY', 'Primary'),
+            'light': trace('CPS ENERGY', 'Street Light'),
+            'att': trace('AT&T', 'Fiber Optic Com'),
+            'coax': trace('Charter', 'Coax'),
+            'new_fiber': trace('Charter', 'Fiber', proposed=True),
+            'guy': trace('CPS ENERGY', 'Down Guy'),
+            'new_guy': trace('AT&T', 'Down Guy', proposed=True),
+            'xfmr': trace('CPS ENERGY', equipment_type='Transformer'),
+            'riser': trace('AT&T', equipment_type='Riser'),
+            'ug_att': trace('AT&T', 'Fiber Optic Com', connection_id='cCP'),
+            'ug_coax': trace('Charter', 'Coax', connection_id='cCP'),
+            'unnamed': trace('', 'Coax'),
+        },
+        'trace_items': {
+            'att': {'pA': {}, 'ps1': {}, 'ps2': {}, 'pB': {}},
+            'coax': {'ps3': {}, 'pC': {}},
+            'ug_att': {'pC': {}},
+        },
+    },
+    'photos': {
+        'pA': {'latitude': 29.4000, 'longitude': -98.5000, 'photofirst_data': {
+            'wire': {
+                'w1': item('primary', 400),
+                'w2': item('neutral', 300),
+                'w3': item('light', 280, mr_move=-6),
+                'w4': item('att', 250, mr_move=12),
+                'w5': item('coax', 230, _effective_moves={'a': -6, 'b': 'x'}),
+                'w6': item('new_fiber', 240),
+                'w7': item('unnamed', 210),
+                'w8': item('coax', 'abc'),
+            },
+            'equipment': {
+                'e1': item('xfmr', 320),
+                'e2': item('riser', 100, mr_move='0'),
+            },
+            'guying': {
+                'g1': item('guy', 200, mr_move=6),
+                'g2': item('new_guy', 190),
+                'g3': item('guy', 350),
+            },
+        }},
+        'pB': {'latitude': 29.4003, 'longitude': -98.5000, 'photofirst_data': {
+            'wire': {
+                'w1': item('neutral', 310),
+                'w2': item('att', 260, mr_move=None),
+                'w3': item('coax', 245, mr_move=0.001, _effective_moves={'a': 0.005}),
+                'w4': item('light', 290, _effective_moves={'a': 4, 'b': -1}),
+            },
+            'guying': {'g1': item('guy', 220)},
+        }},
+        'pC': {'latitude': 29.4003, 'longitude': -98.4996, 'photofirst_data': {
+            'wire': {
+                'w1': item('neutral', 305),
+                'w2': item('coax', 240, mr_move=-18),
+                'w3': item('new_fiber', 255),
+            },
+        }},
+        'pR': {'photofirst_data': {}},
+        'pP': {'latitude': 29.4005, 'longitude': -98.4996, 'photofirst_data': {}},
+        'ps1': {'photofirst_data': {
+            'wire': {
+                'w1': item('neutral', 290),
+                'w2': item('light', 275),
+                'w3': item('att', 210, mr_move=6),
+                'w4': item('coax', 200),
+                'w5': item('new_fiber', 220),
+                'w6': item('primary', 380),
+            },
+            'equipment': {'e1': item('riser', 190), 'e2': item('xfmr', 330)},
+        }},
+        'ps2': {'photofirst_data': {
+            'wire': {
+                'w1': item('neutral', 285),
+                'w2': item('att', 205, _effective_moves={'a': 3, 'b': 'q'}),
+                'w3': item('coax', 215, mr_move='x'),
+                'w4': item('new_fiber', 218),
+            },
+        }},
+        'ps3': {'photofirst_data': {
+            'wire': {
+                'w1': item('neutral', 295),
+                'w2': item('coax', 228, mr_move=-18),
+                'w3': item('att', 'n/a'),
+            },
+            'equipment': {'e1': item('riser', None)},
+        }},
+        'ps4': {'photofirst_data': {
+            'wire': {'w1': item('att', 215, mr_move=12), 'w2': item('neutral', 292)},
+            'guying': {'g1': item('guy', 180)},
+        }},
+    },
+}
+
+
+@pytest.fixture
+def small_job():
+    """A fresh copy of SMALL_JOB (analysis must not depend on mutating the job dict)"""
+    return copy.deepcopy(SMALL_JOB)
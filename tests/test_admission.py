@@ -0,0 +1,239 @@
+"""Upload admission control: TokenBucket, ClientRateLimiter, JobScheduler and the 429 middleware"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import app as app_module
+from backend.app import ClientRateLimiter, JobScheduler, QueueFullError, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class Jobs:
+    """Jobs that record when they start and run until released"""
+    def __init__(self):
+        self.started = []
+        self.release = {}
+
+    def make(self, name):
+        self.release[name] = asyncio.Event()
+
+        async def job():
+            self.started.append(name)
+            await self.release[name].wait()
+        return job
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+# TokenBucket / ClientRateLimiter
+
+def test_bucket_allows_burst_then_reports_wait():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, capacity=2, clock=clock)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(1.0)
+
+
+def test_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0.5, capacity=1, clock=clock)
+    assert bucket.take() == 0
+    clock.advance(1)
+    assert bucket.take() == pytest.approx(1.0)  # half a token, one more second to go
+    clock.advance(1)
+    assert bucket.take() == 0
+
+
+def test_bucket_refill_is_capped_at_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, capacity=3, clock=clock)
+    for _ in range(3):
+        bucket.take()
+    assert not bucket.is_full()
+    clock.advance(3600)
+    assert bucket.is_full()
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() > 0
+
+
+def test_rate_limiter_keeps_one_bucket_per_client():
+    clock = FakeClock()
+    limiter = ClientRateLimiter(per_minute=6, burst=1, clock=clock)
+    assert limiter.check('10.0.0.1') == 0
+    assert limiter.check('10.0.0.1') == pytest.approx(10.0)
+    assert limiter.check('10.0.0.2') == 0
+    clock.advance(10)
+    assert limiter.check('10.0.0.1') == 0
+
+
+def test_rate_limiter_prunes_idle_buckets(monkeypatch):
+    monkeypatch.setattr(app_module, 'RATE_LIMITER_MAX_CLIENTS', 2)
+    clock = FakeClock()
+    limiter = ClientRateLimiter(per_minute=60, burst=2, clock=clock)
+    limiter.check('idle1')
+    limiter.check('idle2')
+    clock.advance(1)  # both idle buckets are full again
+    limiter.check('busy')
+    limiter.check('busy')
+    limiter.check('new')
+    assert set(limiter.buckets) == {'busy', 'new'}
+
+
+# JobScheduler
+
+def test_queue_cap_raises_queue_full():
+    async def scenario():
+        jobs = Jobs()
+        scheduler = JobScheduler(max_concurrency=1, max_queued=1, fast_lane_slots=0)
+        await scheduler.submit('running', jobs.make('running'))
+        await scheduler.submit('queued', jobs.make('queued'))
+        assert scheduler.is_full()
+        with pytest.raises(QueueFullError):
+            await scheduler.submit('rejected', jobs.make('rejected'))
+        jobs.release['running'].set()
+        await settle()
+        assert jobs.started == ['running', 'queued']
+        assert not scheduler.is_full()
+        jobs.release['queued'].set()
+        await settle()
+    asyncio.run(scenario())
+
+
+def test_fast_lane_is_shortest_job_first_and_ahead_of_normal():
+    async def scenario():
+        jobs = Jobs()
+        scheduler = JobScheduler(max_concurrency=1, max_queued=10, fast_lane_slots=0, fast_job_max_seconds=5)
+        await scheduler.submit('blocker', jobs.make('blocker'), estimated_seconds=60)
+        await scheduler.submit('normal1', jobs.make('normal1'), estimated_seconds=30)
+        await scheduler.submit('fast3', jobs.make('fast3'), estimated_seconds=3)
+        await scheduler.submit('fast1', jobs.make('fast1'), estimated_seconds=1)
+        await scheduler.submit('normal2', jobs.make('normal2'))  # no estimate: normal lane
+        assert scheduler.queued_count('fast') == 2
+        assert scheduler.queued_count('normal') == 2
+        for name in ('blocker', 'fast1', 'fast3', 'normal1', 'normal2'):
+            await settle()
+            assert jobs.started[-1] == name
+            jobs.release[name].set()
+        await settle()
+        assert scheduler.running_count() == 0
+    asyncio.run(scenario())
+
+
+def test_fast_lane_slot_is_reserved():
+    async def scenario():
+        jobs = Jobs()
+        scheduler = JobScheduler(max_concurrency=2, max_queued=10, fast_lane_slots=1, fast_job_max_seconds=5)
+        await scheduler.submit('big1', jobs.make('big1'), estimated_seconds=60)
+        await scheduler.submit('big2', jobs.make('big2'), estimated_seconds=60)
+        await settle()
+        assert jobs.started == ['big1']
+        await scheduler.submit('quick', jobs.make('quick'), estimated_seconds=1)
+        await settle()
+        assert jobs.started == ['big1', 'quick']
+        for name in ('big1', 'quick'):
+            jobs.release[name].set()
+        await settle()
+        assert jobs.started == ['big1', 'quick', 'big2']
+        jobs.release['big2'].set()
+        await settle()
+    asyncio.run(scenario())
+
+
+def test_fast_lane_slots_leave_normal_lane_a_slot():
+    assert JobScheduler(max_concurrency=1, fast_lane_slots=1).fast_lane_slots == 0
+    assert JobScheduler(max_concurrency=3, fast_lane_slots=5).fast_lane_slots == 2
+
+
+def test_cancel_drops_a_queued_job():
+    async def scenario():
+        jobs = Jobs()
+        scheduler = JobScheduler(max_concurrency=1, max_queued=10, fast_lane_slots=0, fast_job_max_seconds=5)
+        await scheduler.submit('running', jobs.make('running'))
+        await scheduler.submit('normal', jobs.make('normal'))
+        await scheduler.submit('fast', jobs.make('fast'), estimated_seconds=1)
+        assert await scheduler.cancel('normal')
+        assert await scheduler.cancel('fast')
+        assert not await scheduler.cancel('normal')
+        assert not await scheduler.cancel('running')  # already started
+        assert scheduler.queued_count('normal') == scheduler.queued_count('fast') == 0
+        jobs.release['running'].set()
+        await settle()
+        assert jobs.started == ['running']
+    asyncio.run(scenario())
+
+
+# Middleware: rejected before the body is read
+
+def upload(client):
+    return client.post('/api/upload', files={'file': ('job.json', b'{}', 'application/json')})
+
+
+def test_rate_limited_upload_gets_429(monkeypatch):
+    limiter = ClientRateLimiter(per_minute=6, burst=1)
+    limiter.check('testclient')
+    monkeypatch.setattr(app_module, 'rate_limiter', limiter)
+    response = upload(TestClient(app_module.app))
+    assert response.status_code == 429
+    assert response.headers['retry-after'] == '10'
+
+
+def test_queue_full_upload_gets_429(monkeypatch):
+    monkeypatch.setattr(app_module, 'rate_limiter', ClientRateLimiter(per_minute=60, burst=5))
+    monkeypatch.setattr(app_module, 'scheduler', JobScheduler(max_queued=0))
+    response = upload(TestClient(app_module.app))
+    assert response.status_code == 429
+    assert response.headers['retry-after'] == '30'
+
+
+def test_rejected_upload_does_not_use_quota(monkeypatch):
+    limiter = ClientRateLimiter(per_minute=6, burst=1)
+    monkeypatch.setattr(app_module, 'rate_limiter', limiter)
+    client = TestClient(app_module.app)
+    for _ in range(3):
+        response = client.post('/api/upload', files={'file': ('job.txt', b'{}', 'text/plain')})
+        assert response.status_code == 400
+        response = client.post('/api/upload?output_format=docx', files={'file': ('job.json', b'{}', 'application/json')})
+        assert response.status_code == 400
+    assert limiter.retry_after('testclient') == 0
+
+
+def test_spoofed_forwarded_for_shares_the_clients_bucket(monkeypatch):
+    limiter = ClientRateLimiter(per_minute=6, burst=1)
+    monkeypatch.setattr(app_module, 'rate_limiter', limiter)
+    client = TestClient(app_module.app)
+    # The router appends the real peer (203.0.113.7); the leading entries are client-supplied
+    limiter.check('203.0.113.7')
+    for spoofed in ('10.0.0.1', '10.0.0.2'):
+        response = client.post('/api/upload', headers={'X-Forwarded-For': f'{spoofed}, 203.0.113.7'},
+                               files={'file': ('job.json', b'{}', 'application/json')})
+        assert response.status_code == 429
+    assert set(limiter.buckets) == {'203.0.113.7'}
+
+
+def test_client_id_uses_trusted_proxy_depth(monkeypatch):
+    class FakeRequest:
+        def __init__(self, forwarded_for):
+            self.headers = {'x-forwarded-for': forwarded_for}
+            self.client = type('Peer', (), {'host': '10.1.1.1'})()
+
+    request = FakeRequest('6.6.6.6, 198.51.100.2, 203.0.113.9')
+    assert app_module.client_id_for(request) == '203.0.113.9'
+    monkeypatch.setattr(app_module, 'TRUSTED_PROXY_HOPS', 2)
+    assert app_module.client_id_for(request) == '198.51.100.2'
+    monkeypatch.setattr(app_module, 'TRUSTED_PROXY_HOPS', 0)
+    assert app_module.client_id_for(request) == '10.1.1.1'
@@ -0,0 +1,107 @@
+"""Movement summaries from summarize_movements against the original text.
+
+ALL and CPS are what the original get_all_movements_summary and
+get_cps_movements_only returned for tests/conftest.py's SMALL_JOB (main
+attachers, then reference spans, then the backspan).
+"""
+import pytest
+
+from barebones import FileProcessor, movement_line, summarize_movements
+
+ALL = {
+    'nA': 'Lower CPS ENERGY Street Light 18" from 23\'-4" to 22\'-10"\n'
+          'Raise AT&T Fiber Optic Com 12" from 20\'-10" to 21\'-10"\n'
+          'Install proposed Charter Fiber at \n'
+          'Lower Charter Coax 18" from 19\'-2" to 18\'-8"\n'
+          'Raise CPS ENERGY Down Guy (Down Guy) 18" from 16\'-8" to 17\'-2"\n'
+          'Add AT&T Down Guy (Down Guy) at \n'
+          'Raise AT&T Fiber Optic Com 12" from 20\'-10" to 21\'-10"',   # the reference span to nR
+    'nB': 'Lower CPS ENERGY Street Light 3" from 24\'-2" to 24\'-5"\n'
+          'Lower AT&T Fiber Optic Com 3" from 17\'-1" to 17\'-4"',
+    'nC': 'Install proposed Charter Fiber at \n'
+          'Lower Charter Coax 30" from 20\'-0" to 18\'-6"\n'
+          'Lower Charter Coax 30" from 19\'-0" to 17\'-6"',
+    'nR': '',
+    'nP': '',
+}
+CPS = {
+    'nA': 'Lower CPS ENERGY Street Light 18" from 23\'-4" to 22\'-10"\n'
+          'Raise CPS ENERGY Down Guy (Down Guy) 18" from 16\'-8" to 17\'-2"',
+    'nB': 'Lower CPS ENERGY Street Light 3" from 24\'-2" to 24\'-5"',
+    'nC': '',
+    'nR': '',
+    'nP': '',
+}
+
+
+@pytest.fixture
+def processor(tmp_path):
+    return FileProcessor(output_dir=str(tmp_path))
+
+
+def test_node_movements_match_the_original_text(processor, small_job):
+    for node_id in small_job['nodes']:
+        attacher_data = processor.get_attachers_for_node(small_job, node_id)
+        movements = processor.get_node_movements(small_job, node_id, attacher_data)
+        assert (movements.all, movements.cps) == (ALL[node_id], CPS[node_id]), node_id
+        assert processor.get_node_movements(small_job, node_id, attacher_data) is movements
+    assert processor.cache_stats['movement_summary'] == [5, 5]
+
+
+def test_by_company_splits_the_all_text(processor, small_job):
+    by_company = {}
+    for node_id in small_job['nodes']:
+        attacher_data = processor.get_attachers_for_node(small_job, node_id)
+        by_company[node_id] = processor.get_node_movements(small_job, node_id, attacher_data).by_company
+    assert by_company == {
+        'nA': {
+            'CPS ENERGY': CPS['nA'],
+            'AT&T': 'Raise AT&T Fiber Optic Com 12" from 20\'-10" to 21\'-10"\n'
+                    'Add AT&T Down Guy (Down Guy) at \n'
+                    'Raise AT&T Fiber Optic Com 12" from 20\'-10" to 21\'-10"',
+            'Charter': 'Install proposed Charter Fiber at \n'
+                       'Lower Charter Coax 18" from 19\'-2" to 18\'-8"',
+        },
+        'nB': {'CPS ENERGY': CPS['nB'], 'AT&T': 'Lower AT&T Fiber Optic Com 3" from 17\'-1" to 17\'-4"'},
+        'nC': {'Charter': ALL['nC']},
+        'nR': {},
+        'nP': {},
+    }
+
+
+def test_main_attacher_summary_matches_the_original_text(processor, small_job):
+    # get_movement_summary over the main attachers alone, as the original returned it
+    main_attachers = processor.get_attachers_for_node(small_job, 'nA')['main_attachers']
+    assert processor.get_movement_summary(main_attachers) == ALL['nA'].rsplit('\n', 1)[0]
+    assert processor.get_movement_summary(main_attachers, cps_only=True) == CPS['nA']
+
+
+def attacher(name, existing, proposed, is_proposed=False, company=''):
+    return {'name': name, 'existing_height': existing, 'proposed_height': proposed,
+            'is_proposed': is_proposed, 'company': company}
+
+
+def test_movement_lines():
+    assert movement_line(attacher('AT&T Fiber', '20\'-0"', '21\'-0"')) == 'Raise AT&T Fiber 12" from 20\'-0" to 21\'-0"'
+    # The inches after the foot mark are read as a signed number: 19'-6" is 222", as the original summary had it
+    assert movement_line(attacher('AT&T Fiber', '20\'-0"', '19\'-6"')) == 'Lower AT&T Fiber 18" from 20\'-0" to 19\'-6"'
+    assert movement_line(attacher('AT&T Fiber', '20\'-0"', '20\'-0"')) is None   # no move
+    assert movement_line(attacher('AT&T Fiber', '20\'-0"', '')) is None          # nothing proposed
+    assert movement_line(attacher('AT&T Fiber', 'n/a', '20\'-0"')) is None       # unparseable
+    assert movement_line(attacher('AT&T Guy (Guy)', '18\'-0"', '', is_proposed=True)) == 'Add AT&T Guy (Guy) at 18\'-0"'
+    assert movement_line(attacher('Charter Fiber', '', '', is_proposed=True)) == 'Install proposed Charter Fiber at '
+
+
+def test_summarize_movements_keeps_the_given_order():
+    summary = summarize_movements([
+        attacher('Charter Coax', '19\'-0"', '18\'-0"', company='Charter'),
+        attacher('CPS ENERGY Street Light', '23\'-0"', '23\'-0"', company='CPS ENERGY'),
+        attacher('cps energy Down Guy', '16\'-0"', '17\'-0"', company='CPS ENERGY'),
+        attacher('Unlabelled Coax', '15\'-0"', '14\'-0"'),
+    ])
+    assert summary.all == ('Lower Charter Coax 12" from 19\'-0" to 18\'-0"\n'
+                           'Raise cps energy Down Guy 12" from 16\'-0" to 17\'-0"\n'
+                           'Lower Unlabelled Coax 12" from 15\'-0" to 14\'-0"')
+    assert summary.cps == 'Raise cps energy Down Guy 12" from 16\'-0" to 17\'-0"'
+    assert list(summary.by_company) == ['Charter', 'CPS ENERGY', '']
+    assert summarize_movements([]) == ('', '', {})
@@ -0,0 +1,77 @@
+"""NodeAttributes against the per-call node lookups it replaced.
+
+The expected values are what the original get_work_type, get_responsible_party,
+get_pole_structure, get_proposed_guy_value, get_neutral_wire_height and
+get_attachers_for_node returned for tests/conftest.py's SMALL_JOB with the
+attributes added in `job` below.
+"""
+import pytest
+
+from barebones import FileProcessor, get_scid_from_node_data, parse_scid
+
+
+@pytest.fixture
+def processor(tmp_path):
+    return FileProcessor(output_dir=str(tmp_path))
+
+
+@pytest.fixture
+def job(small_job):
+    attributes = small_job['nodes']['nA']['attributes']
+    attributes['work_type'] = {'-a': 'N/A', '-b': 'Make Ready'}
+    attributes['STRESS_-_MR_responsible_party'] = {'-x': ''}
+    attributes['KAT_-_MR_responsible_party'] = {'-y': 'CPS ENERGY'}
+    attributes['pole_height'] = {'one': '45'}
+    attributes['pole_class'] = {'one': '3'}
+    attributes = small_job['nodes']['nB']['attributes']
+    attributes['kat_work_type'] = {'-a': 'Pole Replacement'}
+    attributes['proposed_pole_spec'] = {'-p': {'value': '50-2'}}
+    small_job['photos']['pA']['photofirst_data']['guying']['g2']['proposed'] = True
+    small_job['photos']['pB']['photofirst_data']['guying']['g1']['proposed'] = True
+    return small_job
+
+
+def test_one_instance_per_node(processor, job):
+    first = processor.get_node_attributes(job, 'nA')
+    assert processor.get_node_attributes(job, 'nA') is first
+    assert processor.get_node_attributes(job, 'nB') is not first
+    assert processor.cache_stats['node_attributes'] == [1, 2]
+
+
+def test_attributes_match_the_original_lookups(processor, job):
+    values = {}
+    for node_id in job['nodes']:
+        attributes = processor.get_node_attributes(job, node_id)
+        values[node_id] = (attributes.main_photo_id, attributes.scid, attributes.neutral_height, attributes.work_type,
+                           attributes.responsible_party, attributes.pole_structure, attributes.proposed_guy)
+        assert attributes.scid == get_scid_from_node_data(job['nodes'][node_id], missing='N/A')
+        assert attributes.scid_key == parse_scid(attributes.scid)
+    assert values == {
+        'nA': ('pA', '001', 300.0, 'Make Ready', 'CPS ENERGY', '45-3', 'YES (1)'),
+        'nB': ('pB', '002', 310.0, 'Pole Replacement', 'N/A', '50-2', 'YES (1)'),
+        'nC': ('pC', '10A', 305.0, 'N/A', 'N/A', 'N/A', 'No'),
+        'nR': ('pR', '001.A', None, 'N/A', 'N/A', 'N/A', 'No'),
+        'nP': ('pP', '003', None, 'N/A', 'N/A', 'N/A', 'No'),
+    }
+
+
+def test_missing_node(processor, job):
+    attributes = processor.get_node_attributes(job, 'nowhere')
+    assert (attributes.main_photo_id, attributes.scid, attributes.neutral_height) == (None, 'N/A', None)
+
+
+def test_main_attachers_and_logged_scid(processor, job):
+    attachers = processor.get_attachers_for_node(job, 'nA')['main_attachers']
+    assert [(a['name'], a['existing_height'], a['proposed_height'], a['raw_height'], a['is_proposed'])
+            for a in attachers] == [
+        ('CPS ENERGY Neutral', '25\'-0"', '', 300, False),
+        ('CPS ENERGY Street Light', '23\'-4"', '22\'-10"', 280, False),
+        ('AT&T Fiber Optic Com', '20\'-10"', '21\'-10"', 250, False),
+        ('Charter Fiber', '', '20\'-0"', 240, True),
+        ('Charter Coax', '19\'-2"', '18\'-8"', 230, False),
+        ('CPS ENERGY Down Guy (Down Guy)', '16\'-8"', '17\'-2"', 200, False),
+        ('AT&T Down Guy (Down Guy)', '', '15\'-10"', 190, True),
+        ('AT&T Riser', '8\'-4"', '', 100, False),
+    ]
+    assert processor.logger.node_counts['nA']['scid'] == '001'
+    assert processor.logger.node_counts['nA']['neutral_height'] == 300.0
@@ -0,0 +1,56 @@
+"""plan_shards: splitting (Operation Number, SCID) records into shard workbooks"""
+from barebones import plan_shards
+
+
+def test_operations_shards_keep_repeated_operation_numbers_together():
+    # Operation 2 has three connections; a shard boundary must not split it
+    records = [(1, '001'), (2, '002'), (2, '002'), (2, '002'), (3, '003'), (4, '004'), (5, '005')]
+    shards = plan_shards(records, 'operations', 2)
+    assert shards == [
+        {'label': 'ops_1-2', 'records': [0, 1, 2, 3]},
+        {'label': 'ops_3-4', 'records': [4, 5]},
+        {'label': 'ops_5-5', 'records': [6]},
+    ]
+
+
+def test_operations_shard_size_one():
+    records = [(1, '001'), (1, '001'), (2, '002')]
+    assert [shard['label'] for shard in plan_shards(records, 'operations', 1)] == ['ops_1-1', 'ops_2-2']
+
+
+def test_operations_repeat_after_boundary_starts_no_new_shard_until_full():
+    # A repeat of an operation already in the current shard doesn't count against shard_size
+    records = [(1, '001'), (2, '002'), (1, '001'), (3, '003')]
+    shards = plan_shards(records, 'operations', 2)
+    assert shards[0]['records'] == [0, 1, 2]
+    assert shards[1] == {'label': 'ops_3-3', 'records': [3]}
+
+
+def test_scid_bucket_labels():
+    records = [(1, '005'), (2, '099'), (3, '100'), (4, '250'), (5, '42')]
+    shards = plan_shards(records, 'scid', 100)
+    assert shards == [
+        {'label': 'scid_000-099', 'records': [0, 1, 4]},
+        {'label': 'scid_100-199', 'records': [2]},
+        {'label': 'scid_200-299', 'records': [3]},
+    ]
+
+
+def test_scid_suffixes_share_their_base_bucket():
+    records = [(1, '101.A'), (2, '101'), (3, '150.B')]
+    assert plan_shards(records, 'scid', 100) == [{'label': 'scid_100-199', 'records': [0, 1, 2]}]
+
+
+def test_scid_other_holds_na_and_non_numeric():
+    records = [(1, 'N/A'), (2, '012'), (3, 'ABC'), (4, ''), (5, '110')]
+    shards = plan_shards(records, 'scid', 50)
+    assert shards == [
+        {'label': 'scid_000-049', 'records': [1]},
+        {'label': 'scid_100-149', 'records': [4]},
+        {'label': 'scid_other', 'records': [0, 2, 3]},
+    ]
+
+
+def test_empty_records_plan_no_shards():
+    assert plan_shards([], 'operations', 10) == []
+    assert plan_shards([], 'scid', 10) == []
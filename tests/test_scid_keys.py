@@ -0,0 +1,45 @@
+"""parse_scid / ScidKey against FileProcessor.compare_scids, and build_scid_index"""
+import itertools
+
+import pytest
+
+from barebones import FileProcessor, build_scid_index, parse_scid
+
+NUMERIC = ['1', '001', '002', '002.A', '002.B', '002.A.1', '2', '9', '10', '010', '010.A', '100', '', '0', '.5']
+NON_NUMERIC = ['A1', 'B', 'B.1', '10A', 'PL1']
+
+
+@pytest.fixture
+def compare_scids(tmp_path):
+    return FileProcessor(output_dir=str(tmp_path)).compare_scids
+
+
+def test_keys_match_compare_scids_within_numeric_and_non_numeric_bases(compare_scids):
+    # `compare(a, b) <= 0` puts a first; it never returns 0, so equal SCIDs put b first, as `key_a < key_b` does
+    for group in (NUMERIC + ['N/A'], NON_NUMERIC + ['N/A']):
+        for a, b in itertools.product(group, repeat=2):
+            assert (parse_scid(a) < parse_scid(b)) == (compare_scids(a, b) <= 0), (a, b)
+
+
+def test_mixed_bases_differ_from_compare_scids(compare_scids):
+    # compare_scids compares "10A" and "9" as text, and is not transitive there
+    assert compare_scids('10A', '9') < 0
+    assert compare_scids('9', '10') < 0 and compare_scids('10', '10A') < 0
+    # The keys put numeric bases before non-numeric ones
+    assert parse_scid('9') < parse_scid('10') < parse_scid('10A')
+
+
+def test_na_sorts_last():
+    assert sorted(['N/A', 'B', '002.A', '002'], key=parse_scid) == ['002', '002.A', 'B', 'N/A']
+
+
+def test_suffix_parts():
+    assert parse_scid('002.A.1').suffix == ('A', '1')
+    assert parse_scid('002').suffix == ()
+
+
+def test_scid_index_skips_na_and_sorts_by_key(small_job):
+    small_job['nodes']['nX'] = {'attributes': {}}
+    small_job['nodes']['nB2'] = {'attributes': {'scid': {'-Imported': '002'}}}
+    assert build_scid_index(small_job) == {
+        '001': ['nA'], '001.A': ['nR'], '002': ['nB', 'nB2'], '003': ['nP'], '10A': ['nC']}
@@ -0,0 +1,55 @@
+"""Neutral, lowest com / CPS and mid-span heights from PhotoItemTable.
+
+The expected values are what the original per-call dict walks
+(get_neutral_wire_height, get_lowest_heights_for_connection,
+get_midspan_proposed_heights before the span profile and PhotoItemTable)
+returned for tests/conftest.py's SMALL_JOB.
+"""
+import pytest
+
+from barebones import FileProcessor, PhotoItemTable
+
+ATTACHERS = ['AT&T Fiber Optic Com', 'Charter Coax', 'Charter Fiber', 'CPS ENERGY Neutral',
+             'CPS ENERGY Street Light', ' Coax', 'Nobody']
+
+
+@pytest.fixture
+def processor(tmp_path):
+    return FileProcessor(output_dir=str(tmp_path))
+
+
+def test_neutral_heights(processor, small_job):
+    heights = {node_id: processor.get_neutral_wire_height(small_job, node_id) for node_id in small_job['nodes']}
+    assert heights == {'nA': 300.0, 'nB': 310.0, 'nC': 305.0, 'nR': None, 'nP': None}
+
+
+def test_lowest_com_and_cps_heights(processor, small_job):
+    lowest = {conn_id: processor.get_lowest_heights_for_connection(small_job, conn_id)
+              for conn_id in list(small_job['connections']) + ['missing']}
+    assert lowest == {
+        # com: the AT&T riser at 190" on s1; CPS: the s1 street light at 275", below both neutrals
+        'cAB': ('15\'-10"', '22\'-11"'),
+        'cBC': ('19\'-0"', '24\'-7"'),     # unparseable heights and a riser without one are ignored
+        'cAR': ('17\'-11"', '24\'-4"'),
+        'cCP': ('', ''),                   # no sections
+        'missing': ('', ''),
+    }
+
+
+def test_midspan_proposed_heights(processor, small_job):
+    heights = {(conn_id, name): processor.get_midspan_proposed_heights(small_job, conn_id, name)
+               for conn_id in small_job['connections'] for name in ATTACHERS}
+    assert {key: value for key, value in heights.items() if value} == {
+        ('cAB', 'AT&T Fiber Optic Com'): '17\'-4"',  # lowest section (205") plus its numeric effective move
+        ('cAB', 'Charter Fiber'): '18\'-2"',         # proposed: its lowest measured height
+        ('cBC', 'Charter Coax'): '17\'-6"',
+        ('cAR', 'AT&T Fiber Optic Com'): '18\'-11"',
+    }
+
+
+def test_table_rows_follow_photo_item_order(small_job):
+    table = PhotoItemTable(small_job)
+    start, stop = table.photo_slices['ps2']
+    assert [table.trace_ids[code] for code in table.trace[start:stop]] == ['neutral', 'att', 'coax', 'new_fiber']
+    assert table.neutral_height('pB') == 310.0
+    assert table.neutral_height('pR') is None
@@ -0,0 +1,86 @@
+"""TaskStore paging and the /api/tasks listing filters"""
+import itertools
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import app as app_module
+from backend.app import TaskStore
+
+STATUSES = ('queued', 'processing', 'complete', 'failed')
+
+
+def make_store(count=40):
+    store = TaskStore()
+    for i in range(count):
+        store[f't{i}'] = {'task_id': f't{i}', 'filename': 'job.json', 'status': 'queued',
+                          'created': datetime(2025, 1, 1, 0, 0, i).isoformat(), 'progress': 0, 'files': []}
+        store.set_status(f't{i}', STATUSES[(i * 7) % len(STATUSES)])
+    del store['t5']
+    return store
+
+
+def expected_ids(store, statuses=None, since=None):
+    return [task_id for task_id, task in store.items()
+            if (not statuses or task['status'] in statuses)
+            and (since is None or datetime.fromisoformat(task['created']) >= since)]
+
+
+def all_pages(store, **filters):
+    ids, cursor = [], None
+    while True:
+        tasks, cursor = store.page(cursor=cursor, limit=3, **filters)
+        ids.extend(task['task_id'] for task in tasks)
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('statuses', [None, ['complete'], ['queued', 'failed'], ['complete', 'processing', 'failed']])
+@pytest.mark.parametrize('since', [None, datetime(2025, 1, 1, 0, 0, 17)])
+def test_pages_match_a_full_scan(statuses, since):
+    store = make_store()
+    assert all_pages(store, statuses=statuses, since=since) == expected_ids(store, statuses, since)
+
+
+def test_multi_status_page_merges_only_a_page(monkeypatch):
+    store = make_store()
+    merged = []
+    real_merge = app_module.heapq.merge
+
+    def counting_merge(*iterables):
+        for seq in real_merge(*iterables):
+            merged.append(seq)
+            yield seq
+    monkeypatch.setattr(app_module.heapq, 'merge', counting_merge)
+    tasks, cursor = store.page(statuses=list(STATUSES), limit=4)
+    assert len(tasks) == 4 and cursor is not None
+    assert len(merged) == 5
+
+
+def test_since_accepts_offsets_and_z():
+    store = make_store()
+    app_module.processing_tasks, saved = store, app_module.processing_tasks
+    try:
+        client = TestClient(app_module.app)
+        local = datetime(2025, 1, 1, 0, 0, 17)
+        expected = expected_ids(store, since=local)[:50]
+        aware = local.astimezone()
+        for since in (local.isoformat(), aware.isoformat(),
+                      aware.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')):
+            response = client.get('/api/tasks', params={'since': since})
+            assert response.status_code == 200
+            assert [task['task_id'] for task in response.json()['tasks']] == expected
+        assert client.get('/api/tasks', params={'since': 'yesterday'}).status_code == 400
+    finally:
+        app_module.processing_tasks = saved
+
+
+def test_status_index_follows_status_changes():
+    store = make_store(8)
+    store.set_status('t0', 'failed')
+    counts = store.status_counts()
+    assert sum(counts.values()) == len(store)
+    assert counts == {status: sum(1 for task in store.values() if task['status'] == status)
+                      for status in counts}
+    assert list(itertools.islice(store, 2)) == ['t0', 't1']
@@ -0,0 +1,88 @@
+"""TraceIndex (trace -> photofirst items) and ConnectionTraceIndex (connection -> traces)
+against the per-call scans they replaced"""
+import pytest
+
+from barebones import ConnectionTraceIndex, FileProcessor, TraceIndex
+
+
+@pytest.fixture
+def processor(tmp_path):
+    return FileProcessor(output_dir=str(tmp_path))
+
+
+def test_node_trace_heights_match_the_original_scan(processor, small_job):
+    # What get_heights_for_node_trace_attachers returned when it scanned {**wire, **equipment, **guying}
+    # for every attacher; the CPS power wires other than the lowest are dropped by get_attachers_from_node_trace
+    heights = {node_id: processor.get_heights_for_node_trace_attachers(
+                   small_job, node_id, processor.get_attachers_from_node_trace(small_job, node_id))
+               for node_id in small_job['nodes']}
+    assert heights == {
+        'nA': {'Street Light': ('23\'-4"', '22\'-10"'), 'AT&T Fiber Optic Com': ('20\'-10"', '21\'-10"'),
+               'Charter Coax': ('19\'-2"', ''), 'Charter Fiber': ('20\'-0"', ''), ' Coax': ('17\'-6"', ''),
+               'Transformer': ('26\'-8"', ''), 'AT&T Riser': ('8\'-4"', ''), 'Down Guy': ('16\'-8"', '17\'-2"'),
+               'AT&T Down Guy': ('15\'-10"', '')},
+        'nB': {'AT&T Fiber Optic Com': ('21\'-8"', ''), 'Charter Coax': ('20\'-5"', ''),
+               'Street Light': ('24\'-2"', ''), 'Down Guy': ('18\'-4"', '')},
+        'nC': {'Neutral': ('25\'-5"', ''), 'Charter Coax': ('20\'-0"', '18\'-6"'), 'Charter Fiber': ('21\'-3"', '')},
+        'nR': {},
+        'nP': {},
+    }
+
+
+def test_in_photo_matches_a_scan_of_the_photo(small_job):
+    index = TraceIndex(small_job)
+    for photo_id, photo in small_job['photos'].items():
+        photofirst_data = photo['photofirst_data']
+        merged = {**photofirst_data.get('wire', {}), **photofirst_data.get('equipment', {}),
+                  **photofirst_data.get('guying', {})}
+        for trace_id in small_job['traces']['trace_data']:
+            scanned = [item for item in merged.values() if item.get('_trace') == trace_id]
+            assert [item for _, _, item in index.in_photo(trace_id, photo_id)] == scanned
+
+
+def test_follow_lists_poles_then_midspans_in_job_order(small_job):
+    stops = TraceIndex(small_job).follow('coax')
+    assert [(stop['kind'], stop.get('node_id') or stop['connection_id'], stop['item_key'], stop['measured_height'])
+            for stop in stops] == [
+        ('pole', 'nA', 'w5', 230), ('pole', 'nA', 'w8', 'abc'), ('pole', 'nB', 'w3', 245), ('pole', 'nC', 'w2', 240),
+        ('midspan', 'cAB', 'w4', 200), ('midspan', 'cAB', 'w3', 215), ('midspan', 'cBC', 'w2', 228),
+    ]
+    assert TraceIndex(small_job).follow('no-such-trace') == []
+
+
+def test_traces_for_matches_a_trace_data_scan(small_job):
+    index = ConnectionTraceIndex(small_job)
+    trace_data = small_job['traces']['trace_data']
+    for connection_id in list(small_job['connections']) + ['missing']:
+        # The loop the underground remedy ran for every connection
+        scanned = [trace_id for trace_id, info in trace_data.items() if info.get('connection_id') == connection_id]
+        assert index.traces_for(connection_id) == scanned
+    assert index.traces_for('cCP') == ['ug_att', 'ug_coax']
+
+
+def test_traces_on_follows_trace_items_to_section_photos(small_job):
+    index = ConnectionTraceIndex(small_job)
+    assert index.traces_on('cAB') == ['att']   # ps1 and ps2, listed once
+    assert index.traces_on('cBC') == ['coax']
+    assert index.traces_on('cAR') == []       # nothing in trace_items is on ps4
+
+
+def remedies(job, tmp_path):
+    # A fresh processor each time: the job indexes are built once per job
+    df = FileProcessor(output_dir=str(tmp_path)).process_data(job, None)
+    return dict(zip(df['Connection ID'], df['Remedy Description']))
+
+
+def test_underground_remedy_uses_the_first_named_company(small_job, tmp_path):
+    assert remedies(small_job, tmp_path) == {
+        'cAB': '', 'cBC': '', 'cCP': 'Proposed AT&T to transition to UG connection to the N (0°)'}
+
+
+def test_underground_remedy_falls_back_to_traces_on_the_sections(small_job, tmp_path):
+    for info in small_job['traces']['trace_data'].values():
+        info.pop('connection_id', None)
+    assert remedies(small_job, tmp_path)['cCP'] == ''
+    small_job['connections']['cCP']['sections'] = {
+        's5': {'photos': {'ps5': {'association': 'main'}}, 'latitude': 29.4004, 'longitude': -98.4996}}
+    small_job['traces']['trace_items']['coax']['ps5'] = {}
+    assert remedies(small_job, tmp_path)['cCP'] == 'Proposed Charter to transition to UG connection to the N (0°)'
@@ -0,0 +1,34 @@
+"""WebSocket task subscriptions are released however the connection ends"""
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import app as app_module
+from backend.app import TaskStore
+
+
+@pytest.fixture
+def tasks(monkeypatch):
+    store = TaskStore()
+    store['t1'] = {'task_id': 't1', 'filename': 'job.json', 'status': 'queued',
+                   'created': datetime.now().isoformat(), 'progress': 0, 'files': []}
+    monkeypatch.setattr(app_module, 'processing_tasks', store)
+    return store
+
+
+def test_client_disconnect_unsubscribes(tasks):
+    with TestClient(app_module.app).websocket_connect('/api/ws/tasks/t1') as websocket:
+        assert websocket.receive_json()['status'] == 'queued'
+        assert app_module.manager.subscriber_count() == 1
+    assert app_module.manager.subscriber_count() == 0
+
+
+def test_server_error_unsubscribes(tasks, monkeypatch):
+    def broken(task):
+        raise RuntimeError('serialization failed')
+    monkeypatch.setattr(app_module, 'serialize_task', broken)
+    with pytest.raises(RuntimeError):
+        with TestClient(app_module.app).websocket_connect('/api/ws/tasks/t1') as websocket:
+            websocket.receive_json()
+    assert app_module.manager.subscriber_count() == 0
@@ -0,0 +1,77 @@
+"""PipelinedWorkbookWriter writes the same workbook as WorkbookStreamWriter"""
+import openpyxl
+import pytest
+
+import barebones
+from barebones import (MAKE_READY_COLUMNS, FileProcessor, PipelinedWorkbookWriter, WorkbookStreamWriter)
+
+
+def make_ready_blocks():
+    # Three poles: two with several rows (A-I merged), one single row, each followed by a blank layout row
+    blocks = []
+    for operation, attachers in ((1, 3), (2, 1), (3, 4)):
+        block = []
+        for n in range(attachers):
+            row = {column: f"{column} {operation}.{n}" for column in MAKE_READY_COLUMNS}
+            row['Operation Number'] = operation
+            row['Attacher Description'] = f"Company {n}" + " with a long name" * n
+            block.append(row)
+        block.append({column: "" for column in MAKE_READY_COLUMNS})
+        blocks.append(block)
+    return blocks
+
+
+REF_ROWS = [["1", "101", "102", "Company 0", "20' 1\"", "", "18' 4\"", ""],
+            ["3", "103", "104", "Company 2", "22' 0\"", "21' 0\"", "", ""]]
+
+
+def write(writer):
+    for block in make_ready_blocks():
+        writer.add_rows(block)
+    writer.add_ref_rows(REF_ROWS)
+    writer.close()
+
+
+def sheets(path):
+    workbook = openpyxl.load_workbook(path)
+    return {
+        sheet.title: (
+            [[cell.value for cell in row] for row in sheet.iter_rows()],
+            sorted(str(cells) for cells in sheet.merged_cells.ranges),
+            {column: dimension.width for column, dimension in sheet.column_dimensions.items()},
+        )
+        for sheet in workbook.worksheets
+    }
+
+
+def test_pipelined_and_inline_writers_write_identical_sheets(tmp_path):
+    write(WorkbookStreamWriter(tmp_path / 'inline.xlsx'))
+    write(PipelinedWorkbookWriter(str(tmp_path / 'pipelined.xlsx')))
+    inline = sheets(tmp_path / 'inline.xlsx')
+    assert list(inline) == ['MakeReadyData', 'refs']
+    assert inline['MakeReadyData'][1]  # the merges are part of the comparison
+    assert sheets(tmp_path / 'pipelined.xlsx') == inline
+
+
+def test_writer_process_only_for_large_unprofiled_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(barebones.os, 'cpu_count', lambda: 4)
+    monkeypatch.setattr(barebones, 'PIPELINE_MIN_RECORDS', 10)
+    processor = FileProcessor(output_dir=str(tmp_path))
+
+    def writer_type(record_count):
+        writer = processor.open_workbook_writer(str(tmp_path / 'probe.xlsx'), record_count)
+        writer.abort()
+        return type(writer)
+
+    assert writer_type(9) is WorkbookStreamWriter
+    assert writer_type(10) is PipelinedWorkbookWriter
+    processor.profiling = True
+    assert writer_type(10) is WorkbookStreamWriter
+
+
+def test_writer_process_failure_raises(tmp_path):
+    writer = PipelinedWorkbookWriter(str(tmp_path / 'missing' / 'out.xlsx'))
+    for block in make_ready_blocks():
+        writer.add_rows(block)
+    with pytest.raises(barebones.WorkbookWriterError, match='FileCreateError'):
+        writer.close()